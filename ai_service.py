@@ -1,6 +1,7 @@
 """AI сервис для генерации упражнений."""
+import asyncio
+import json
 import os
-from openai import AsyncOpenAI
 
 # DeepSeek API (OpenAI-compatible)
 _client = None
@@ -13,12 +14,21 @@ def get_client():
     if not api_key:
         return None
     if _client is None:
+        # openai импортируется долго (~0.5 с) и без ключа не нужен вовсе
+        from openai import AsyncOpenAI
         _client = AsyncOpenAI(
             api_key=api_key,
             base_url="https://api.deepseek.com"
         )
     return _client
 
+
+async def preload():
+    """Создать клиент заранее, в потоке (при старте бота, если задан ключ):
+    иначе импорт openai остановил бы цикл событий на первом запросе к AI."""
+    if os.environ.get('DEEPSEEK_API_KEY'):
+        await asyncio.to_thread(get_client)
+
 MUSCLE_GROUPS = {
     "chest": "грудь",
     "back": "спина",
@@ -33,30 +43,96 @@ MUSCLE_GROUPS = {
 MUSCLE_GROUPS_RU = {v: k for k, v in MUSCLE_GROUPS.items()}
 
 
-async def generate_exercises(muscles: list[str], count: int = 5) -> str | None:
+# Схема ответа в режиме структурированной генерации
+EXERCISE_SCHEMA = {
+    "type": "object",
+    "required": ["exercises"],
+    "properties": {
+        "exercises": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["name", "muscle"],
+                "properties": {
+                    "name": {"type": "string"},
+                    "description": {"type": "string"},
+                    "muscle": {"type": "string"},
+                    "weight_type": {"type": "integer", "enum": [0, 10, 100]},
+                },
+            },
+        },
+    },
+}
+
+
+def _validate_exercise(item, muscles: list[str]) -> dict | None:
+    """Проверить одно упражнение из ответа по EXERCISE_SCHEMA."""
+    if not isinstance(item, dict):
+        return None
+    name = item.get("name")
+    muscle = item.get("muscle")
+    if not isinstance(name, str) or not name.strip():
+        return None
+    if not isinstance(muscle, str) or muscle.strip().lower() not in muscles:
+        return None
+    description = item.get("description")
+    if not isinstance(description, str) or not description.strip():
+        description = None
+    weight_type = item.get("weight_type", 10)
+    if weight_type not in (0, 10, 100):
+        weight_type = 10
+    return {
+        "name": " ".join(name.split())[:100],
+        "description": description.strip()[:300] if description else None,
+        "muscle": muscle.strip().lower(),
+        "weight_type": weight_type,
+    }
+
+
+def parse_structured_exercises(content: str, muscles: list[str]) -> list[dict]:
+    """Разобрать JSON-ответ AI, отбросив всё, что не проходит по схеме."""
+    try:
+        payload = json.loads(content)
+    except (TypeError, ValueError):
+        return []
+    items = payload.get("exercises") if isinstance(payload, dict) else None
+    if not isinstance(items, list):
+        return []
+    result = []
+    for item in items:
+        exercise = _validate_exercise(item, muscles)
+        if exercise:
+            result.append(exercise)
+    return result
+
+
+async def generate_exercises_structured(muscles: list[str], count: int = 5) -> list[dict] | None:
     """
-    Генерирует упражнения для выбранных мышц.
+    Генерирует упражнения в JSON для сохранения в библиотеку.
 
     Args:
         muscles: список мышц на русском (грудь, спина, бицепс...)
         count: количество упражнений
 
     Returns:
-        Текст с упражнениями или None при ошибке
+        Список проверенных упражнений
+        ({"name", "description", "muscle", "weight_type"}) или None при ошибке
     """
     client = get_client()
     if not client:
         return None
 
+    muscles = [m.lower() for m in muscles]
     muscles_str = ", ".join(muscles)
 
     prompt = f"""Составь {count} упражнений для тренировки: {muscles_str}.
 
-Формат ответа - только список упражнений:
-1. Название упражнения - краткое описание техники (1 предложение)
-2. ...
+Ответь только JSON по схеме:
+{json.dumps(EXERCISE_SCHEMA, ensure_ascii=False)}
 
-Без вступления и заключения. Только упражнения."""
+muscle — одно из: {muscles_str}.
+description — краткое описание техники (1 предложение).
+weight_type: 0 — без веса, 10 — гантели, 100 — штанга."""
 
     try:
         response = await client.chat.completions.create(
@@ -64,14 +140,15 @@ async def generate_exercises(muscles: list[str], count: int = 5) -> str | None:
             messages=[
                 {
                     "role": "system",
-                    "content": "Ты фитнес-тренер. Отвечай кратко и по делу на русском языке."
+                    "content": "Ты фитнес-тренер. Отвечай только валидным JSON на русском языке."
                 },
                 {"role": "user", "content": prompt}
             ],
-            max_tokens=500,
+            response_format={"type": "json_object"},
+            max_tokens=1000,
             temperature=0.7
         )
-        return response.choices[0].message.content
+        return parse_structured_exercises(response.choices[0].message.content, muscles)
     except Exception as e:
         print(f"AI error: {e}")
-        return None
\ No newline at end of file
+        return None
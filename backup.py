@@ -0,0 +1,123 @@
+"""Горячее резервное копирование БД без остановки бота.
+
+Копия снимается через sqlite3 backup API по PAGES_PER_STEP страниц за шаг
+из открытой читающей транзакции, основная и архивная БД — из одной. БД
+в режиме WAL (см. init_db), поэтому читатель не мешает записи из бота, а копия
+соответствует моменту начала транзакции: запись другого соединения не
+заставляет копирование начинаться заново. Готовая копия ужимается через
+VACUUM INTO в снимок <имя>-<дата>.db, из снимков хранятся BACKUP_KEEP последних.
+
+Функции синхронные — вызываются из отдельного потока (asyncio.to_thread).
+"""
+import glob
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+import config
+
+# Страниц за один шаг копирования (по 4 КБ — около 1 МБ)
+PAGES_PER_STEP = 256
+
+# Пауза между шагами, секунд: окно для записи из бота
+STEP_PAUSE = 0.005
+
+
+def _copy(src: sqlite3.Connection, schema: str, part: str, pages: int, pause: float) -> list[float]:
+    """Скопировать схему schema соединения src в файл part. Возвращает длительности шагов."""
+    step_times = []
+    step_start = time.perf_counter()
+
+    def progress(status, remaining, total):
+        nonlocal step_start
+        step_times.append(time.perf_counter() - step_start)
+        if remaining:
+            time.sleep(pause)
+        step_start = time.perf_counter()
+
+    dst = sqlite3.connect(part)
+    try:
+        src.backup(dst, pages=pages, progress=progress, name=schema)
+    finally:
+        dst.close()
+    return step_times
+
+
+def backup_databases(main: str, archive: str | None, dest_dir: str, pages: int = PAGES_PER_STEP,
+                     pause: float = STEP_PAUSE) -> list[dict]:
+    """Снять копии основной и (если есть) архивной БД из одной читающей транзакции.
+
+    Архив подключается к тому же соединению, снимки обоих файлов фиксируются
+    в начале транзакции, основной — первым. Архиватор (archive_old_logs)
+    сначала пишет пачку в архив и только потом удаляет её из основной БД,
+    поэтому в паре копий пачка может оказаться дважды (следующий перенос
+    это исправит), но не потеряется.
+
+    Returns:
+        [{"path", "size", "steps", "step_max_ms", "step_avg_ms", "seconds"}, ...]
+    """
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    schemas = [("main", main)]
+    if archive and os.path.exists(archive):
+        schemas.append(("archive", archive))
+
+    copies = []
+    src = sqlite3.connect(main, isolation_level=None)
+    try:
+        if len(schemas) > 1:
+            src.execute("ATTACH DATABASE ? AS archive", (archive,))
+        # Без открытой транзакции каждая запись бота перезапускала бы копирование
+        src.execute("BEGIN")
+        for schema, _ in schemas:
+            src.execute(f"SELECT COUNT(*) FROM {schema}.sqlite_master").fetchone()
+        for schema, source in schemas:
+            stem = os.path.splitext(os.path.basename(source))[0]
+            path = os.path.join(dest_dir, f"{stem}-{stamp}.db")
+            started = time.perf_counter()
+            step_times = _copy(src, schema, path + ".part", pages, pause)
+            copies.append((path, step_times, time.perf_counter() - started))
+        src.execute("COMMIT")
+    finally:
+        src.close()
+
+    results = []
+    for path, step_times, seconds in copies:
+        part = path + ".part"
+        started = time.perf_counter()
+        # Снимок из копии, а не из рабочей БД: VACUUM INTO держал бы её всё время
+        snapshot = sqlite3.connect(part)
+        try:
+            snapshot.execute("VACUUM INTO ?", (path,))
+        finally:
+            snapshot.close()
+            os.remove(part)
+        results.append({
+            "path": path,
+            "size": os.path.getsize(path),
+            "steps": len(step_times),
+            "step_max_ms": max(step_times, default=0) * 1e3,
+            "step_avg_ms": sum(step_times) / len(step_times) * 1e3 if step_times else 0,
+            "seconds": seconds + time.perf_counter() - started,
+        })
+    return results
+
+
+def rotate(dest_dir: str, stem: str, keep: int) -> list[str]:
+    """Удалить старые снимки stem-*.db, оставив keep последних. Возвращает удалённые."""
+    snapshots = sorted(glob.glob(os.path.join(glob.escape(dest_dir), f"{glob.escape(stem)}-*.db")))
+    removed = snapshots[:-keep] if keep > 0 else []
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def run_backup() -> list[dict]:
+    """Снять согласованные копии основной и архивной БД и почистить старые снимки."""
+    if not os.path.exists(config.DATABASE_PATH):
+        return []
+    os.makedirs(config.BACKUP_DIR, exist_ok=True)
+    results = backup_databases(config.DATABASE_PATH, config.ARCHIVE_DATABASE_PATH, config.BACKUP_DIR)
+    for source in (config.DATABASE_PATH, config.ARCHIVE_DATABASE_PATH):
+        rotate(config.BACKUP_DIR, os.path.splitext(os.path.basename(source))[0], config.BACKUP_KEEP)
+    return results
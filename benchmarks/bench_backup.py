@@ -0,0 +1,103 @@
+"""Бенчмарк: задержка «обработчиков» во время горячего бэкапа.
+
+Пока в потоке снимается копия БД, в цикле событий крутится смесь запросов,
+как у бота: чтение истории и запись подхода через общее соединение.
+Сравниваются три режима: без бэкапа, бэкап целиком за один шаг
+(pages=-1, как простое копирование) и пошаговый backup.backup_databases.
+
+Запуск из корня репозитория: python benchmarks/bench_backup.py [подходов]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+TMP_DIR = tempfile.mkdtemp()
+config.DATABASE_PATH = os.path.join(TMP_DIR, "bench.db")
+config.ARCHIVE_DATABASE_PATH = os.path.join(TMP_DIR, "bench_archive.db")
+
+import backup
+import database as db
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+USERS = 200
+
+
+async def populate():
+    await db.init_db()
+    exercise_ids = [await db.create_exercise(f"Упражнение {i}") for i in range(50)]
+    batch = []
+    for i in range(ROWS):
+        batch.append((i % USERS, exercise_ids[i % 50], 40 + i % 30, 8 + i % 5, i % 4 + 1, f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}"))
+        if len(batch) == 50000:
+            await db.insert_workout_logs_bulk(batch)
+            batch.clear()
+    await db.insert_workout_logs_bulk(batch)
+    return exercise_ids
+
+
+async def workload(exercise_ids, done: asyncio.Event) -> list[float]:
+    """Запросы «обработчиков» до завершения done; задержка каждого в мс."""
+    latencies = []
+    i = 0
+    while not done.is_set():
+        start = time.perf_counter()
+        if i % 4 == 0:
+            await db.log_workout(i % USERS, exercise_ids[i % 50], 60, 10, "2026-10-19")
+        else:
+            await db.get_exercise_history(i % USERS, exercise_ids[i % 50], limit=20)
+        latencies.append((time.perf_counter() - start) * 1e3)
+        i += 1
+        await asyncio.sleep(0.002)
+    return latencies
+
+
+async def measure(label: str, exercise_ids, job):
+    done = asyncio.Event()
+    task = asyncio.create_task(workload(exercise_ids, done))
+    result = await asyncio.to_thread(job)
+    done.set()
+    latencies = sorted(await task)
+    p99 = latencies[int(len(latencies) * 0.99)]
+    print(f"{label:<16}{len(latencies):>8}{statistics.median(latencies):>10.2f}{p99:>10.2f}{latencies[-1]:>10.1f}")
+    return result
+
+
+def idle():
+    time.sleep(3)
+
+
+def full_copy():
+    return backup.backup_databases(config.DATABASE_PATH, None, tempfile.mkdtemp(dir=TMP_DIR), pages=-1)[0]
+
+
+def stepwise():
+    return backup.backup_databases(config.DATABASE_PATH, None, tempfile.mkdtemp(dir=TMP_DIR))[0]
+
+
+async def main():
+    exercise_ids = await populate()
+    size_mb = os.path.getsize(config.DATABASE_PATH) / 1e6
+    print(f"database: {ROWS} sets, {size_mb:.0f} MB\n")
+    print(f"{'mode':<16}{'queries':>8}{'p50, ms':>10}{'p99, ms':>10}{'max, ms':>10}")
+    try:
+        await measure("no backup", exercise_ids, idle)
+        await measure("single step", exercise_ids, full_copy)
+        result = await measure("stepwise", exercise_ids, stepwise)
+    finally:
+        await db.close_connection()
+    print(
+        f"\nstepwise backup: {result['seconds']:.1f} s, {result['steps']} steps of "
+        f"{backup.PAGES_PER_STEP} pages, step avg {result['step_avg_ms']:.2f} ms, "
+        f"max {result['step_max_ms']:.2f} ms, snapshot {result['size'] / 1e6:.0f} MB"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
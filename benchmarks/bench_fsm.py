@@ -0,0 +1,78 @@
+"""Бенчмарк: память FSM при долгой работе — MemoryStorage против BoundedMemoryStorage.
+
+Симуляция: каждый пользователь присылает несколько апдейтов (чтение состояния),
+часть начинает диалог с данными (как GenerateExercises с selected_muscles),
+половина диалогов брошена. Время идёт по «часам» симуляции, по ним же
+запускается sweep().
+
+Запуск из корня репозитория: python benchmarks/bench_fsm.py [пользователей]
+"""
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+import fsm_storage
+from fsm_storage import BoundedMemoryStorage
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+BOT_ID = 1
+# Новых пользователей в симулированный час
+USERS_PER_HOUR = 500
+SWEEP_EVERY_HOURS = 1
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+async def simulate(storage, clock: FakeClock) -> float:
+    start = time.perf_counter()
+    for user_id in range(USERS):
+        clock.now = user_id / USERS_PER_HOUR * 3600
+        key = StorageKey(bot_id=BOT_ID, chat_id=user_id, user_id=user_id)
+        for _ in range(3):
+            await storage.get_state(key)
+        if user_id % 10 == 0:
+            await storage.set_state(key, "GenerateExercises:waiting_for_muscles")
+            await storage.set_data(key, {"selected_muscles": {"грудь", "спина", "ноги"}, "page": 1, "message_id": user_id})
+            if user_id % 20 == 0:
+                # Диалог завершён
+                await storage.set_state(key, None)
+                await storage.set_data(key, {})
+        if isinstance(storage, BoundedMemoryStorage) and user_id % (USERS_PER_HOUR * SWEEP_EVERY_HOURS) == 0:
+            storage.sweep()
+    return time.perf_counter() - start
+
+
+async def measure(name: str, make):
+    clock = FakeClock()
+    fsm_storage.time = clock  # sweep/_get берут время через модуль time
+    tracemalloc.start()
+    storage = make()
+    elapsed = await simulate(storage, clock)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    ops = USERS * 3 + USERS // 10 * 2 + USERS // 20 * 2
+    print(f"{name:<22}{len(storage.storage):>10}{current / 1e6:>12.1f}{peak / 1e6:>12.1f}{elapsed / ops * 1e6:>10.2f}")
+
+
+async def main():
+    print(f"users: {USERS}, {USERS_PER_HOUR}/hour ({USERS / USERS_PER_HOUR / 24:.1f} days of uptime)")
+    print(f"{'storage':<22}{'records':>10}{'now, MB':>12}{'peak, MB':>12}{'op, us':>10}")
+    await measure("MemoryStorage", MemoryStorage)
+    await measure("BoundedMemoryStorage", BoundedMemoryStorage)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
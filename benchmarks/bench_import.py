@@ -0,0 +1,76 @@
+"""Бенчмарк: импорт 1 000 000 строк истории (CSV в формате Strong).
+
+Запуск из корня репозитория: python benchmarks/bench_import.py [строк]
+"""
+import asyncio
+import csv
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+TMP_DIR = tempfile.mkdtemp()
+config.DATABASE_PATH = os.path.join(TMP_DIR, "bench.db")
+config.ARCHIVE_DATABASE_PATH = os.path.join(TMP_DIR, "bench_archive.db")
+
+import database as db
+from importer import import_history
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+LIBRARY = [f"Упражнение {i}" for i in range(60)]
+# Часть названий в файле записана иначе, часть отсутствует в библиотеке
+FILE_NAMES = LIBRARY + [f"упражнение  {i}." for i in range(20)] + [f"Кардио {i}" for i in range(10)]
+
+
+def write_csv(path: str):
+    start = date(2015, 1, 1)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["Date", "Workout Name", "Exercise Name", "Set Order", "Weight", "Reps", "Seconds"])
+        for i in range(ROWS):
+            day = start + timedelta(days=i // 40)
+            name = FILE_NAMES[(i // 4) % len(FILE_NAMES)]
+            if name.startswith("Кардио"):
+                writer.writerow([f"{day} 08:00:00", "W", name, 1, "", "", 1200])
+            else:
+                writer.writerow([f"{day} 08:00:00", "W", name, i % 4 + 1, 40 + i % 30, 8 + i % 5, ""])
+
+
+async def main():
+    await db.init_db()
+    for name in LIBRARY:
+        await db.create_exercise(name)
+
+    path = os.path.join(TMP_DIR, "strong.csv")
+    write_csv(path)
+    size_mb = os.path.getsize(path) / 1e6
+
+    progress_calls = 0
+
+    async def on_progress(count):
+        nonlocal progress_calls
+        progress_calls += 1
+
+    start = time.perf_counter()
+    stats = await import_history(1, path, "strong.csv", on_progress)
+    elapsed = time.perf_counter() - start
+
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"rows:        {ROWS} ({size_mb:.0f} MB)")
+    print(f"result:      {stats}")
+    print(f"time:        {elapsed:.1f} s ({ROWS / elapsed:,.0f} rows/s)")
+    print(f"chunks:      {progress_calls}")
+    print(f"max RSS:     {rss_mb:.0f} MB")
+
+    await db.close_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,59 @@
+"""Бенчмарк: стоимость сборки клавиатур на один апдейт.
+
+Запуск из корня репозитория: python benchmarks/bench_keyboards.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram.types import InlineKeyboardButton
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+import keyboards as kb
+
+N = 2000
+
+STATIC = [
+    ("main_menu_kb", (True,)),
+    ("admin_menu_kb", (True,)),
+    ("admin_panel_kb", ()),
+    ("weight_kb", (100,)),
+    ("reps_kb", ()),
+    ("sets_kb", ()),
+    ("date_select_kb", (True,)),
+    ("exercise_detail_kb", (12, 3, False, 13, 10)),
+    ("after_log_kb", (12, 13, 3, 10)),
+]
+
+
+def per_call_us(fn, args) -> float:
+    return timeit.timeit(lambda: fn(*args), number=N) / N * 1e6
+
+
+def builder_exercises_kb(exercises, day_id):
+    """Старый способ: InlineKeyboardBuilder на каждый вызов."""
+    builder = InlineKeyboardBuilder()
+    for i, ex in enumerate(exercises):
+        builder.row(InlineKeyboardButton(text=f"{i+1}. {ex['name']}", callback_data=f"exercise:{ex['id']}:{day_id}"))
+    builder.row(InlineKeyboardButton(text="« Назад", callback_data=f"back_to_days:{day_id}"))
+    return builder.as_markup()
+
+
+def main():
+    print(f"{'keyboard':<22}{'builder, us':>14}{'cached, us':>14}")
+    for name, args in STATIC:
+        fn = getattr(kb, name)
+        uncached = per_call_us(fn.__wrapped__, args)
+        cached = per_call_us(fn, args)
+        print(f"{name:<22}{uncached:>14.1f}{cached:>14.2f}")
+
+    exercises = [{"id": i, "name": f"Упражнение {i}"} for i in range(15)]
+    old = per_call_us(builder_exercises_kb, (exercises, 3))
+    new = per_call_us(kb.exercises_kb, (exercises, 3))
+    print(f"{'exercises_kb (15)':<22}{old:>14.1f}{new:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Бенчмарк: стандартный цикл событий против uvloop и работа loop_monitor.
+
+Нагрузка похожа на бота: конкурентные «апдейты», каждый читает из БД
+упражнение, программу и последние подходы. Рядом работает loop_monitor;
+в середине прогона один апдейт блокирует цикл (time.sleep) — сторож должен
+записать в лог его стек.
+
+Запуск из корня репозитория: python benchmarks/bench_loop.py [апдейтов]
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+TMP_DIR = tempfile.mkdtemp()
+config.DATABASE_PATH = os.path.join(TMP_DIR, "bench.db")
+config.ARCHIVE_DATABASE_PATH = os.path.join(TMP_DIR, "bench_archive.db")
+config.LOOP_LAG_INTERVAL_MS = 20
+config.LOOP_LAG_THRESHOLD_MS = 100
+
+import database as db
+import loop_monitor
+import metrics
+
+UPDATES = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+CONCURRENCY = 50
+BLOCK_SECONDS = 0.3
+DATE = "2026-10-19"
+
+
+class StackCounter(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.stacks = []
+
+    def emit(self, record):
+        self.stacks.append(record.getMessage())
+
+
+async def fill():
+    await db.init_db()
+    program_id = await db.create_program("Программа")
+    day_id = await db.create_day(program_id, 1, "День 1")
+    for i in range(20):
+        exercise_id = await db.create_exercise(f"Упражнение {i}")
+        await db.add_exercise_to_day(exercise_id, day_id)
+    await db.insert_workout_logs_bulk([
+        (user_id, exercise_id, 50, 10, set_num, DATE)
+        for user_id in range(CONCURRENCY) for exercise_id in range(1, 21) for set_num in (1, 2, 3)
+    ])
+    await db.close_connection()
+
+
+def blocking_call():
+    time.sleep(BLOCK_SECONDS)
+
+
+async def update(n: int):
+    user_id = n % CONCURRENCY
+    exercise_id = n % 20 + 1
+    await db.get_exercise(exercise_id)
+    await db.get_program(1)
+    await db.get_exercise_history(user_id, exercise_id, 5)
+    if n == UPDATES // 2:
+        blocking_call()
+
+
+async def workload() -> float:
+    metrics.loop_lag = metrics.Histogram()
+    # Соединение — до апдейтов, как в bot.py (иначе каждый воркер откроет своё)
+    await db.warmup()
+    monitor = asyncio.create_task(loop_monitor.run_loop_monitor())
+    queue = iter(range(UPDATES))
+
+    async def worker():
+        for n in queue:
+            await update(n)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - start
+    monitor.cancel()
+    await db.close_connection()
+    return elapsed
+
+
+def measure(name: str, run):
+    counter = StackCounter()
+    logging.getLogger("loop_monitor").addHandler(counter)
+    elapsed = run(workload())
+    logging.getLogger("loop_monitor").removeHandler(counter)
+    lag = metrics.loop_lag
+    caught = any("blocking_call" in stack for stack in counter.stacks)
+    print(
+        f"{name:<10}{UPDATES / elapsed:>12,.0f}{lag.quantile(0.5):>9.0f}{lag.quantile(0.99):>9.0f}"
+        f"{lag.max:>9.0f}   {len(counter.stacks)} stack(s), blocking_call found: {caught}"
+    )
+
+
+def main():
+    # Стеки сторожа не печатать, а считать (StackCounter)
+    logging.getLogger("loop_monitor").setLevel(logging.WARNING)
+    logging.getLogger("loop_monitor").propagate = False
+    asyncio.run(fill())
+    print(f"updates: {UPDATES}, concurrency {CONCURRENCY}, one {BLOCK_SECONDS * 1e3:.0f} ms block")
+    print(f"{'loop':<10}{'updates/s':>12}{'lag p50':>9}{'lag p99':>9}{'lag max':>9}   watchdog")
+    measure("asyncio", asyncio.run)
+    try:
+        import uvloop
+    except ImportError:
+        print("uvloop     not installed")
+    else:
+        measure("uvloop", uvloop.run)
+
+
+if __name__ == "__main__":
+    main()
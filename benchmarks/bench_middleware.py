@@ -0,0 +1,102 @@
+"""Бенчмарк: накладные расходы AccessMiddleware на один апдейт.
+
+Сравнивает прежнюю проверку (FSM-состояние + запрос в БД на каждый апдейт)
+с текущей (кэш разрешённых пользователей).
+
+Запуск из корня репозитория: python benchmarks/bench_middleware.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+TMP_DIR = tempfile.mkdtemp()
+config.DATABASE_PATH = os.path.join(TMP_DIR, "bench.db")
+config.ARCHIVE_DATABASE_PATH = os.path.join(TMP_DIR, "bench_archive.db")
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Chat, Message, User
+
+import database as db
+from middleware import AccessMiddleware
+
+N = 20000
+USER_ID = 111
+
+
+class OldAccessMiddleware(BaseMiddleware):
+    """Прежняя версия: подстроки по состоянию и запрос в БД."""
+
+    async def __call__(self, handler, event, data):
+        user_id = event.from_user.id
+        if event.text and event.text.startswith("/start"):
+            return await handler(event, data)
+        state = data.get("state")
+        if state:
+            current_state = await state.get_state()
+            if current_state and ("AccessState" in current_state or "CustomMode" in current_state or "LogWorkout" in current_state or "EditExerciseTag" in current_state or "GenerateExercises" in current_state):
+                return await handler(event, data)
+        if user_id == config.ADMIN_ID:
+            return await handler(event, data)
+        if await old_is_user_allowed(user_id):
+            return await handler(event, data)
+        return None
+
+
+async def old_is_user_allowed(user_id: int) -> bool:
+    """Прежняя проверка доступа: запрос в БД без кэша."""
+    async with db.get_db() as conn:
+        cursor = await conn.execute("SELECT 1 FROM allowed_users WHERE user_id = ?", (user_id,))
+        return await cursor.fetchone() is not None
+
+
+async def noop_handler(event, data):
+    return None
+
+
+async def run(middleware, message, data) -> float:
+    start = time.perf_counter()
+    for _ in range(N):
+        await middleware(noop_handler, message, data)
+    return (time.perf_counter() - start) / N * 1e6
+
+
+async def main():
+    await db.init_db()
+    await db.add_allowed_user(USER_ID, "bench", "Bench")
+
+    message = Message(
+        message_id=1,
+        date=datetime.now(),
+        chat=Chat(id=USER_ID, type="private"),
+        from_user=User(id=USER_ID, is_bot=False, first_name="Bench"),
+        text="💪 Тренировка",
+    )
+    storage = MemoryStorage()
+    state = FSMContext(storage, StorageKey(bot_id=1, chat_id=USER_ID, user_id=USER_ID))
+    data = {"state": state}
+
+    baseline = await run(lambda h, e, d: h(e, d), message, data)
+
+    old_cost = await run(OldAccessMiddleware(), message, data)
+    new_cost = await run(AccessMiddleware(), message, data)
+
+    print(f"{'variant':<28}{'us/update':>12}")
+    print(f"{'no middleware':<28}{baseline:>12.2f}")
+    print(f"{'old (FSM + DB)':<28}{old_cost:>12.2f}")
+    print(f"{'new (cached allowed)':<28}{new_cost:>12.2f}")
+
+    await db.close_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
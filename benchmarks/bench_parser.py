@@ -0,0 +1,133 @@
+"""Бенчмарк и фазз-проверка разбора ввода упражнений (workout_parser).
+
+1. Время разбора одной строки: прежний parse_exercise_input против грамматики.
+2. Рост времени на длинных строках: у прежних шаблонов — квадратичный из-за
+   возвратов, у грамматики — линейный.
+3. Фазз: случайные строки не должны ронять разбор, результат — корректной формы.
+
+Запуск из корня репозитория: python benchmarks/bench_parser.py
+"""
+import os
+import random
+import re
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from workout_parser import parse_line
+
+N = 20000
+FUZZ_CASES = 50000
+
+LINES = [
+    "жим лежа 90кг 15х4",
+    "жим 90 15x4",
+    "бег 50мин",
+    "ходьба 1 час",
+    "подтягивания",
+]
+
+# Фазз собирает строки из «похожих» токенов, чтобы заметная часть разбиралась
+FUZZ_TOKENS = ["жим", "тяга", "бег", "10", "8", "22,5", "0", "3.5", "x", "х", "×", "*", "@", "-", "+",
+               "кг", "lb", "мин", "ч", "сек", "rpe", "(", ":", "."]
+
+# Строки, которые старый парсер не принимал и новый принимать не должен
+REJECTED = [
+    "жим гантелей 2x20 10х3",
+    "бег 0 мин",
+    "бег 0 ч 0 мин",
+]
+
+
+def old_parse(text: str) -> dict | None:
+    """Прежний parse_exercise_input: два шаблона через re.match на каждый вызов."""
+    text = text.strip()
+
+    time_pattern = r'^(.+?)\s+(\d+(?:[.,]\d+)?)\s*(час|ч|минут|мин|м).*$'
+    time_match = re.match(time_pattern, text, re.IGNORECASE)
+
+    if time_match:
+        name = time_match.group(1).strip()
+        value = float(time_match.group(2).replace(',', '.'))
+        unit = time_match.group(3).lower()
+
+        if unit in ('час', 'ч'):
+            duration = int(value * 60)
+        else:
+            duration = int(value)
+
+        return {"type": "cardio", "name": name, "duration": duration}
+
+    strength_pattern = r'^(.+?)\s+(\d+(?:[.,]\d+)?)\s*(?:кг)?\s+(\d+)\s*(?:[xхXХ×*]\s*(\d+))?$'
+    strength_match = re.match(strength_pattern, text, re.IGNORECASE)
+
+    if strength_match:
+        name = strength_match.group(1).strip()
+        weight = float(strength_match.group(2).replace(',', '.'))
+        reps = int(strength_match.group(3))
+        sets = int(strength_match.group(4)) if strength_match.group(4) else 1
+        return {"type": "strength", "name": name, "weight": weight, "reps": reps, "sets": sets}
+
+    return None
+
+
+def per_line():
+    print(f"{'line':<24}{'old, us':>10}{'new, us':>10}")
+    for line in LINES:
+        old = min(timeit.repeat(lambda: old_parse(line), number=N, repeat=5)) / N * 1e6
+        new = min(timeit.repeat(lambda: parse_line(line), number=N, repeat=5)) / N * 1e6
+        print(f"{line:<24}{old:>10.2f}{new:>10.2f}")
+
+
+def scaling():
+    # Строки, на которых прежние шаблоны уходят в возвраты: длинные серии пробелов
+    # и цифр, после которых строка всё равно не подходит
+    families = {
+        "spaces": lambda n: "жим" + " " * n + "1 конец",
+        "digits": lambda n: "жим " + "1" * n + " конец",
+        "numbers": lambda n: "жим" + " 1" * n + " конец",
+    }
+    print(f"\n{'input':<10}{'length':>8}{'old, ms':>10}{'new, ms':>10}")
+    for family, make in families.items():
+        for n in (500, 1000, 2000, 4000):
+            line = make(n)
+            start = time.perf_counter()
+            old_parse(line)
+            old = (time.perf_counter() - start) * 1e3
+            start = time.perf_counter()
+            parse_line(line)
+            new = (time.perf_counter() - start) * 1e3
+            print(f"{family:<10}{len(line):>8}{old:>10.2f}{new:>10.2f}")
+
+
+def fuzz():
+    rng = random.Random(42)
+    parsed = 0
+    for _ in range(FUZZ_CASES):
+        line = "".join(rng.choice(FUZZ_TOKENS) + rng.choice(("", " ", " ", "  ")) for _ in range(rng.randint(0, 12)))
+        result = parse_line(line)
+        if result is None:
+            continue
+        parsed += 1
+        for entry in result:
+            assert entry["name"], line
+            if entry["type"] == "strength":
+                assert entry["reps"] > 0 and entry["sets"] > 0 and entry["weight"] >= 0, line
+            else:
+                assert entry["type"] == "cardio" and entry["duration"] >= 1, line
+    print(f"\nfuzz: {FUZZ_CASES} lines, {parsed} parsed, no errors")
+
+
+def rejected():
+    for line in REJECTED:
+        assert parse_line(line) is None, line
+    print(f"\nrejected: {len(REJECTED)} lines, all None")
+
+
+if __name__ == "__main__":
+    per_line()
+    scaling()
+    fuzz()
+    rejected()
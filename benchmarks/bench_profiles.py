@@ -0,0 +1,113 @@
+"""Бенчмарк: профили настроек SQLite (database.DB_PROFILES) и прогрев.
+
+Для каждого профиля на одной и той же БД:
+- запись подхода с коммитом на каждую запись (как log_workout из обработчика);
+- чтение истории упражнения для случайных пользователей;
+- агрегат по всей таблице с группировкой (get_exercise_usage, рекомендации);
+- первые запросы после открытия соединения без прогрева и после warmup().
+
+Запуск из корня репозитория: python benchmarks/bench_profiles.py [подходов]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+TMP_DIR = tempfile.mkdtemp()
+config.DATABASE_PATH = os.path.join(TMP_DIR, "bench.db")
+config.ARCHIVE_DATABASE_PATH = os.path.join(TMP_DIR, "bench_archive.db")
+
+import database as db
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+USERS = 500
+EXERCISES = 100
+WRITES = 500
+READS = 5000
+FIRST_READS = 50
+
+
+async def populate() -> list[int]:
+    await db.init_db()
+    exercise_ids = []
+    for i in range(EXERCISES):
+        exercise_id = await db.create_exercise(f"Упражнение {i}")
+        await db.update_exercise_tag(exercise_id, f"тег {i % 10}")
+        exercise_ids.append(exercise_id)
+    rng = random.Random(1)
+    batch = []
+    for i in range(ROWS):
+        batch.append((
+            rng.randrange(USERS), rng.choice(exercise_ids), 40 + i % 30, 8 + i % 5, i % 4 + 1,
+            f"2026-{i % 9 + 1:02d}-{i % 28 + 1:02d}"
+        ))
+        if len(batch) == 50000:
+            await db.insert_workout_logs_bulk(batch)
+            batch.clear()
+    await db.insert_workout_logs_bulk(batch)
+    await db.close_connection()
+    return exercise_ids
+
+
+async def reads(exercise_ids, count: int, seed: int) -> float:
+    """Среднее время чтения истории, мкс."""
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for _ in range(count):
+        await db.get_exercise_history(rng.randrange(USERS), rng.choice(exercise_ids), limit=20)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+async def bench_profile(profile: str, exercise_ids) -> tuple:
+    db.DB_PROFILE = profile
+
+    # Первые запросы после открытия соединения: без прогрева и с прогревом
+    await db.close_connection()
+    await db.get_connection()
+    cold = await reads(exercise_ids, FIRST_READS, seed=2)
+    await db.close_connection()
+    await db.get_connection()
+    start = time.perf_counter()
+    await db.warmup()
+    warmup_ms = (time.perf_counter() - start) * 1e3
+    warmed = await reads(exercise_ids, FIRST_READS, seed=3)
+
+    start = time.perf_counter()
+    for i in range(WRITES):
+        await db.log_workout(i % USERS, exercise_ids[i % EXERCISES], 60, 10, "2026-10-19")
+    write = (time.perf_counter() - start) / WRITES * 1e6
+
+    read = await reads(exercise_ids, READS, seed=4)
+
+    start = time.perf_counter()
+    for user_id in range(5):
+        await db.get_exercise_usage(user_id)
+    usage = (time.perf_counter() - start) / 5 * 1e3
+
+    return write, read, usage, cold, warmed, warmup_ms
+
+
+async def main():
+    exercise_ids = await populate()
+    size_mb = os.path.getsize(config.DATABASE_PATH) / 1e6
+    print(f"database: {ROWS} sets, {size_mb:.0f} MB\n")
+    print(
+        f"{'profile':<10}{'write, us':>11}{'read, us':>10}{'usage, ms':>11}"
+        f"{'cold, us':>10}{'warm, us':>10}{'warmup, ms':>12}"
+    )
+    try:
+        for profile in db.DB_PROFILES:
+            write, read, usage, cold, warmed, warmup_ms = await bench_profile(profile, exercise_ids)
+            print(f"{profile:<10}{write:>11.0f}{read:>10.0f}{usage:>11.1f}{cold:>10.0f}{warmed:>10.0f}{warmup_ms:>12.1f}")
+    finally:
+        await db.close_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
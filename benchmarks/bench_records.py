@@ -0,0 +1,99 @@
+"""Бенчмарк: память и доступ к полям — sqlite3.Row, dict(row) и записи records.
+
+Выборка подходов (CustomLog) и упражнений (Exercise) тем же запросом, что
+в database.py, тремя способами: память — tracemalloc после выборки (вместе со
+значениями полей), время выборки — лучшее из трёх, доступ — чтение трёх полей
+у каждой строки.
+
+Запуск из корня репозитория: python benchmarks/bench_records.py [строк]
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+TMP_DIR = tempfile.mkdtemp()
+config.DATABASE_PATH = os.path.join(TMP_DIR, "bench.db")
+config.ARCHIVE_DATABASE_PATH = os.path.join(TMP_DIR, "bench_archive.db")
+
+import database as db
+from records import CustomLog, Exercise
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+EXERCISES = 2000
+DATE = "2026-10-19"
+
+
+async def fill():
+    await db.init_db()
+    await db.insert_custom_logs_bulk([
+        (1, f"Упражнение {i % 50}", 40 + i % 30, 8 + i % 5, None, i // 50 + 1, DATE) for i in range(ROWS)
+    ])
+    await db.add_library_exercises([
+        {"name": f"Упражнение {i}", "description": "Описание упражнения", "muscle": "грудь"} for i in range(EXERCISES)
+    ])
+    await db.close_connection()
+
+
+def fetch(conn, sql: str, params: tuple, mode: str, record: type) -> list:
+    cursor = conn.execute(sql, params)
+    if mode == "sqlite3.Row":
+        cursor.row_factory = sqlite3.Row
+        return cursor.fetchall()
+    if mode == "dict":
+        cursor.row_factory = sqlite3.Row
+        return [dict(row) for row in cursor.fetchall()]
+    cursor.row_factory = record.from_row
+    return cursor.fetchall()
+
+
+def measure(conn, title: str, sql: str, params: tuple, record: type, fields: tuple):
+    print(f"\n{title}")
+    print(f"{'rows as':<14}{'bytes/row':>11}{'fetch, ms':>11}{'access, ns':>12}")
+    for mode in ("sqlite3.Row", "dict", "record"):
+        fetch_ms = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            rows = fetch(conn, sql, params, mode, record)
+            fetch_ms = min(fetch_ms, (time.perf_counter() - start) * 1e3)
+            del rows
+
+        # Память — отдельным прогоном: tracemalloc сильно замедляет выборку
+        tracemalloc.start()
+        rows = fetch(conn, sql, params, mode, record)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        if mode == "record":
+            a, b, c = fields
+            for row in rows:
+                getattr(row, a), getattr(row, b), getattr(row, c)
+        else:
+            for row in rows:
+                for field in fields:
+                    row[field]
+        access_ns = (time.perf_counter() - start) / len(rows) / len(fields) * 1e9
+        print(f"{mode:<14}{current / len(rows):>11.0f}{fetch_ms:>11.1f}{access_ns:>12.1f}")
+        del rows
+
+
+def main():
+    asyncio.run(fill())
+    conn = sqlite3.connect(config.DATABASE_PATH)
+    measure(conn, f"custom_logs: {ROWS} rows", db._SQL_GET_TODAY_CUSTOM_LOGS, (1, DATE), CustomLog,
+            ("name", "weight", "reps"))
+    measure(conn, f"exercises: {EXERCISES} rows", db._SQL_GET_ALL_EXERCISES, (), Exercise,
+            ("name", "tag", "weight_type"))
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
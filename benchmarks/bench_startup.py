@@ -0,0 +1,85 @@
+"""Бенчмарк: холодный старт — импорт bot.py (-X importtime) и init_db.
+
+Импорт меряется в отдельном процессе без DEEPSEEK_API_KEY (как на сервере без
+AI): итог по bot и самые тяжёлые модули первого уровня. init_db — на новой
+БД и повторно на уже созданной с историей подходов (так проходит каждый
+перезапуск).
+
+Запуск из корня репозитория: python benchmarks/bench_startup.py [повторов]
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import config
+
+TMP_DIR = tempfile.mkdtemp()
+config.DATABASE_PATH = os.path.join(TMP_DIR, "bench.db")
+config.ARCHIVE_DATABASE_PATH = os.path.join(TMP_DIR, "bench_archive.db")
+
+import database as db
+
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+TOP = 8
+# Подходов в истории для повторного init_db
+LOGS = 200_000
+
+
+def import_profile() -> tuple[dict[str, int], set[str]]:
+    """({модуль: мкс с зависимостями} для bot и его прямых импортов, все импортированные модули)."""
+    env = {k: v for k, v in os.environ.items() if k != "DEEPSEEK_API_KEY"}
+    env.setdefault("BOT_TOKEN", "0:bench")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import bot"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    profile, loaded = {}, set()
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # заголовок
+        name = parts[2].rstrip()
+        loaded.add(name.strip())
+        # Отступ имени — глубина вложенности; нужны bot (0) и его прямые импорты (1)
+        if (len(name) - len(name.lstrip()) - 1) // 2 <= 1:
+            profile[name.strip()] = int(parts[1])
+    return profile, loaded
+
+
+async def init_timings() -> tuple[float, float]:
+    start = time.perf_counter()
+    await db.init_db()
+    fresh = time.perf_counter() - start
+    await db.insert_custom_logs_bulk([
+        (i % 100, f"Упражнение {i % 50}", 40 + i % 30, 8 + i % 5, None, i // 100 + 1, "2026-10-19")
+        for i in range(LOGS)
+    ])
+    repeat = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        await db.init_db()
+        repeat = min(repeat, time.perf_counter() - start)
+    await db.close_connection()
+    return fresh, repeat
+
+
+def main():
+    import_profile()  # прогреть __pycache__
+    best, loaded = min((import_profile() for _ in range(RUNS)), key=lambda run: run[0]["bot"])
+    print(f"import bot: {best['bot'] / 1e3:.0f} ms (best of {RUNS}), openai loaded: {'openai' in loaded}")
+    modules = sorted(((name, us) for name, us in best.items() if name != "bot"), key=lambda item: -item[1])
+    for name, us in modules[:TOP]:
+        print(f"  {name:<28}{us / 1e3:>8.1f} ms")
+
+    fresh, repeat = asyncio.run(init_timings())
+    print(f"init_db: new database {fresh * 1e3:.1f} ms, existing with {LOGS} logs {repeat * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,22 @@
+import time
+
+# Отсчёт фаз старта (см. log_startup) — до остальных импортов, чтобы учесть и их
+_started = _phase_started = time.perf_counter()
+_phases: list[tuple[str, float]] = []
+
 import asyncio
 import logging
 
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 
-from config import BOT_TOKEN
-from database import init_db, close_connection
-from middleware import AccessMiddleware
+from config import BOT_TOKEN, USE_UVLOOP
+from database import init_db, close_connection, warmup
+from fsm_storage import BoundedMemoryStorage
+from middleware import AccessMiddleware, UserOrderMiddleware
+from ai_service import preload as preload_ai
+from maintenance import run_archiver, run_backups, run_optimizer, run_orphan_collector, run_fsm_sweeper
+from loop_monitor import run_loop_monitor
+from callbacks import table as callback_table
 from handlers import (
     access_router,
     start_router,
@@ -16,6 +26,8 @@ from handlers import (
     admin_router,
     custom_router,
     ai_router,
+    export_router,
+    import_router,
 )
 
 logging.basicConfig(
@@ -25,14 +37,63 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def phase(name: str):
+    """Отметить конец фазы старта: время с предыдущей отметки."""
+    global _phase_started
+    now = time.perf_counter()
+    _phases.append((name, now - _phase_started))
+    _phase_started = now
+
+
+async def log_startup():
+    """Хук dp.startup: фазы и полное время от запуска процесса до первого опроса."""
+    phase("dispatcher")
+    logger.info(
+        "Started in %.0f ms on %s: %s",
+        (time.perf_counter() - _started) * 1e3,
+        type(asyncio.get_running_loop()).__module__,
+        ", ".join(f"{name} {seconds * 1e3:.0f} ms" for name, seconds in _phases)
+    )
+
+
+phase("imports")
+
+
 async def main():
     # Инициализация БД
     await init_db()
-    logger.info("Database initialized")
+    phase("init_db")
+    warmed = await warmup()
+    phase("warmup")
+    logger.info(
+        "Database warmed up: %d allowed users, %d index rows, %d statements",
+        warmed["allowed_users"], warmed["rows"], warmed["statements"]
+    )
+
+    # Состояния FSM в памяти с ограничением размера и сроком жизни
+    storage = BoundedMemoryStorage()
+
+    # Обслуживание в фоне: архив старых подходов, резервные копии, optimize,
+    # сборка строк-сирот, очистка брошенных диалогов FSM
+    background = [
+        asyncio.create_task(run_archiver()),
+        asyncio.create_task(run_backups()),
+        asyncio.create_task(run_optimizer()),
+        asyncio.create_task(run_orphan_collector()),
+        asyncio.create_task(run_fsm_sweeper(storage)),
+        # Клиент AI (импорт openai) — в потоке, не задерживая старт
+        asyncio.create_task(preload_ai()),
+        # Задержка цикла событий в metrics и стек при блокировке
+        asyncio.create_task(run_loop_monitor()),
+    ]
 
     # Создание бота и диспетчера
     bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher(storage=MemoryStorage())
+    dp = Dispatcher(storage=storage)
+    dp.startup.register(log_startup)
+
+    # Апдейты одного пользователя — по очереди, разных пользователей — параллельно
+    dp.update.outer_middleware(UserOrderMiddleware())
 
     # Middleware для проверки доступа
     dp.message.middleware(AccessMiddleware())
@@ -40,6 +101,11 @@ async def main():
 
     # Регистрация роутеров (access первый!)
     dp.include_router(access_router)
+    # Callback'и с параметрами — одной таблицей по префиксу
+    dp.include_router(callback_table.router)
+    # Команды до роутеров с FSM-вводом, чтобы их не перехватил ввод текста
+    dp.include_router(export_router)
+    dp.include_router(import_router)
     dp.include_router(start_router)
     dp.include_router(exercises_router)
     dp.include_router(tracking_router)
@@ -54,10 +120,29 @@ async def main():
     try:
         await dp.start_polling(bot)
     finally:
+        for task in background:
+            task.cancel()
         await close_connection()
         await bot.session.close()
         logger.info("Bot stopped, connections closed")
 
 
+def run():
+    """Запустить main() в стандартном цикле событий или в uvloop (USE_UVLOOP).
+
+    aiogram при импорте сам ставит политику uvloop, если пакет установлен, —
+    без USE_UVLOOP возвращаем стандартную.
+    """
+    if USE_UVLOOP:
+        try:
+            import uvloop
+        except ImportError:
+            logger.warning("USE_UVLOOP is set but uvloop is not installed, using asyncio loop")
+        else:
+            return uvloop.run(main())
+    asyncio.set_event_loop_policy(None)
+    return asyncio.run(main())
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run()
\ No newline at end of file
@@ -0,0 +1,266 @@
+"""Компактные callback_data и маршрутизация по префиксу за O(1).
+
+Вместо цепочки F.data.startswith(...) по всем роутерам callback'и с
+параметрами разбираются одной таблицей: префикс -> (класс данных, обработчик).
+"""
+import base64
+import hashlib
+
+from aiogram import Router
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.dispatcher.event.handler import CallableObject, FilterObject
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery
+
+
+# ==================== CALLBACK DATA ====================
+
+class ExerciseCB(CallbackData, prefix="e"):
+    """Карточка упражнения. tag — ключ тега, если открыто из списка по тегу."""
+    id: int
+    day_id: int = 0
+    tag: str | None = None
+
+
+class DayCB(CallbackData, prefix="d"):
+    """Упражнения дня."""
+    id: int
+
+
+class DaysCB(CallbackData, prefix="bd"):
+    """Назад к списку дней программы, в которой есть этот день."""
+    day_id: int
+
+
+class TagCB(CallbackData, prefix="t"):
+    """Упражнения по тегу (ключ тега, см. tag_key)."""
+    key: str
+
+
+class LogCB(CallbackData, prefix="l"):
+    """Записать подход. day_id=0 — упражнение открыто не из дня."""
+    exercise_id: int
+    day_id: int = 0
+
+
+class HistoryCB(CallbackData, prefix="h"):
+    """История упражнения."""
+    exercise_id: int
+
+
+class MoveCB(CallbackData, prefix="m"):
+    """Переместить упражнение в дне: -1 вверх, 1 вниз."""
+    exercise_id: int
+    day_id: int
+    direction: int
+
+
+class QuickCustomCB(CallbackData, prefix="qc"):
+    """Быстрый выбор своего упражнения из последних (ключ названия, см. tag_key)."""
+    key: str
+
+
+class UserWeightTypeCB(CallbackData, prefix="uwt"):
+    """Тип веса своего упражнения: 0 — без веса, 10 — гантели, 100 — штанга."""
+    weight_type: int
+
+
+class ProgramCB(CallbackData, prefix="p"):
+    """Дни программы (просмотр)."""
+    id: int
+
+
+class StartProgramCB(CallbackData, prefix="sp"):
+    """Начать программу."""
+    program_id: int
+
+
+class MuscleCB(CallbackData, prefix="mu"):
+    """Отметить группу мышц для подбора (ключ из MUSCLE_GROUPS)."""
+    key: str
+
+
+# Запись подхода
+
+class DateCB(CallbackData, prefix="dt"):
+    """Дата подхода: today, yesterday или custom (ввести вручную)."""
+    choice: str
+
+
+class WeightCB(CallbackData, prefix="w"):
+    """Быстрый выбор веса."""
+    weight: float
+
+
+class RepsCB(CallbackData, prefix="r"):
+    """Быстрый выбор повторений."""
+    reps: int
+
+
+class SetsCB(CallbackData, prefix="s"):
+    """Быстрый выбор числа подходов."""
+    sets: int
+
+
+class RecordDateCB(CallbackData, prefix="rd"):
+    """Дата записи из меню: today, yesterday или custom."""
+    choice: str
+
+
+class RecordExerciseCB(CallbackData, prefix="rx"):
+    """Упражнение для записи из меню."""
+    exercise_id: int
+
+
+# Управление (админ)
+
+class WeightTypeCB(CallbackData, prefix="wt"):
+    """Тип веса упражнения библиотеки: 0 — без веса, 10 — гантели, 100 — штанга."""
+    weight_type: int
+
+
+class LibExerciseCB(CallbackData, prefix="le"):
+    """Упражнение в библиотеке."""
+    id: int
+
+
+class AddToDayCB(CallbackData, prefix="ad"):
+    """Выбрать день, в который добавить упражнение из библиотеки."""
+    exercise_id: int
+
+
+class LinkExerciseCB(CallbackData, prefix="lk"):
+    """Добавить упражнение в день."""
+    exercise_id: int
+    day_id: int
+
+
+class DeleteLibExerciseCB(CallbackData, prefix="dl"):
+    """Подтверждение удаления упражнения из библиотеки."""
+    exercise_id: int
+
+
+class DoDeleteLibExerciseCB(CallbackData, prefix="xl"):
+    """Удалить упражнение из библиотеки (подтверждено)."""
+    exercise_id: int
+
+
+class DayProgramCB(CallbackData, prefix="ndp"):
+    """Программа для нового дня."""
+    program_id: int
+
+
+class ExerciseProgramCB(CallbackData, prefix="nep"):
+    """Программа для нового упражнения."""
+    program_id: int
+
+
+class ExerciseDayCB(CallbackData, prefix="ned"):
+    """День для нового упражнения."""
+    day_id: int
+
+
+class DeleteProgramCB(CallbackData, prefix="dlp"):
+    """Подтверждение удаления программы."""
+    program_id: int
+
+
+class DoDeleteProgramCB(CallbackData, prefix="xp"):
+    """Удалить программу (подтверждено)."""
+    program_id: int
+
+
+class DeleteDayProgramCB(CallbackData, prefix="ddp"):
+    """Программа, из которой удалить день."""
+    program_id: int
+
+
+class DoDeleteDayCB(CallbackData, prefix="xd"):
+    """Удалить день."""
+    day_id: int
+
+
+class DeleteExerciseProgramCB(CallbackData, prefix="dep"):
+    """Программа, из дня которой удалить упражнение."""
+    program_id: int
+
+
+class DeleteExerciseDayCB(CallbackData, prefix="ded"):
+    """День, из которого удалить упражнение."""
+    day_id: int
+
+
+class DoDeleteExerciseCB(CallbackData, prefix="xe"):
+    """Удалить упражнение."""
+    exercise_id: int
+
+
+class RemoveUserCB(CallbackData, prefix="ru"):
+    """Убрать пользователя из списка доступа."""
+    user_id: int
+
+
+class EditTagsCB(CallbackData, prefix="et"):
+    """Изменить тег упражнения."""
+    exercise_id: int
+
+
+class RemoveTagCB(CallbackData, prefix="rt"):
+    """Убрать тег у упражнения."""
+    exercise_id: int
+
+
+def tag_key(tag: str) -> str:
+    """Короткий ключ тега для callback_data (8 символов вместо имени).
+
+    Telegram ограничивает callback_data 64 байтами, а кириллица — 2 байта на символ.
+    """
+    digest = hashlib.blake2b(tag.encode(), digest_size=6).digest()
+    return base64.urlsafe_b64encode(digest).decode()
+
+
+# ==================== ROUTING ====================
+
+class CallbackTable:
+    """Таблица обработчиков callback'ов по префиксу.
+
+    Роутер table.router нужно подключать к диспетчеру первым: он ловит только
+    зарегистрированные префиксы, остальные callback'и идут дальше как обычно.
+    """
+
+    def __init__(self):
+        self._handlers: dict[str, tuple] = {}
+        self.router = Router(name="callback_table")
+        self.router.callback_query.register(self._dispatch, self._match)
+
+    def handler(self, cb_class: type[CallbackData], *filters):
+        """Декоратор: зарегистрировать обработчик для класса callback_data.
+
+        filters — дополнительные проверки, как у обычного роутера: IsAdmin(),
+        StateFilter(...) и т. п. Получают callback и нужные им данные апдейта
+        (raw_state и др.).
+        """
+        def decorator(func):
+            prefix = cb_class.__prefix__
+            if prefix in self._handlers:
+                raise ValueError(f"Префикс {prefix!r} уже зарегистрирован")
+            self._handlers[prefix] = (cb_class, CallableObject(func), [FilterObject(f) for f in filters])
+            return func
+        return decorator
+
+    def _match(self, callback: CallbackQuery) -> dict | bool:
+        entry = self._handlers.get((callback.data or "").partition(":")[0])
+        if entry is None:
+            return False
+        return {"callback_entry": entry}
+
+    async def _dispatch(self, callback: CallbackQuery, callback_entry: tuple, **kwargs):
+        cb_class, handler, filters = callback_entry
+        for f in filters:
+            if not await f.call(callback, **kwargs):
+                raise SkipHandler()
+        callback_data = cb_class.unpack(callback.data)
+        return await handler.call(callback, callback_data=callback_data, **kwargs)
+
+
+table = CallbackTable()
@@ -6,4 +6,41 @@ load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_ID = int(os.getenv("ADMIN_ID", "0"))
 ACCESS_CODE = os.getenv("ACCESS_CODE", "gym2024")
-DATABASE_PATH = "gym_bot.db"
\ No newline at end of file
+DATABASE_PATH = "gym_bot.db"
+
+# Состояния FSM в памяти (fsm_storage): не больше стольких записей, брошенные
+# диалоги удаляются через FSM_TTL_HOURS, проверка — раз в FSM_SWEEP_INTERVAL_MINUTES
+FSM_MAX_RECORDS = int(os.getenv("FSM_MAX_RECORDS", "10000"))
+FSM_TTL_HOURS = float(os.getenv("FSM_TTL_HOURS", "24"))
+FSM_SWEEP_INTERVAL_MINUTES = float(os.getenv("FSM_SWEEP_INTERVAL_MINUTES", "10"))
+
+# Профиль настроек SQLite (database.DB_PROFILES): "safe", "balanced" или "fast"
+DB_PROFILE = os.getenv("DB_PROFILE", "balanced")
+# Как часто делать PRAGMA optimize и сброс WAL, часов (0 — не делать)
+DB_OPTIMIZE_INTERVAL_HOURS = float(os.getenv("DB_OPTIMIZE_INTERVAL_HOURS", "6"))
+
+# Архив старых подходов: отдельный файл БД, подключается к основной через ATTACH
+ARCHIVE_DATABASE_PATH = "gym_archive.db"
+# Подходы старше стольких дней переносятся в архив (0 — не архивировать)
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+# Как часто запускать перенос, часов
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "24"))
+
+# Резервные копии БД: папка, период (часов, 0 — не делать) и сколько последних хранить
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+BACKUP_INTERVAL_HOURS = float(os.getenv("BACKUP_INTERVAL_HOURS", "24"))
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))
+
+# Как часто убирать строки, оставшиеся от удалённых программ, дней и упражнений, часов (0 — не убирать)
+ORPHAN_GC_INTERVAL_HOURS = float(os.getenv("ORPHAN_GC_INTERVAL_HOURS", "24"))
+
+# Источник упражнений для подбора: "ai" (DeepSeek, при ошибке — библиотека) или "local" (только библиотека)
+EXERCISE_SOURCE = os.getenv("EXERCISE_SOURCE", "ai")
+
+# Цикл событий uvloop вместо стандартного (нужен пакет uvloop: pip install uvloop)
+USE_UVLOOP = os.getenv("USE_UVLOOP", "0") == "1"
+
+# Задержка цикла событий (loop_monitor): как часто замерять, мс (0 — не замерять),
+# и после какой блокировки писать в лог стек заблокировавшего кода, мс (0 — не писать)
+LOOP_LAG_INTERVAL_MS = float(os.getenv("LOOP_LAG_INTERVAL_MS", "500"))
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "250"))
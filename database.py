@@ -1,26 +1,208 @@
+import asyncio
+import re
+import sqlite3
+from collections import Counter, OrderedDict
+from functools import lru_cache
+
 import aiosqlite
-from config import DATABASE_PATH
+from config import DATABASE_PATH, ARCHIVE_DATABASE_PATH, DB_PROFILE
 from contextlib import asynccontextmanager
+from records import Program, Day, ProgramDay, Exercise, TaggedExercise, WorkoutLog, CustomLog, ActivitySet, columns
+
+# ==================== STATEMENTS ====================
+
+# Реестр SQL-выражений модуля: имя -> текст. Тексты нормализованы (пробелы
+# схлопнуты), одинаковые запросы разных функций — одна запись: каждый
+# компилируется один раз и остаётся в кэше выражений соединения.
+STATEMENTS: dict[str, str] = {}
+_STATEMENT_NAMES: dict[str, str] = {}
+
+# Сколько раз выполнено каждое выражение реестра (по имени)
+statement_counts: Counter = Counter()
+
+# Запас кэша выражений сверх реестра: динамические запросы (IN (...), PRAGMA)
+STATEMENT_CACHE_SPARE = 32
+
+
+def _sql(name: str, text: str) -> str:
+    """Зарегистрировать выражение под именем и вернуть нормализованный текст."""
+    sql = " ".join(text.split())
+    if name in STATEMENTS:
+        raise ValueError(f"Выражение {name} уже зарегистрировано")
+    STATEMENTS[name] = sql
+    _STATEMENT_NAMES[sql] = name
+    return sql
+
+
+def get_statement_stats(limit: int | None = None) -> list[tuple[str, int]]:
+    """Самые частые выражения: [(имя, выполнений), ...] по убыванию."""
+    return statement_counts.most_common(limit)
+
+
+class _CountingConnection:
+    """Соединение, которое считает выполнения выражений реестра."""
+
+    __slots__ = ("_conn",)
+
+    def __init__(self, conn: aiosqlite.Connection):
+        self._conn = conn
+
+    def execute(self, sql: str, parameters=None):
+        name = _STATEMENT_NAMES.get(sql)
+        if name:
+            statement_counts[name] += 1
+        return self._conn.execute(sql, parameters)
+
+    def executemany(self, sql: str, parameters):
+        name = _STATEMENT_NAMES.get(sql)
+        if name:
+            statement_counts[name] += 1
+        return self._conn.executemany(sql, parameters)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+async def _prepare_statements(conn: aiosqlite.Connection) -> int:
+    """Скомпилировать все выражения реестра в кэш выражений соединения.
+
+    Каждое выполняется с NULL-параметрами под обработчиком прогресса, который
+    прерывает его на первой инструкции: выражение компилируется и попадает
+    в кэш, но ничего не читает и не пишет. Ошибка в запросе (нет колонки,
+    опечатка) всплывает сразу при старте. Возвращает число выражений.
+    """
+    await conn.set_progress_handler(lambda: 1, 1)
+    try:
+        for sql in STATEMENTS.values():
+            try:
+                await conn.execute(sql, (None,) * sql.count("?"))
+            except sqlite3.OperationalError as e:
+                if str(e) != "interrupted":
+                    raise
+    finally:
+        await conn.set_progress_handler(None, 1)
+    return len(STATEMENTS)
+
+
+# ==================== CONNECTION ====================
 
 # Connection pool - единственное соединение для всего приложения
 _connection: aiosqlite.Connection | None = None
+_counting_connection: _CountingConnection | None = None
+
+# Профили настроек соединения (выбирается config.DB_PROFILE). Режим WAL
+# задаётся в init_db: он хранится в самом файле БД.
+DB_PROFILES = {
+    # Настройки SQLite по умолчанию: fsync на каждый коммит
+    "safe": {
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+    },
+    # В WAL synchronous=NORMAL не портит БД при сбое питания (теряется лишь последний коммит)
+    "balanced": {
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "fast": {
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+    },
+}
+
+# Настройки, которые задаются для каждой подключённой БД отдельно
+_SCHEMA_PRAGMAS = ("synchronous", "cache_size", "mmap_size")
+
+
+async def _apply_profile(conn: aiosqlite.Connection):
+    """Применить профиль DB_PROFILE к соединению (и к основной, и к архивной БД).
+
+    Вызывать до создания временных представлений: смена temp_store удаляет
+    все временные объекты соединения.
+    """
+    profile = DB_PROFILES[DB_PROFILE]
+    for name, value in profile.items():
+        if name in _SCHEMA_PRAGMAS:
+            for schema in ("main", "archive"):
+                await conn.execute(f"PRAGMA {schema}.{name} = {value}")
+        else:
+            await conn.execute(f"PRAGMA {name} = {value}")
 
 
 async def get_connection() -> aiosqlite.Connection:
     """Получить соединение с БД (singleton)."""
-    global _connection
+    global _connection, _counting_connection
     if _connection is None:
-        _connection = await aiosqlite.connect(DATABASE_PATH)
+        _connection = await aiosqlite.connect(
+            DATABASE_PATH, cached_statements=len(STATEMENTS) + STATEMENT_CACHE_SPARE
+        )
         _connection.row_factory = aiosqlite.Row
+        _counting_connection = _CountingConnection(_connection)
+        await _attach_archive(_connection)
     return _connection
 
 
+async def _attach_archive(conn: aiosqlite.Connection):
+    """Подключить архивную БД, применить профиль, включить внешние ключи и создать
+    представления «горячие + архивные» подходы и временные таблицы импорта.
+
+    all_workout_logs / all_custom_logs — UNION ALL основной таблицы и архива
+    с теми же колонками; условия WHERE SQLite проталкивает в обе части.
+    import_workout_logs / import_custom_logs — пачка импорта перед записью
+    (см. insert_workout_logs_bulk); временные таблицы видны только этому соединению.
+    """
+    await conn.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_DATABASE_PATH,))
+    await _apply_profile(conn)
+    # Каскады ON DELETE из схемы работают только с этим флагом (он на соединение).
+    # init_db его не включает: пересоздание таблиц в миграциях иначе удалило бы
+    # ссылающиеся строки
+    await conn.execute("PRAGMA foreign_keys = ON")
+    await conn.execute("""
+        CREATE TEMP VIEW IF NOT EXISTS all_workout_logs AS
+        SELECT id, user_id, exercise_id, weight, reps, set_num, date, created_at
+        FROM main.workout_logs
+        UNION ALL
+        SELECT id, user_id, exercise_id, weight, reps, set_num, date, created_at
+        FROM archive.workout_logs
+    """)
+    await conn.execute("""
+        CREATE TEMP VIEW IF NOT EXISTS all_custom_logs AS
+        SELECT id, user_id, name, name_id, weight, reps, duration_minutes, rpe, set_num, date, created_at
+        FROM main.custom_logs
+        UNION ALL
+        SELECT id, user_id, name, name_id, weight, reps, duration_minutes, rpe, set_num, date, created_at
+        FROM archive.custom_logs
+    """)
+    await conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS import_workout_logs (
+            user_id INTEGER, exercise_id INTEGER, weight REAL, reps INTEGER, set_num INTEGER, date TEXT
+        )
+    """)
+    await conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS import_custom_logs (
+            user_id INTEGER, name TEXT, name_id INTEGER, weight REAL, reps INTEGER,
+            duration_minutes INTEGER, set_num INTEGER, date TEXT
+        )
+    """)
+
+
 async def close_connection():
     """Закрыть соединение с БД."""
-    global _connection
+    global _connection, _counting_connection
     if _connection is not None:
+        # Обновить статистику планировщика по накопленным за сессию запросам
+        await _connection.execute("PRAGMA optimize")
         await _connection.close()
         _connection = None
+        _counting_connection = None
 
 
 @asynccontextmanager
@@ -28,14 +210,88 @@ async def get_db():
     """Контекстный менеджер для работы с БД."""
     conn = await get_connection()
     try:
-        yield conn
+        yield _counting_connection
     finally:
         await conn.commit()
 
 
+async def _fetchall(db, record: type, sql: str, parameters=()) -> list:
+    """Выполнить запрос и получить строки записями record (колонки — в порядке её полей)."""
+    cursor = await db.execute(sql, parameters)
+    cursor.row_factory = record.from_row
+    return await cursor.fetchall()
+
+
+async def _fetchone(db, record: type, sql: str, parameters=()):
+    """Как _fetchall, но одна строка или None."""
+    cursor = await db.execute(sql, parameters)
+    cursor.row_factory = record.from_row
+    return await cursor.fetchone()
+
+
+async def _create_set_index(db, table: str, index: str, exercise_column: str):
+    """Уникальный индекс (user_id, упражнение, date, set_num).
+
+    Перед созданием перенумеровывает подходы в днях, где номера повторяются
+    (следы прежней гонки COUNT + INSERT), в порядке записи.
+    """
+    cursor = await db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index,)
+    )
+    if await cursor.fetchone():
+        return
+    await db.execute(f"""
+        UPDATE {table} SET set_num = numbered.rn
+        FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY user_id, {exercise_column}, date ORDER BY set_num, id
+            ) AS rn
+            FROM {table}
+            WHERE (user_id, {exercise_column}, date) IN (
+                SELECT user_id, {exercise_column}, date FROM {table}
+                GROUP BY user_id, {exercise_column}, date
+                HAVING COUNT(*) > COUNT(DISTINCT set_num)
+            )
+        ) numbered
+        WHERE {table}.id = numbered.id
+    """)
+    await db.execute(f"""
+        CREATE UNIQUE INDEX {index}
+        ON {table}(user_id, {exercise_column}, date, set_num)
+    """)
+
+
+# Версия схемы: хранится в PRAGMA user_version основной и архивной БД.
+# Увеличивать при каждом изменении init_db — иначе на существующих БД оно не выполнится
+SCHEMA_VERSION = 1
+
+
+async def _schema_version(db) -> int:
+    """Версия схемы — меньшая из основной и архивной БД (архив могли удалить отдельно)."""
+    versions = []
+    for schema in ("main", "archive"):
+        cursor = await db.execute(f"PRAGMA {schema}.user_version")
+        versions.append((await cursor.fetchone())[0])
+    return min(versions)
+
+
 async def init_db():
-    """Инициализация базы данных и создание таблиц."""
+    """Инициализация базы данных и создание таблиц.
+
+    Если схема уже версии SCHEMA_VERSION, ничего не делает: при перезапуске
+    миграции (с проходами по таблицам подходов) не выполняются.
+    """
     async with aiosqlite.connect(DATABASE_PATH) as db:
+        # Архивная БД (без представлений: с ними не прошли бы ALTER TABLE миграций)
+        await db.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_DATABASE_PATH,))
+        if await _schema_version(db) >= SCHEMA_VERSION:
+            return
+
+        # WAL: читатели не блокируют запись — на этом держится горячий бэкап (backup.py)
+        await db.execute("PRAGMA journal_mode=WAL")
+        await db.execute("PRAGMA archive.journal_mode=WAL")
+        await _apply_profile(db)
+
         # Программы тренировок (например, "Зубкова")
         await db.execute("""
             CREATE TABLE IF NOT EXISTS programs (
@@ -56,17 +312,19 @@ async def init_db():
             )
         """)
 
-        # Упражнения
+        # Упражнения (библиотека; day_id — от старой схемы «упражнение в одном дне»)
         await db.execute("""
             CREATE TABLE IF NOT EXISTS exercises (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                day_id INTEGER NOT NULL,
+                day_id INTEGER,
                 name TEXT NOT NULL,
                 description TEXT,
                 image_file_id TEXT,
                 order_num INTEGER DEFAULT 0,
                 tag TEXT,
-                FOREIGN KEY (day_id) REFERENCES days(id) ON DELETE CASCADE
+                weight_type INTEGER DEFAULT 10,
+                media_type TEXT DEFAULT 'photo',
+                FOREIGN KEY (day_id) REFERENCES days(id) ON DELETE SET NULL
             )
         """)
 
@@ -117,11 +375,13 @@ async def init_db():
                 SELECT day_id, id, order_num FROM exercises WHERE day_id IS NOT NULL
             """)
 
-        # Индекс для day_exercises
+        # Порядок упражнений дня: поиск соседа при перемещении — один шаг по индексу.
+        # Префикс (day_id) заменяет прежний idx_day_exercises_day
         await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_day_exercises_day
-            ON day_exercises(day_id)
+            CREATE INDEX IF NOT EXISTS idx_day_exercises_order
+            ON day_exercises(day_id, order_num, exercise_id)
         """)
+        await db.execute("DROP INDEX IF EXISTS idx_day_exercises_day")
         await db.execute("""
             CREATE INDEX IF NOT EXISTS idx_day_exercises_exercise
             ON day_exercises(exercise_id)
@@ -143,12 +403,16 @@ async def init_db():
                     order_num INTEGER DEFAULT 0,
                     tag TEXT,
                     weight_type INTEGER DEFAULT 10,
+                    media_type TEXT DEFAULT 'photo',
                     FOREIGN KEY (day_id) REFERENCES days(id) ON DELETE SET NULL
                 )
             """)
             await db.execute("""
-                INSERT INTO exercises_new (id, day_id, name, description, image_file_id, order_num, tag, weight_type)
-                SELECT id, day_id, name, description, image_file_id, order_num, tag, weight_type FROM exercises
+                INSERT INTO exercises_new (
+                    id, day_id, name, description, image_file_id, order_num, tag, weight_type, media_type
+                )
+                SELECT id, day_id, name, description, image_file_id, order_num, tag, weight_type, media_type
+                FROM exercises
             """)
             await db.execute("DROP TABLE exercises")
             await db.execute("ALTER TABLE exercises_new RENAME TO exercises")
@@ -183,6 +447,14 @@ async def init_db():
             )
         """)
 
+        # Словарь названий своих упражнений (канонический вид, см. canonical_exercise_name)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS custom_exercise_names (
+                id INTEGER PRIMARY KEY,
+                canonical TEXT NOT NULL UNIQUE
+            )
+        """)
+
         # Свои упражнения (не из программы)
         await db.execute("""
             CREATE TABLE IF NOT EXISTS custom_logs (
@@ -204,6 +476,123 @@ async def init_db():
         except Exception:
             pass  # Колонка уже существует
 
+        # Миграция: добавить rpe если нет
+        try:
+            await db.execute("ALTER TABLE custom_logs ADD COLUMN rpe REAL")
+        except Exception:
+            pass  # Колонка уже существует
+
+        # Миграция: name_id — ссылка на словарь названий; name остаётся как ввёл пользователь
+        try:
+            await db.execute(
+                "ALTER TABLE custom_logs ADD COLUMN name_id INTEGER REFERENCES custom_exercise_names(id)"
+            )
+        except Exception:
+            pass  # Колонка уже существует
+        cursor = await db.execute("SELECT DISTINCT name FROM custom_logs WHERE name_id IS NULL")
+        unlinked = [row[0] for row in await cursor.fetchall()]
+        if unlinked:
+            name_ids = await _custom_name_ids(db, unlinked)
+            await db.executemany(
+                "UPDATE custom_logs SET name_id = ? WHERE name = ? AND name_id IS NULL",
+                [(name_ids[name], name) for name in unlinked]
+            )
+
+        # Последние свои упражнения пользователя (для быстрых кнопок)
+        cursor = await db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_recent_custom'"
+        )
+        recent_exists = await cursor.fetchone() is not None
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS user_recent_custom (
+                user_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                last_log_id INTEGER NOT NULL,
+                PRIMARY KEY (user_id, name)
+            )
+        """)
+        if not recent_exists:
+            # Миграция: заполнить из истории, по RECENT_CUSTOM_LIMIT на пользователя.
+            # Одна строка на каноническое название (name_id): написание — из записи
+            # с последней датой, last_log_id — последняя запись этого упражнения
+            # (по нему, как и после _remember_recent_custom, упорядочен список)
+            await db.execute("""
+                INSERT INTO user_recent_custom (user_id, name, last_log_id)
+                SELECT user_id, name, last_id FROM (
+                    SELECT user_id, name, last_id,
+                           ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY last_id DESC) AS rn
+                    FROM (
+                        SELECT user_id, name,
+                               MAX(id) OVER (PARTITION BY user_id, name_id) AS last_id,
+                               ROW_NUMBER() OVER (
+                                   PARTITION BY user_id, name_id ORDER BY date DESC, id DESC
+                               ) AS latest
+                        FROM custom_logs
+                    )
+                    WHERE latest = 1
+                )
+                WHERE rn <= ?
+            """, (RECENT_CUSTOM_LIMIT,))
+
+        # Дневные сводки по заархивированным подходам: (пользователь, упражнение, дата)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS workout_rollups (
+                user_id INTEGER NOT NULL,
+                exercise_id INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                sets INTEGER NOT NULL,
+                reps INTEGER NOT NULL,
+                max_weight REAL NOT NULL,
+                volume REAL NOT NULL,
+                PRIMARY KEY (user_id, exercise_id, date)
+            ) WITHOUT ROWID
+        """)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS custom_rollups (
+                user_id INTEGER NOT NULL,
+                name_id INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                sets INTEGER NOT NULL,
+                reps INTEGER NOT NULL,
+                max_weight REAL NOT NULL,
+                volume REAL NOT NULL,
+                duration_minutes INTEGER NOT NULL,
+                PRIMARY KEY (user_id, name_id, date)
+            ) WITHOUT ROWID
+        """)
+
+        # Архив сырых подходов (отдельный файл). Ключ кластеризует строки
+        # по пользователю и упражнению: история читается подряд, без отдельных индексов.
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS archive.workout_logs (
+                id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                exercise_id INTEGER NOT NULL,
+                weight REAL NOT NULL,
+                reps INTEGER NOT NULL,
+                set_num INTEGER,
+                date TEXT NOT NULL,
+                created_at TIMESTAMP,
+                PRIMARY KEY (user_id, exercise_id, date, id)
+            ) WITHOUT ROWID
+        """)
+        await db.execute("""
+            CREATE TABLE IF NOT EXISTS archive.custom_logs (
+                id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                name_id INTEGER NOT NULL,
+                weight REAL,
+                reps INTEGER,
+                duration_minutes INTEGER,
+                rpe REAL,
+                set_num INTEGER,
+                date TEXT NOT NULL,
+                created_at TIMESTAMP,
+                PRIMARY KEY (user_id, name_id, date, id)
+            ) WITHOUT ROWID
+        """)
+
         # Разрешённые пользователи
         await db.execute("""
             CREATE TABLE IF NOT EXISTS allowed_users (
@@ -219,18 +608,18 @@ async def init_db():
             CREATE INDEX IF NOT EXISTS idx_workout_logs_user_date
             ON workout_logs(user_id, date)
         """)
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_workout_logs_user_exercise
-            ON workout_logs(user_id, exercise_id)
-        """)
+        # Один номер подхода на (пользователь, упражнение, день). Индекс заменяет
+        # idx_workout_logs_user_exercise: его префикс (user_id, exercise_id) тот же
+        await _create_set_index(db, "workout_logs", "idx_workout_logs_set", "exercise_id")
+        await db.execute("DROP INDEX IF EXISTS idx_workout_logs_user_exercise")
         await db.execute("""
             CREATE INDEX IF NOT EXISTS idx_custom_logs_user_date
             ON custom_logs(user_id, date)
         """)
-        await db.execute("""
-            CREATE INDEX IF NOT EXISTS idx_custom_logs_user_name
-            ON custom_logs(user_id, name)
-        """)
+        # Поиск по упражнению — по целочисленному name_id, текстовый индекс больше не нужен
+        await db.execute("DROP INDEX IF EXISTS idx_custom_logs_user_name")
+        await _create_set_index(db, "custom_logs", "idx_custom_logs_set", "name_id")
+        await db.execute("DROP INDEX IF EXISTS idx_custom_logs_user_name_id")
         await db.execute("""
             CREATE INDEX IF NOT EXISTS idx_exercises_day
             ON exercises(day_id)
@@ -244,81 +633,145 @@ async def init_db():
             ON days(program_id)
         """)
 
+        await db.execute(f"PRAGMA main.user_version = {SCHEMA_VERSION}")
+        await db.execute(f"PRAGMA archive.user_version = {SCHEMA_VERSION}")
         await db.commit()
 
 
 # ==================== PROGRAMS ====================
 
+_SQL_CREATE_PROGRAM = _sql("create_program", "INSERT INTO programs (name) VALUES (?)")
+
+
 async def create_program(name: str) -> int:
     """Создать программу тренировок."""
     async with get_db() as db:
-        cursor = await db.execute(
-            "INSERT INTO programs (name) VALUES (?)", (name,)
-        )
+        cursor = await db.execute(_SQL_CREATE_PROGRAM, (name,))
         return cursor.lastrowid
 
 
-async def get_all_programs() -> list:
+_SQL_GET_ALL_PROGRAMS = _sql("get_all_programs", f"SELECT {columns(Program)} FROM programs ORDER BY name")
+
+
+async def get_all_programs() -> list[Program]:
     """Получить все программы."""
     async with get_db() as db:
-        cursor = await db.execute("SELECT * FROM programs ORDER BY name")
-        return await cursor.fetchall()
+        return await _fetchall(db, Program, _SQL_GET_ALL_PROGRAMS)
 
 
-async def get_program(program_id: int) -> dict | None:
+_SQL_GET_PROGRAM = _sql("get_program", f"SELECT {columns(Program)} FROM programs WHERE id = ?")
+
+
+async def get_program(program_id: int) -> Program | None:
     """Получить программу по ID."""
     async with get_db() as db:
-        cursor = await db.execute(
-            "SELECT * FROM programs WHERE id = ?", (program_id,)
-        )
-        return await cursor.fetchone()
+        return await _fetchone(db, Program, _SQL_GET_PROGRAM, (program_id,))
+
+
+_SQL_DELETE_PROGRAM = _sql("delete_program", "DELETE FROM programs WHERE id = ?")
 
 
 async def delete_program(program_id: int):
     """Удалить программу."""
     async with get_db() as db:
-        await db.execute("DELETE FROM programs WHERE id = ?", (program_id,))
+        await db.execute(_SQL_DELETE_PROGRAM, (program_id,))
+    _invalidate_program_catalog(program_id)
+    # Каскад обнулил program_id в прогрессе пользователей (ON DELETE SET NULL)
+    _progress_cache.clear()
+
+
+# Программы с днями одним запросом: строка на день (или одна строка с NULL для
+# программы без дней), уже в порядке вывода
+_SQL_GET_PROGRAM_TREE = _sql("get_program_tree", """
+    SELECT p.id AS program_id, p.name AS program_name,
+           d.id AS day_id, d.day_number, d.name AS day_name,
+           COUNT(de.exercise_id) AS exercise_count
+    FROM programs p
+    LEFT JOIN days d ON d.program_id = p.id
+    LEFT JOIN day_exercises de ON de.day_id = d.id
+    GROUP BY p.id, d.id
+    ORDER BY p.name, p.id, d.day_number
+""")
+
+
+async def get_program_tree() -> list[dict]:
+    """Все программы с их днями за один запрос.
+
+    Returns:
+        [{"id", "name", "days": [{"id", "day_number", "name", "exercise_count"}]}]
+        в порядке get_all_programs / get_days_by_program.
+    """
+    async with get_db() as db:
+        cursor = await db.execute(_SQL_GET_PROGRAM_TREE)
+        rows = await cursor.fetchall()
+
+    tree = []
+    for row in rows:
+        if not tree or tree[-1]["id"] != row["program_id"]:
+            tree.append({"id": row["program_id"], "name": row["program_name"], "days": []})
+        if row["day_id"] is not None:
+            tree[-1]["days"].append({
+                "id": row["day_id"],
+                "day_number": row["day_number"],
+                "name": row["day_name"],
+                "exercise_count": row["exercise_count"],
+            })
+    return tree
 
 
 # ==================== DAYS ====================
 
+_SQL_CREATE_DAY = _sql("create_day", """
+    INSERT INTO days (program_id, day_number, name, description) VALUES (?, ?, ?, ?)
+""")
+
+
 async def create_day(program_id: int, day_number: int, name: str = None, description: str = None) -> int:
     """Создать день в программе."""
     async with get_db() as db:
-        cursor = await db.execute(
-            "INSERT INTO days (program_id, day_number, name, description) VALUES (?, ?, ?, ?)",
-            (program_id, day_number, name, description)
-        )
-        return cursor.lastrowid
+        cursor = await db.execute(_SQL_CREATE_DAY, (program_id, day_number, name, description))
+    _invalidate_program_catalog(program_id)
+    return cursor.lastrowid
+
 
+_SQL_GET_DAYS_BY_PROGRAM = _sql("get_days_by_program", f"""
+    SELECT {columns(Day)} FROM days WHERE program_id = ? ORDER BY day_number
+""")
 
-async def get_days_by_program(program_id: int) -> list:
+
+async def get_days_by_program(program_id: int) -> list[Day]:
     """Получить все дни программы."""
     async with get_db() as db:
-        cursor = await db.execute(
-            "SELECT * FROM days WHERE program_id = ? ORDER BY day_number",
-            (program_id,)
-        )
-        return await cursor.fetchall()
+        return await _fetchall(db, Day, _SQL_GET_DAYS_BY_PROGRAM, (program_id,))
+
+
+_SQL_GET_DAY = _sql("get_day", f"SELECT {columns(Day)} FROM days WHERE id = ?")
 
 
-async def get_day(day_id: int) -> dict | None:
+async def get_day(day_id: int) -> Day | None:
     """Получить день по ID."""
     async with get_db() as db:
-        cursor = await db.execute(
-            "SELECT * FROM days WHERE id = ?", (day_id,)
-        )
-        return await cursor.fetchone()
+        return await _fetchone(db, Day, _SQL_GET_DAY, (day_id,))
+
+
+_SQL_DELETE_DAY = _sql("delete_day", "DELETE FROM days WHERE id = ?")
 
 
 async def delete_day(day_id: int):
     """Удалить день."""
     async with get_db() as db:
-        await db.execute("DELETE FROM days WHERE id = ?", (day_id,))
+        await db.execute(_SQL_DELETE_DAY, (day_id,))
+    _invalidate_program_catalog()
 
 
 # ==================== EXERCISES ====================
 
+_SQL_CREATE_EXERCISE = _sql("create_exercise", """
+    INSERT INTO exercises (name, description, image_file_id, tag, weight_type, media_type)
+    VALUES (?, ?, ?, ?, ?, ?)
+""")
+
+
 async def create_exercise(
     name: str,
     description: str = None,
@@ -334,34 +787,111 @@ async def create_exercise(
     """
     async with get_db() as db:
         cursor = await db.execute(
-            """INSERT INTO exercises (name, description, image_file_id, tag, weight_type, media_type)
-               VALUES (?, ?, ?, ?, ?, ?)""",
+            _SQL_CREATE_EXERCISE,
             (name, description, image_file_id, tag.lower() if tag else None, weight_type, media_type)
         )
         return cursor.lastrowid
 
 
-async def get_exercises_by_day(day_id: int) -> list:
+def normalize_exercise_name(name: str) -> str:
+    """Нормализовать название для сравнения: регистр, ё/е, пробелы, знаки."""
+    name = name.lower().replace("ё", "е")
+    name = re.sub(r"[^\w\s-]", " ", name)
+    return " ".join(name.split())
+
+
+# Окончания для грубого стемминга названий (длинные первыми)
+_STEM_SUFFIXES = tuple(sorted((
+    "ами", "ями", "ого", "его", "ому", "ему", "ыми", "ими",
+    "ия", "ие", "ии", "ию", "ья", "ье", "ьи", "ью",
+    "ой", "ей", "ый", "ий", "ая", "яя", "ое", "ее", "ые", "ие", "ую", "юю",
+    "ов", "ев", "ам", "ям", "ах", "ях", "ом", "ем",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь", "й",
+), key=len, reverse=True))
+
+
+def _stem(word: str) -> str:
+    """Отрезать падежное окончание, если останется хотя бы 3 буквы."""
+    if word.isascii():
+        return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+    for suffix in _STEM_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+@lru_cache(maxsize=4096)
+def canonical_exercise_name(name: str) -> str:
+    """Каноническое название своего упражнения: нормализация + стемминг слов.
+
+    "Жим лёжа", "жим  лежа" и "Жим лежа." дают одно и то же — "жим леж".
+    """
+    return " ".join(_stem(word) for word in normalize_exercise_name(name).split())
+
+
+_SQL_EXERCISE_NAMES = _sql("exercise_names", "SELECT name FROM exercises")
+_SQL_INSERT_LIBRARY_EXERCISE = _sql("insert_library_exercise", """
+    INSERT INTO exercises (name, description, tag, weight_type)
+    VALUES (?, ?, ?, ?)
+""")
+
+
+async def add_library_exercises(exercises: list[dict]) -> int:
+    """Добавить пачку упражнений в библиотеку одной транзакцией.
+
+    exercises: [{"name", "description", "muscle", "weight_type"}, ...]
+    Упражнения, которые уже есть в библиотеке (по нормализованному названию),
+    пропускаются. Тег — группа мышц. Возвращает число добавленных.
+    """
+    async with get_db() as db:
+        cursor = await db.execute(_SQL_EXERCISE_NAMES)
+        existing = {normalize_exercise_name(row[0]) for row in await cursor.fetchall()}
+
+        rows = []
+        for ex in exercises:
+            key = normalize_exercise_name(ex["name"])
+            if not key or key in existing:
+                continue
+            existing.add(key)
+            rows.append((ex["name"], ex.get("description"), ex["muscle"].lower(), ex.get("weight_type", 10)))
+
+        if rows:
+            await db.executemany(_SQL_INSERT_LIBRARY_EXERCISE, rows)
+        return len(rows)
+
+
+_SQL_GET_EXERCISES_BY_DAY = _sql("get_exercises_by_day", f"""
+    SELECT {columns(Exercise, "e")}
+    FROM exercises e
+    JOIN day_exercises de ON e.id = de.exercise_id
+    WHERE de.day_id = ?
+    ORDER BY de.order_num, e.id
+""")
+
+
+async def get_exercises_by_day(day_id: int) -> list[Exercise]:
     """Получить все упражнения дня через day_exercises."""
     async with get_db() as db:
-        cursor = await db.execute(
-            """SELECT e.*, de.order_num
-               FROM exercises e
-               JOIN day_exercises de ON e.id = de.exercise_id
-               WHERE de.day_id = ?
-               ORDER BY de.order_num, e.id""",
-            (day_id,)
-        )
-        return await cursor.fetchall()
+        return await _fetchall(db, Exercise, _SQL_GET_EXERCISES_BY_DAY, (day_id,))
+
 
+_SQL_GET_ALL_EXERCISES = _sql("get_all_exercises", f"SELECT {columns(Exercise)} FROM exercises ORDER BY name")
 
-async def get_all_exercises() -> list:
+
+async def get_all_exercises() -> list[Exercise]:
     """Получить все упражнения из библиотеки."""
     async with get_db() as db:
-        cursor = await db.execute(
-            "SELECT * FROM exercises ORDER BY name"
-        )
-        return await cursor.fetchall()
+        return await _fetchall(db, Exercise, _SQL_GET_ALL_EXERCISES)
+
+
+# Шаг order_num между соседними упражнениями дня
+DAY_ORDER_GAP = 1024
+
+_SQL_MAX_DAY_ORDER = _sql("max_day_order", "SELECT MAX(order_num) FROM day_exercises WHERE day_id = ?")
+_SQL_INSERT_DAY_EXERCISE = _sql("insert_day_exercise", """
+    INSERT OR IGNORE INTO day_exercises (day_id, exercise_id, order_num)
+    VALUES (?, ?, ?)
+""")
 
 
 async def add_exercise_to_day(exercise_id: int, day_id: int, order_num: int = None):
@@ -369,102 +899,136 @@ async def add_exercise_to_day(exercise_id: int, day_id: int, order_num: int = No
     async with get_db() as db:
         if order_num is None:
             # Получаем максимальный order_num и добавляем в конец
-            cursor = await db.execute(
-                "SELECT MAX(order_num) FROM day_exercises WHERE day_id = ?",
-                (day_id,)
-            )
+            cursor = await db.execute(_SQL_MAX_DAY_ORDER, (day_id,))
             result = await cursor.fetchone()
-            max_order = result[0] if result[0] is not None else -10
-            order_num = max_order + 10
+            max_order = result[0] if result[0] is not None else -DAY_ORDER_GAP
+            order_num = max_order + DAY_ORDER_GAP
 
-        await db.execute(
-            """INSERT OR IGNORE INTO day_exercises (day_id, exercise_id, order_num)
-               VALUES (?, ?, ?)""",
-            (day_id, exercise_id, order_num)
-        )
+        await db.execute(_SQL_INSERT_DAY_EXERCISE, (day_id, exercise_id, order_num))
+
+
+_SQL_REMOVE_EXERCISE_FROM_DAY = _sql("remove_exercise_from_day", """
+    DELETE FROM day_exercises WHERE exercise_id = ? AND day_id = ?
+""")
 
 
 async def remove_exercise_from_day(exercise_id: int, day_id: int):
     """Убрать упражнение из дня (не удаляет само упражнение)."""
     async with get_db() as db:
-        await db.execute(
-            "DELETE FROM day_exercises WHERE exercise_id = ? AND day_id = ?",
-            (exercise_id, day_id)
-        )
+        await db.execute(_SQL_REMOVE_EXERCISE_FROM_DAY, (exercise_id, day_id))
+
+
+_SQL_DAY_EXERCISE_ORDER_NUM = _sql("day_exercise_order_num", """
+    SELECT order_num FROM day_exercises WHERE day_id = ? AND exercise_id = ?
+""")
+# Ближайший сосед выше/ниже в порядке (order_num, exercise_id) — как в get_exercises_by_day
+_SQL_PREV_DAY_EXERCISE = _sql("prev_day_exercise", """
+    SELECT exercise_id, order_num FROM day_exercises
+    WHERE day_id = ? AND (order_num, exercise_id) < (?, ?)
+    ORDER BY order_num DESC, exercise_id DESC LIMIT 1
+""")
+_SQL_NEXT_DAY_EXERCISE = _sql("next_day_exercise", """
+    SELECT exercise_id, order_num FROM day_exercises
+    WHERE day_id = ? AND (order_num, exercise_id) > (?, ?)
+    ORDER BY order_num, exercise_id LIMIT 1
+""")
+# Обмен order_num двух упражнений одним UPDATE
+_SQL_SWAP_DAY_EXERCISES = _sql("swap_day_exercises", """
+    UPDATE day_exercises SET order_num = CASE exercise_id WHEN ? THEN ? ELSE ? END
+    WHERE day_id = ? AND exercise_id IN (?, ?)
+""")
+_SQL_RENUMBER_DAY = _sql("renumber_day", """
+    UPDATE day_exercises SET order_num = ranked.position * ?
+    FROM (
+        SELECT id, ROW_NUMBER() OVER (ORDER BY order_num, exercise_id) - 1 AS position
+        FROM day_exercises WHERE day_id = ?
+    ) ranked
+    WHERE day_exercises.id = ranked.id
+""")
 
 
 async def move_exercise_in_day(exercise_id: int, day_id: int, direction: int):
-    """Переместить упражнение вверх (-1) или вниз (+1) в дне."""
+    """Переместить упражнение вверх (-1) или вниз (+1) в дне.
+
+    Меняются местами order_num двух соседних упражнений, остальные строки не
+    трогаются. День перенумеровывается с шагом DAY_ORDER_GAP только если у
+    соседей одинаковый order_num (так бывает в старых данных).
+    """
+    neighbour_sql = _SQL_PREV_DAY_EXERCISE if direction < 0 else _SQL_NEXT_DAY_EXERCISE
     async with get_db() as db:
-        # Получаем все упражнения дня с их порядком
-        cursor = await db.execute(
-            """SELECT exercise_id, order_num FROM day_exercises
-               WHERE day_id = ? ORDER BY order_num, exercise_id""",
-            (day_id,)
+        for _ in range(2):
+            cursor = await db.execute(_SQL_DAY_EXERCISE_ORDER_NUM, (day_id, exercise_id))
+            current = await cursor.fetchone()
+            if current is None:
+                return
+            cursor = await db.execute(neighbour_sql, (day_id, current["order_num"], exercise_id))
+            other = await cursor.fetchone()
+            if other is None:
+                return  # Уже на краю
+
+            if other["order_num"] != current["order_num"]:
+                await db.execute(_SQL_SWAP_DAY_EXERCISES, (
+                    exercise_id, other["order_num"], current["order_num"],
+                    day_id, exercise_id, other["exercise_id"]
+                ))
+                return
+            await db.execute(_SQL_RENUMBER_DAY, (DAY_ORDER_GAP, day_id))
+
+
+# Сдвигает весь день за конец нового порядка: упражнения, которых нет в списке,
+# окажутся после перечисленных в прежнем относительном порядке
+_SQL_SHIFT_DAY_ORDER = _sql("shift_day_order", """
+    UPDATE day_exercises
+    SET order_num = order_num - (SELECT MIN(order_num) FROM day_exercises WHERE day_id = ?) + ?
+    WHERE day_id = ?
+""")
+_SQL_SET_DAY_EXERCISE_ORDER = _sql("set_day_exercise_order", """
+    UPDATE day_exercises SET order_num = ? WHERE day_id = ? AND exercise_id = ?
+""")
+
+
+async def reorder_day(day_id: int, exercise_ids: list[int]):
+    """Задать порядок упражнений дня целиком (например, после перетаскивания).
+
+    exercise_ids — упражнения в новом порядке; id не из этого дня игнорируются,
+    упражнения дня, которых нет в списке, встают в конец.
+    """
+    async with get_db() as db:
+        await db.execute(_SQL_SHIFT_DAY_ORDER, (day_id, (len(exercise_ids) + 1) * DAY_ORDER_GAP, day_id))
+        await db.executemany(
+            _SQL_SET_DAY_EXERCISE_ORDER,
+            [(i * DAY_ORDER_GAP, day_id, exercise_id) for i, exercise_id in enumerate(exercise_ids)]
         )
-        exercises = await cursor.fetchall()
 
-        # Находим текущий индекс упражнения
-        current_idx = None
-        for i, ex in enumerate(exercises):
-            if ex["exercise_id"] == exercise_id:
-                current_idx = i
-                break
 
-        if current_idx is None:
-            return
+_SQL_GET_EXERCISE_DAYS = _sql("get_exercise_days", f"""
+    SELECT {columns(Day, "d")}, p.name AS program_name
+    FROM days d
+    JOIN day_exercises de ON d.id = de.day_id
+    JOIN programs p ON d.program_id = p.id
+    WHERE de.exercise_id = ?
+    ORDER BY p.name, d.day_number
+""")
 
-        # Вычисляем новый индекс
-        new_idx = current_idx + direction
-        if new_idx < 0 or new_idx >= len(exercises):
-            return  # Уже на краю
 
-        # Меняем местами order_num
-        other_exercise_id = exercises[new_idx]["exercise_id"]
+async def get_exercise_days(exercise_id: int) -> list[ProgramDay]:
+    """Получить все дни, в которых используется упражнение."""
+    async with get_db() as db:
+        return await _fetchall(db, ProgramDay, _SQL_GET_EXERCISE_DAYS, (exercise_id,))
 
-        # Присваиваем последовательные номера для надёжности
-        for i, ex in enumerate(exercises):
-            await db.execute(
-                "UPDATE day_exercises SET order_num = ? WHERE day_id = ? AND exercise_id = ?",
-                (i * 10, day_id, ex["exercise_id"])
-            )
 
-        # Теперь меняем местами два упражнения
-        current_order = current_idx * 10
-        new_order = new_idx * 10
-
-        await db.execute(
-            "UPDATE day_exercises SET order_num = ? WHERE day_id = ? AND exercise_id = ?",
-            (new_order, day_id, exercise_id)
-        )
-        await db.execute(
-            "UPDATE day_exercises SET order_num = ? WHERE day_id = ? AND exercise_id = ?",
-            (current_order, day_id, other_exercise_id)
-        )
+_SQL_GET_EXERCISE = _sql("get_exercise", f"SELECT {columns(Exercise)} FROM exercises WHERE id = ?")
 
 
-async def get_exercise_days(exercise_id: int) -> list:
-    """Получить все дни, в которых используется упражнение."""
+async def get_exercise(exercise_id: int) -> Exercise | None:
+    """Получить упражнение по ID."""
     async with get_db() as db:
-        cursor = await db.execute(
-            """SELECT d.*, p.name as program_name
-               FROM days d
-               JOIN day_exercises de ON d.id = de.day_id
-               JOIN programs p ON d.program_id = p.id
-               WHERE de.exercise_id = ?
-               ORDER BY p.name, d.day_number""",
-            (exercise_id,)
-        )
-        return await cursor.fetchall()
+        return await _fetchone(db, Exercise, _SQL_GET_EXERCISE, (exercise_id,))
 
 
-async def get_exercise(exercise_id: int) -> dict | None:
-    """Получить упражнение по ID."""
-    async with get_db() as db:
-        cursor = await db.execute(
-            "SELECT * FROM exercises WHERE id = ?", (exercise_id,)
-        )
-        return await cursor.fetchone()
+_SQL_UPDATE_EXERCISE_IMAGE = _sql("update_exercise_image", """
+    UPDATE exercises SET image_file_id = ?, media_type = ? WHERE id = ?
+""")
 
 
 async def update_exercise_image(exercise_id: int, image_file_id: str, media_type: str = "photo"):
@@ -473,73 +1037,157 @@ async def update_exercise_image(exercise_id: int, image_file_id: str, media_type
     media_type: 'photo' или 'animation' (GIF)
     """
     async with get_db() as db:
-        await db.execute(
-            "UPDATE exercises SET image_file_id = ?, media_type = ? WHERE id = ?",
-            (image_file_id, media_type, exercise_id)
-        )
+        await db.execute(_SQL_UPDATE_EXERCISE_IMAGE, (image_file_id, media_type, exercise_id))
+
+
+_SQL_DELETE_EXERCISE = _sql("delete_exercise", "DELETE FROM exercises WHERE id = ?")
 
 
 async def delete_exercise(exercise_id: int):
     """Удалить упражнение."""
     async with get_db() as db:
-        await db.execute("DELETE FROM exercises WHERE id = ?", (exercise_id,))
+        await db.execute(_SQL_DELETE_EXERCISE, (exercise_id,))
 
 
 # ==================== WORKOUT LOGS ====================
 
+# Номера подходов выдаются внутри самого INSERT: MAX(set_num) за день + 1..sets.
+# Один оператор SQLite атомарен, так что параллельные записи не получат одинаковый
+# номер, а уникальный индекс idx_workout_logs_set гарантирует это на уровне БД.
+# Максимум берётся и по архиву: день в прошлом мог быть уже перенесён, а подход
+# с занятым там номером архиватор не скопирует.
+_SQL_LOG_WORKOUT = _sql("log_workout", """
+    INSERT INTO workout_logs (user_id, exercise_id, weight, reps, set_num, date)
+    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+    SELECT ?, ?, ?, ?, last.set_num + n.i, ?
+    FROM n, (
+        SELECT COALESCE(MAX(set_num), 0) AS set_num FROM all_workout_logs
+        WHERE user_id = ? AND exercise_id = ? AND date = ?
+    ) last
+""")
+
+
 async def log_workout(
     user_id: int,
     exercise_id: int,
     weight: float,
     reps: int,
-    set_num: int,
-    date: str
+    date: str,
+    sets: int = 1
 ) -> int:
-    """Записать выполнение упражнения."""
+    """Записать sets одинаковых подходов; номера продолжают уже записанные за день.
+
+    Возвращает id последней записи.
+    """
     async with get_db() as db:
         cursor = await db.execute(
-            """INSERT INTO workout_logs (user_id, exercise_id, weight, reps, set_num, date)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (user_id, exercise_id, weight, reps, set_num, date)
+            _SQL_LOG_WORKOUT,
+            (sets, user_id, exercise_id, weight, reps, date, user_id, exercise_id, date)
         )
         return cursor.lastrowid
 
 
-async def get_exercise_history(user_id: int, exercise_id: int, limit: int = 20) -> list:
+# Импорт идёт через временную таблицу: пачка целиком сверяется с уже
+# записанными подходами двумя запросами, а не построчно. Соединение у бота
+# одно, поэтому пачки разных импортов не должны перемежаться — _import_lock
+_import_lock = asyncio.Lock()
+
+_SQL_STAGE_WORKOUT_LOGS = _sql("stage_workout_logs", """
+    INSERT INTO temp.import_workout_logs (user_id, exercise_id, weight, reps, set_num, date)
+    VALUES (?, ?, ?, ?, ?, ?)
+""")
+# Номер подхода за день уже занят другим подходом (другие вес или повторения)
+_SQL_COUNT_WORKOUT_CONFLICTS = _sql("count_workout_conflicts", """
+    SELECT COUNT(*) FROM temp.import_workout_logs AS i
+    WHERE EXISTS (
+        SELECT 1 FROM main.workout_logs AS l
+        WHERE l.user_id = i.user_id AND l.exercise_id = i.exercise_id AND l.date = i.date
+          AND l.set_num = i.set_num AND (l.weight != i.weight OR l.reps != i.reps)
+    ) OR EXISTS (
+        SELECT 1 FROM archive.workout_logs AS l
+        WHERE l.user_id = i.user_id AND l.exercise_id = i.exercise_id AND l.date = i.date
+          AND l.set_num = i.set_num AND (l.weight != i.weight OR l.reps != i.reps)
+    )
+""")
+# Подход пропускается, если его номер за этот день занят — и в основной
+# таблице, и в архиве (повторный импорт старого файла)
+_SQL_INSERT_WORKOUT_LOGS_BULK = _sql("insert_workout_logs_bulk", """
+    INSERT INTO workout_logs (user_id, exercise_id, weight, reps, set_num, date)
+    SELECT user_id, exercise_id, weight, reps, set_num, date FROM temp.import_workout_logs AS i
+    WHERE NOT EXISTS (
+        SELECT 1 FROM archive.workout_logs AS a
+        WHERE a.user_id = i.user_id AND a.exercise_id = i.exercise_id AND a.date = i.date
+          AND a.set_num = i.set_num
+    )
+    ORDER BY i.rowid
+    ON CONFLICT (user_id, exercise_id, date, set_num) DO NOTHING
+""")
+_SQL_CLEAR_IMPORT_WORKOUT_LOGS = _sql("clear_import_workout_logs", "DELETE FROM temp.import_workout_logs")
+
+
+async def insert_workout_logs_bulk(rows: list[tuple]) -> tuple[int, int]:
+    """Записать пачку подходов одной транзакцией (импорт).
+
+    rows: (user_id, exercise_id, weight, reps, set_num, date). Подходы, номер
+    которых за этот день уже занят (в том числе в архиве), пропускаются.
+    Возвращает (записано, конфликтов): конфликт — номер занят подходом с другими
+    весом или повторениями; остальные пропущенные — повторы уже записанных.
+    """
+    async with _import_lock, get_db() as db:
+        try:
+            await db.executemany(_SQL_STAGE_WORKOUT_LOGS, rows)
+            cursor = await db.execute(_SQL_COUNT_WORKOUT_CONFLICTS)
+            conflicts = (await cursor.fetchone())[0]
+            cursor = await db.execute(_SQL_INSERT_WORKOUT_LOGS_BULK)
+            return cursor.rowcount, conflicts
+        finally:
+            await db.execute(_SQL_CLEAR_IMPORT_WORKOUT_LOGS)
+
+
+_SQL_GET_EXERCISE_HISTORY = _sql("get_exercise_history", f"""
+    SELECT {columns(WorkoutLog)} FROM all_workout_logs
+    WHERE user_id = ? AND exercise_id = ?
+    ORDER BY date DESC, set_num
+    LIMIT ?
+""")
+
+
+async def get_exercise_history(user_id: int, exercise_id: int, limit: int = 20) -> list[WorkoutLog]:
     """Получить историю выполнения упражнения пользователем."""
     async with get_db() as db:
-        cursor = await db.execute(
-            """SELECT * FROM workout_logs
-               WHERE user_id = ? AND exercise_id = ?
-               ORDER BY date DESC, set_num
-               LIMIT ?""",
-            (user_id, exercise_id, limit)
-        )
-        return await cursor.fetchall()
+        return await _fetchall(db, WorkoutLog, _SQL_GET_EXERCISE_HISTORY, (user_id, exercise_id, limit))
+
 
+_SQL_LAST_WORKOUT_DATE = _sql("last_workout_date", """
+    SELECT date FROM all_workout_logs
+    WHERE user_id = ? AND exercise_id = ?
+    ORDER BY date DESC LIMIT 1
+""")
+_SQL_WORKOUT_SETS_ON_DATE = _sql("workout_sets_on_date", f"""
+    SELECT {columns(WorkoutLog)} FROM all_workout_logs
+    WHERE user_id = ? AND exercise_id = ? AND date = ?
+    ORDER BY set_num
+""")
 
-async def get_last_workout(user_id: int, exercise_id: int) -> list:
+
+async def get_last_workout(user_id: int, exercise_id: int) -> list[WorkoutLog]:
     """Получить последнюю тренировку по упражнению."""
     async with get_db() as db:
         # Находим последнюю дату
-        cursor = await db.execute(
-            """SELECT date FROM workout_logs
-               WHERE user_id = ? AND exercise_id = ?
-               ORDER BY date DESC LIMIT 1""",
-            (user_id, exercise_id)
-        )
+        cursor = await db.execute(_SQL_LAST_WORKOUT_DATE, (user_id, exercise_id))
         row = await cursor.fetchone()
         if not row:
             return []
 
         last_date = row["date"]
-        cursor = await db.execute(
-            """SELECT * FROM workout_logs
-               WHERE user_id = ? AND exercise_id = ? AND date = ?
-               ORDER BY set_num""",
-            (user_id, exercise_id, last_date)
-        )
-        return await cursor.fetchall()
+        return await _fetchall(db, WorkoutLog, _SQL_WORKOUT_SETS_ON_DATE, (user_id, exercise_id, last_date))
+
+
+_SQL_LAST_WORKOUT_DATES = _sql("last_workout_dates", """
+    SELECT DISTINCT date FROM all_workout_logs
+    WHERE user_id = ? AND exercise_id = ?
+    ORDER BY date DESC LIMIT ?
+""")
 
 
 async def get_last_workouts(user_id: int, exercise_id: int, limit: int = 2) -> list:
@@ -549,12 +1197,7 @@ async def get_last_workouts(user_id: int, exercise_id: int, limit: int = 2) -> l
     """
     async with get_db() as db:
         # Находим последние N уникальных дат
-        cursor = await db.execute(
-            """SELECT DISTINCT date FROM workout_logs
-               WHERE user_id = ? AND exercise_id = ?
-               ORDER BY date DESC LIMIT ?""",
-            (user_id, exercise_id, limit)
-        )
+        cursor = await db.execute(_SQL_LAST_WORKOUT_DATES, (user_id, exercise_id, limit))
         dates = [row["date"] for row in await cursor.fetchall()]
 
         if not dates:
@@ -562,20 +1205,38 @@ async def get_last_workouts(user_id: int, exercise_id: int, limit: int = 2) -> l
 
         result = []
         for d in dates:
-            cursor = await db.execute(
-                """SELECT * FROM workout_logs
-                   WHERE user_id = ? AND exercise_id = ? AND date = ?
-                   ORDER BY set_num""",
-                (user_id, exercise_id, d)
-            )
-            logs = await cursor.fetchall()
+            logs = await _fetchall(db, WorkoutLog, _SQL_WORKOUT_SETS_ON_DATE, (user_id, exercise_id, d))
             result.append({"date": d, "logs": logs})
 
         return result
 
 
+_SQL_MONTH_WORKOUT_DAYS = _sql("month_workout_days", """
+    SELECT COUNT(DISTINCT date) FROM (
+        SELECT date FROM workout_logs WHERE user_id = ? AND date >= ?
+        UNION
+        SELECT date FROM custom_logs WHERE user_id = ? AND date >= ?
+        UNION
+        SELECT date FROM workout_rollups WHERE user_id = ? AND date >= ?
+        UNION
+        SELECT date FROM custom_rollups WHERE user_id = ? AND date >= ?
+    )
+""")
+_SQL_LAST_ACTIVITY_DATE = _sql("last_activity_date", """
+    SELECT MAX(date) FROM (
+        SELECT MAX(date) AS date FROM workout_logs WHERE user_id = ?
+        UNION ALL
+        SELECT MAX(date) FROM custom_logs WHERE user_id = ?
+        UNION ALL
+        SELECT MAX(date) FROM workout_rollups WHERE user_id = ?
+        UNION ALL
+        SELECT MAX(date) FROM custom_rollups WHERE user_id = ?
+    )
+""")
+
+
 async def get_user_stats(user_id: int) -> dict:
-    """Получить статистику пользователя (workout_logs + custom_logs)."""
+    """Получить статистику пользователя (подходы + сводки по архиву)."""
     from datetime import date
 
     today = date.today()
@@ -584,23 +1245,15 @@ async def get_user_stats(user_id: int) -> dict:
     async with get_db() as db:
         # Тренировок в этом месяце
         cursor = await db.execute(
-            """SELECT COUNT(DISTINCT date) FROM (
-                SELECT date FROM workout_logs WHERE user_id = ? AND date >= ?
-                UNION
-                SELECT date FROM custom_logs WHERE user_id = ? AND date >= ?
-            )""",
-            (user_id, month_start, user_id, month_start)
+            _SQL_MONTH_WORKOUT_DAYS,
+            (user_id, month_start) * 4
         )
         month_workouts = (await cursor.fetchone())[0]
 
         # Последняя тренировка
         cursor = await db.execute(
-            """SELECT MAX(date) FROM (
-                SELECT date FROM workout_logs WHERE user_id = ?
-                UNION
-                SELECT date FROM custom_logs WHERE user_id = ?
-            )""",
-            (user_id, user_id)
+            _SQL_LAST_ACTIVITY_DATE,
+            (user_id,) * 4
         )
         last_date_row = await cursor.fetchone()
         last_date = last_date_row[0] if last_date_row and last_date_row[0] else None
@@ -617,51 +1270,143 @@ async def get_user_stats(user_id: int) -> dict:
         }
 
 
+_SQL_DELETE_WORKOUT_LOG = _sql("delete_workout_log", "DELETE FROM workout_logs WHERE id = ? AND user_id = ?")
+
+
 async def delete_workout_log(log_id: int, user_id: int):
     """Удалить запись о тренировке (только свою)."""
     async with get_db() as db:
-        await db.execute(
-            "DELETE FROM workout_logs WHERE id = ? AND user_id = ?",
-            (log_id, user_id)
-        )
+        await db.execute(_SQL_DELETE_WORKOUT_LOG, (log_id, user_id))
 
 
-async def get_workout_sets_count(user_id: int, exercise_id: int, date: str) -> int:
-    """Получить количество подходов за день для упражнения."""
-    async with get_db() as db:
-        cursor = await db.execute(
-            """SELECT COUNT(*) FROM workout_logs
-               WHERE user_id = ? AND exercise_id = ? AND date = ?""",
-            (user_id, exercise_id, date)
-        )
-        return (await cursor.fetchone())[0]
+# ==================== USER PROGRESS ====================
+
+# Прогресс и текущий день читаются на каждом открытии главного меню, поэтому держим
+# их в памяти: прогресс пользователя меняют только функции ниже (они же обновляют
+# кэш), каталог программ — только админ (create_day/delete_day/delete_program
+# сбрасывают его). В установившемся режиме главное меню не делает запросов.
+
+# Для скольких пользователей держать прогресс в памяти
+PROGRESS_CACHE_USERS = 1024
+
+# user_id -> строка user_progress в виде dict (None — прогресса нет)
+_progress_cache: OrderedDict[int, dict | None] = OrderedDict()
+
+# program_id -> {"name", "days": {day_number: Day}, "total_days"}
+_program_catalog: dict[int, dict] = {}
+
+PROGRESS_FIELDS = ("user_id", "program_id", "current_day_num", "last_completed_date", "is_finished")
+
+# Прогресс вместе со всеми днями программы: строка на день (одна — если дней нет)
+_SQL_GET_USER_PROGRESS_TREE = _sql("get_user_progress_tree", """
+    SELECT up.user_id, up.program_id, up.current_day_num, up.last_completed_date, up.is_finished,
+           p.name AS program_name, d.id AS day_id, d.day_number, d.name AS day_name,
+           d.description AS day_description
+    FROM user_progress up
+    LEFT JOIN programs p ON p.id = up.program_id
+    LEFT JOIN days d ON d.program_id = p.id
+    WHERE up.user_id = ?
+""")
+_SQL_GET_PROGRAM_CATALOG = _sql("get_program_catalog", """
+    SELECT p.name AS program_name, d.id AS day_id, d.day_number, d.name AS day_name,
+           d.description AS day_description
+    FROM programs p
+    LEFT JOIN days d ON d.program_id = p.id
+    WHERE p.id = ?
+""")
+
+
+def _cache_progress(user_id: int, progress: dict | None):
+    _progress_cache[user_id] = progress
+    _progress_cache.move_to_end(user_id)
+    if len(_progress_cache) > PROGRESS_CACHE_USERS:
+        _progress_cache.popitem(last=False)
+
+
+def _cache_catalog(program_id: int, rows: list):
+    """Положить программу в каталог из строк с program_name/day_id/day_number/day_name/day_description."""
+    days = {
+        row["day_number"]: Day(row["day_id"], program_id, row["day_number"], row["day_name"], row["day_description"])
+        for row in rows if row["day_id"] is not None
+    }
+    _program_catalog[program_id] = {"name": rows[0]["program_name"], "days": days, "total_days": len(days)}
+
+
+def _invalidate_program_catalog(program_id: int = None):
+    """Сбросить каталог (одну программу или весь, если неизвестно какую)."""
+    if program_id is None:
+        _program_catalog.clear()
+    else:
+        _program_catalog.pop(program_id, None)
+
+
+async def _load_progress(db, user_id: int) -> tuple[dict | None, dict | None]:
+    """(прогресс, программа из каталога) — из кэша или одним запросом."""
+    if user_id in _progress_cache:
+        _progress_cache.move_to_end(user_id)
+        progress = _progress_cache[user_id]
+    else:
+        cursor = await db.execute(_SQL_GET_USER_PROGRESS_TREE, (user_id,))
+        rows = await cursor.fetchall()
+        progress = {field: rows[0][field] for field in PROGRESS_FIELDS} if rows else None
+        _cache_progress(user_id, progress)
+        if rows and rows[0]["program_name"] is not None:
+            _cache_catalog(progress["program_id"], rows)
 
+    if not progress or not progress["program_id"]:
+        return progress, None
+
+    program_id = progress["program_id"]
+    if program_id not in _program_catalog:
+        cursor = await db.execute(_SQL_GET_PROGRAM_CATALOG, (program_id,))
+        rows = await cursor.fetchall()
+        if not rows:
+            return progress, None  # Программу удалили
+        _cache_catalog(program_id, rows)
+    return progress, _program_catalog[program_id]
 
-# ==================== USER PROGRESS ====================
 
 async def get_user_progress(user_id: int) -> dict | None:
     """Получить прогресс пользователя."""
     async with get_db() as db:
-        cursor = await db.execute(
-            "SELECT * FROM user_progress WHERE user_id = ?",
-            (user_id,)
-        )
-        return await cursor.fetchone()
+        progress, _ = await _load_progress(db, user_id)
+    return dict(progress) if progress else None
+
+
+_SQL_SET_USER_PROGRAM = _sql("set_user_program", """
+    INSERT INTO user_progress (user_id, program_id, current_day_num, is_finished)
+    VALUES (?, ?, 1, 0)
+    ON CONFLICT(user_id) DO UPDATE SET
+        program_id = excluded.program_id,
+        current_day_num = 1,
+        is_finished = 0,
+        last_completed_date = NULL
+""")
 
 
 async def set_user_program(user_id: int, program_id: int):
     """Установить активную программу для пользователя (начать с дня 1)."""
     async with get_db() as db:
-        await db.execute(
-            """INSERT INTO user_progress (user_id, program_id, current_day_num, is_finished)
-               VALUES (?, ?, 1, 0)
-               ON CONFLICT(user_id) DO UPDATE SET
-                   program_id = excluded.program_id,
-                   current_day_num = 1,
-                   is_finished = 0,
-                   last_completed_date = NULL""",
-            (user_id, program_id)
-        )
+        await db.execute(_SQL_SET_USER_PROGRAM, (user_id, program_id))
+    _cache_progress(user_id, {
+        "user_id": user_id,
+        "program_id": program_id,
+        "current_day_num": 1,
+        "last_completed_date": None,
+        "is_finished": 0,
+    })
+
+
+_SQL_FINISH_PROGRAM = _sql("finish_program", """
+    UPDATE user_progress
+    SET is_finished = 1, last_completed_date = ?
+    WHERE user_id = ?
+""")
+_SQL_ADVANCE_DAY = _sql("advance_day", """
+    UPDATE user_progress
+    SET current_day_num = ?, last_completed_date = ?
+    WHERE user_id = ?
+""")
 
 
 async def complete_day(user_id: int) -> bool:
@@ -670,301 +1415,416 @@ async def complete_day(user_id: int) -> bool:
     today = date.today().isoformat()
 
     async with get_db() as db:
-        # Получаем текущий прогресс
-        cursor = await db.execute(
-            "SELECT * FROM user_progress WHERE user_id = ?",
-            (user_id,)
-        )
-        progress = await cursor.fetchone()
+        progress, program = await _load_progress(db, user_id)
 
         if not progress or not progress["program_id"]:
             return False
 
-        # Считаем сколько дней в программе
-        cursor = await db.execute(
-            "SELECT COUNT(*) FROM days WHERE program_id = ?",
-            (progress["program_id"],)
-        )
-        total_days = (await cursor.fetchone())[0]
-
-        current_day = progress["current_day_num"]
-        next_day = current_day + 1
+        total_days = program["total_days"] if program else 0
+        next_day = progress["current_day_num"] + 1
 
         if next_day > total_days:
             # Программа завершена
-            await db.execute(
-                """UPDATE user_progress
-                   SET is_finished = 1, last_completed_date = ?
-                   WHERE user_id = ?""",
-                (today, user_id)
-            )
-            return True
+            await db.execute(_SQL_FINISH_PROGRAM, (today, user_id))
+            changes = {"is_finished": 1, "last_completed_date": today}
         else:
             # Переходим к следующему дню
-            await db.execute(
-                """UPDATE user_progress
-                   SET current_day_num = ?, last_completed_date = ?
-                   WHERE user_id = ?""",
-                (next_day, today, user_id)
-            )
-            return False
+            await db.execute(_SQL_ADVANCE_DAY, (next_day, today, user_id))
+            changes = {"current_day_num": next_day, "last_completed_date": today}
+
+    _cache_progress(user_id, {**progress, **changes})
+    return next_day > total_days
 
 
 async def get_current_day_info(user_id: int) -> dict | None:
     """Получить информацию о текущем дне пользователя."""
     async with get_db() as db:
-        # Получаем прогресс
-        cursor = await db.execute(
-            "SELECT * FROM user_progress WHERE user_id = ?",
-            (user_id,)
-        )
-        progress = await cursor.fetchone()
-
-        if not progress or not progress["program_id"] or progress["is_finished"]:
-            return None
-
-        # Получаем программу
-        cursor = await db.execute(
-            "SELECT * FROM programs WHERE id = ?",
-            (progress["program_id"],)
-        )
-        program = await cursor.fetchone()
+        progress, program = await _load_progress(db, user_id)
 
-        if not program:
-            return None
+    if not program or progress["is_finished"]:
+        return None
 
-        # Получаем день
-        cursor = await db.execute(
-            "SELECT * FROM days WHERE program_id = ? AND day_number = ?",
-            (progress["program_id"], progress["current_day_num"])
-        )
-        day = await cursor.fetchone()
+    day = program["days"].get(progress["current_day_num"])
+    if not day:
+        return None
 
-        if not day:
-            return None
-
-        # Считаем всего дней
-        cursor = await db.execute(
-            "SELECT COUNT(*) FROM days WHERE program_id = ?",
-            (progress["program_id"],)
-        )
-        total_days = (await cursor.fetchone())[0]
-
-        return {
-            "program_name": program["name"],
-            "program_id": program["id"],
-            "day_id": day["id"],
-            "day_number": day["day_number"],
-            "day_name": day["name"],
-            "total_days": total_days,
-            "last_completed_date": progress["last_completed_date"]
-        }
+    return {
+        "program_name": program["name"],
+        "program_id": progress["program_id"],
+        "day_id": day["id"],
+        "day_number": progress["current_day_num"],
+        "day_name": day["name"],
+        "total_days": program["total_days"],
+        "last_completed_date": progress["last_completed_date"]
+    }
 
 
 async def get_last_program_info(user_id: int) -> dict | None:
     """Получить информацию о последней программе (даже если завершена)."""
     async with get_db() as db:
-        cursor = await db.execute(
-            "SELECT * FROM user_progress WHERE user_id = ?",
-            (user_id,)
-        )
-        progress = await cursor.fetchone()
+        progress, program = await _load_progress(db, user_id)
 
-        if not progress or not progress["program_id"]:
-            return None
-
-        cursor = await db.execute(
-            "SELECT * FROM programs WHERE id = ?",
-            (progress["program_id"],)
-        )
-        program = await cursor.fetchone()
+    if not program:
+        return None
 
-        if not program:
-            return None
+    # Последний день (current_day_num или последний, если завершена)
+    day_num = progress["current_day_num"]
+    day = program["days"].get(day_num)
 
-        # Получаем последний день (current_day_num или последний если завершена)
-        day_num = progress["current_day_num"]
-        cursor = await db.execute(
-            "SELECT * FROM days WHERE program_id = ? AND day_number = ?",
-            (progress["program_id"], day_num)
-        )
-        day = await cursor.fetchone()
+    return {
+        "program_name": program["name"],
+        "program_id": progress["program_id"],
+        "day_id": day["id"] if day else None,
+        "day_number": day_num,
+        "day_name": day["name"] if day else None,
+        "total_days": program["total_days"],
+        "is_finished": progress["is_finished"]
+    }
 
-        cursor = await db.execute(
-            "SELECT COUNT(*) FROM days WHERE program_id = ?",
-            (progress["program_id"],)
-        )
-        total_days = (await cursor.fetchone())[0]
 
-        return {
-            "program_name": program["name"],
-            "program_id": program["id"],
-            "day_id": day["id"] if day else None,
-            "day_number": day_num,
-            "day_name": day["name"] if day else None,
-            "total_days": total_days,
-            "is_finished": progress["is_finished"]
-        }
+_SQL_CLEAR_USER_PROGRESS = _sql("clear_user_progress", "DELETE FROM user_progress WHERE user_id = ?")
 
 
 async def clear_user_progress(user_id: int):
     """Сбросить прогресс пользователя."""
     async with get_db() as db:
-        await db.execute(
-            "DELETE FROM user_progress WHERE user_id = ?",
-            (user_id,)
-        )
+        await db.execute(_SQL_CLEAR_USER_PROGRESS, (user_id,))
+    _cache_progress(user_id, None)
 
 
 # ==================== CUSTOM LOGS (свои упражнения) ====================
 
-async def log_custom_exercise(
-    user_id: int,
-    name: str,
-    date: str,
-    weight: float = None,
-    reps: int = None,
-    duration_minutes: int = None
-) -> int:
-    """Записать своё упражнение (силовое или кардио)."""
-    async with get_db() as db:
-        # Считаем номер подхода за сегодня для этого упражнения
-        cursor = await db.execute(
-            """SELECT COUNT(*) FROM custom_logs
-               WHERE user_id = ? AND name = ? AND date = ?""",
-            (user_id, name, date)
-        )
-        count = (await cursor.fetchone())[0]
-        set_num = count + 1
+# Канонические названия -> id в custom_exercise_names (id не меняются; при переполнении кэш сбрасывается)
+CUSTOM_NAME_CACHE_SIZE = 4096
+_custom_name_cache: dict[str, int] = {}
+
+
+_SQL_CUSTOM_NAME_IDS = _sql("custom_name_ids", """
+    INSERT OR IGNORE INTO custom_exercise_names (canonical) VALUES (?)
+""")
+
+
+async def _custom_name_ids(db, names) -> dict[str, int]:
+    """id в словаре названий для каждого названия (недостающие заводятся).
 
+    Возвращает {название как передано: name_id}.
+    """
+    canonical = {name: canonical_exercise_name(name) for name in names}
+    missing = {c for c in canonical.values() if c not in _custom_name_cache}
+    if missing:
+        if len(_custom_name_cache) + len(missing) > CUSTOM_NAME_CACHE_SIZE:
+            _custom_name_cache.clear()
+            missing = set(canonical.values())
+        await db.executemany(_SQL_CUSTOM_NAME_IDS, [(c,) for c in missing])
+        placeholders = ",".join("?" * len(missing))
         cursor = await db.execute(
-            """INSERT INTO custom_logs (user_id, name, weight, reps, duration_minutes, set_num, date)
-               VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (user_id, name, weight, reps, duration_minutes, set_num, date)
+            f"SELECT canonical, id FROM custom_exercise_names WHERE canonical IN ({placeholders})",
+            tuple(missing)
         )
-        return cursor.lastrowid
+        _custom_name_cache.update(await cursor.fetchall())
+    return {name: _custom_name_cache[c] for name, c in canonical.items()}
+
 
+# Как и _SQL_LOG_WORKOUT: sets подходов с номерами после уже записанных за день
+_SQL_LOG_CUSTOM_SETS = _sql("log_custom_sets", """
+    INSERT INTO custom_logs (user_id, name, name_id, weight, reps, duration_minutes, rpe, set_num, date)
+    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+    SELECT ?, ?, ?, ?, ?, ?, ?, last.set_num + n.i, ?
+    FROM n, (
+        SELECT COALESCE(MAX(set_num), 0) AS set_num FROM all_custom_logs
+        WHERE user_id = ? AND name_id = ? AND date = ?
+    ) last
+""")
 
-async def get_custom_history(user_id: int, name: str, limit: int = 20) -> list:
-    """Получить историю своего упражнения."""
+
+async def log_custom_exercises_batch(user_id: int, date: str, entries: list[dict]):
+    """Записать несколько своих упражнений одной транзакцией.
+
+    entries — результаты разбора ввода: {"type": "strength", "name", "weight", "reps", "sets", "rpe"}
+    или {"type": "cardio", "name", "duration"}. Каждое упражнение — один INSERT,
+    который сам выдаёт номера подходов после уже записанных за этот день.
+    """
     async with get_db() as db:
-        cursor = await db.execute(
-            """SELECT * FROM custom_logs
-               WHERE user_id = ? AND name = ?
-               ORDER BY date DESC, set_num
-               LIMIT ?""",
-            (user_id, name, limit)
-        )
-        return await cursor.fetchall()
+        name_ids = await _custom_name_ids(db, {entry["name"] for entry in entries})
+
+        used = {}
+        for entry in entries:
+            name_id = name_ids[entry["name"]]
+            if entry["type"] == "cardio":
+                weight, reps, duration, sets, rpe = None, None, entry["duration"], 1, None
+            else:
+                weight, reps, duration, sets = entry["weight"], entry["reps"], None, entry["sets"]
+                rpe = entry.get("rpe")
+            cursor = await db.execute(_SQL_LOG_CUSTOM_SETS, (
+                sets, user_id, entry["name"], name_id, weight, reps, duration, rpe, date,
+                user_id, name_id, date
+            ))
+            # lastrowid — у курсора этого INSERT: вставки других пользователей
+            # на общем соединении его не меняют
+            used[entry["name"]] = cursor.lastrowid
+        await _remember_recent_custom(db, user_id, used)
+
+
+# Как и для подходов из программы: пачка через временную таблицу
+_SQL_STAGE_CUSTOM_LOGS = _sql("stage_custom_logs", """
+    INSERT INTO temp.import_custom_logs (user_id, name, name_id, weight, reps, duration_minutes, set_num, date)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+""")
+# Вес, повторения и длительность могут быть NULL — сравнение через IS NOT
+_SQL_COUNT_CUSTOM_CONFLICTS = _sql("count_custom_conflicts", """
+    SELECT COUNT(*) FROM temp.import_custom_logs AS i
+    WHERE EXISTS (
+        SELECT 1 FROM main.custom_logs AS l
+        WHERE l.user_id = i.user_id AND l.name_id = i.name_id AND l.date = i.date
+          AND l.set_num = i.set_num
+          AND (l.weight IS NOT i.weight OR l.reps IS NOT i.reps OR l.duration_minutes IS NOT i.duration_minutes)
+    ) OR EXISTS (
+        SELECT 1 FROM archive.custom_logs AS l
+        WHERE l.user_id = i.user_id AND l.name_id = i.name_id AND l.date = i.date
+          AND l.set_num = i.set_num
+          AND (l.weight IS NOT i.weight OR l.reps IS NOT i.reps OR l.duration_minutes IS NOT i.duration_minutes)
+    )
+""")
+_SQL_INSERT_CUSTOM_LOGS_BULK = _sql("insert_custom_logs_bulk", """
+    INSERT INTO custom_logs (user_id, name, name_id, weight, reps, duration_minutes, set_num, date)
+    SELECT user_id, name, name_id, weight, reps, duration_minutes, set_num, date
+    FROM temp.import_custom_logs AS i
+    WHERE NOT EXISTS (
+        SELECT 1 FROM archive.custom_logs AS a
+        WHERE a.user_id = i.user_id AND a.name_id = i.name_id AND a.date = i.date
+          AND a.set_num = i.set_num
+    )
+    ORDER BY i.rowid
+    ON CONFLICT (user_id, name_id, date, set_num) DO NOTHING
+""")
+_SQL_CLEAR_IMPORT_CUSTOM_LOGS = _sql("clear_import_custom_logs", "DELETE FROM temp.import_custom_logs")
+
+
+async def insert_custom_logs_bulk(rows: list[tuple]) -> tuple[int, int]:
+    """Записать пачку своих упражнений одной транзакцией (импорт).
+
+    rows: (user_id, name, weight, reps, duration_minutes, set_num, date). Подходы,
+    номер которых за этот день уже занят (в том числе в архиве), пропускаются.
+    Возвращает (записано, конфликтов), как insert_workout_logs_bulk.
+    """
+    async with _import_lock, get_db() as db:
+        name_ids = await _custom_name_ids(db, {row[1] for row in rows})
+        try:
+            await db.executemany(
+                _SQL_STAGE_CUSTOM_LOGS,
+                [(row[0], row[1], name_ids[row[1]], *row[2:]) for row in rows]
+            )
+            cursor = await db.execute(_SQL_COUNT_CUSTOM_CONFLICTS)
+            conflicts = (await cursor.fetchone())[0]
+            cursor = await db.execute(_SQL_INSERT_CUSTOM_LOGS_BULK)
+            return cursor.rowcount, conflicts
+        finally:
+            await db.execute(_SQL_CLEAR_IMPORT_CUSTOM_LOGS)
+
 
+_SQL_GET_CUSTOM_HISTORY = _sql("get_custom_history", f"""
+    SELECT {columns(CustomLog)} FROM all_custom_logs
+    WHERE user_id = ?
+      AND name_id = (SELECT id FROM custom_exercise_names WHERE canonical = ?)
+    ORDER BY date DESC, set_num
+    LIMIT ?
+""")
 
-async def get_recent_custom_exercises(user_id: int, limit: int = 5) -> list:
-    """Получить последние свои упражнения (уникальные названия)."""
+
+async def get_custom_history(user_id: int, name: str, limit: int = 20) -> list[CustomLog]:
+    """Получить историю своего упражнения (все написания одного названия)."""
     async with get_db() as db:
-        cursor = await db.execute(
-            """SELECT DISTINCT name FROM custom_logs
-               WHERE user_id = ?
-               ORDER BY date DESC, id DESC
-               LIMIT ?""",
-            (user_id, limit)
+        return await _fetchall(
+            db, CustomLog, _SQL_GET_CUSTOM_HISTORY, (user_id, canonical_exercise_name(name), limit)
         )
-        rows = await cursor.fetchall()
-        return [row[0] for row in rows]
 
 
-async def get_today_custom_logs(user_id: int, date: str) -> list:
-    """Получить свои упражнения за сегодня."""
+# Сколько последних своих упражнений помнить на пользователя
+RECENT_CUSTOM_LIMIT = 5
+# Для скольких пользователей держать список в памяти (остальные читаются из таблицы)
+RECENT_CUSTOM_CACHE_USERS = 1024
+
+# user_id -> OrderedDict{название: id последней записи}, самое свежее в конце
+_recent_custom: OrderedDict[int, OrderedDict[str, int]] = OrderedDict()
+
+
+_SQL_LOAD_RECENT_CUSTOM = _sql("load_recent_custom", """
+    SELECT name, last_log_id FROM user_recent_custom
+    WHERE user_id = ?
+    ORDER BY last_log_id
+""")
+
+
+async def _load_recent_custom(db, user_id: int) -> OrderedDict[str, int]:
+    """Список последних упражнений пользователя (из кэша или из таблицы)."""
+    recent = _recent_custom.get(user_id)
+    if recent is None:
+        cursor = await db.execute(_SQL_LOAD_RECENT_CUSTOM, (user_id,))
+        recent = OrderedDict(await cursor.fetchall())
+        _recent_custom[user_id] = recent
+        if len(_recent_custom) > RECENT_CUSTOM_CACHE_USERS:
+            _recent_custom.popitem(last=False)
+    else:
+        _recent_custom.move_to_end(user_id)
+    return recent
+
+
+_SQL_REMEMBER_RECENT_CUSTOM = _sql("remember_recent_custom", """
+    INSERT INTO user_recent_custom (user_id, name, last_log_id) VALUES (?, ?, ?)
+    ON CONFLICT(user_id, name) DO UPDATE SET last_log_id = excluded.last_log_id
+""")
+
+
+async def _remember_recent_custom(db, user_id: int, used: dict[str, int]):
+    """Обновить последние упражнения после записи (в той же транзакции).
+
+    used: название -> id последней записи этого упражнения.
+    """
+    recent = await _load_recent_custom(db, user_id)
+    for name, log_id in sorted(used.items(), key=lambda item: item[1]):
+        # Другое написание того же упражнения заменяется свежим
+        canonical = canonical_exercise_name(name)
+        for spelling in [n for n in recent if canonical_exercise_name(n) == canonical]:
+            del recent[spelling]
+        recent[name] = log_id
+    while len(recent) > RECENT_CUSTOM_LIMIT:
+        recent.popitem(last=False)
+
+    await db.executemany(
+        _SQL_REMEMBER_RECENT_CUSTOM,
+        [(user_id, name, log_id) for name, log_id in used.items() if name in recent]
+    )
+    placeholders = ",".join("?" * len(recent))
+    await db.execute(
+        f"DELETE FROM user_recent_custom WHERE user_id = ? AND name NOT IN ({placeholders})",
+        (user_id, *recent)
+    )
+
+
+async def get_recent_custom_exercises(user_id: int, limit: int = RECENT_CUSTOM_LIMIT) -> list:
+    """Получить последние свои упражнения (уникальные названия, свежие первыми)."""
     async with get_db() as db:
-        cursor = await db.execute(
-            """SELECT * FROM custom_logs
-               WHERE user_id = ? AND date = ?
-               ORDER BY id""",
-            (user_id, date)
-        )
-        return await cursor.fetchall()
+        recent = await _load_recent_custom(db, user_id)
+    return list(reversed(recent))[:limit]
 
 
-async def get_daily_activity(user_id: int, date: str) -> dict:
-    """Получить активность за конкретный день."""
+_SQL_GET_TODAY_CUSTOM_LOGS = _sql("get_today_custom_logs", f"""
+    SELECT {columns(CustomLog)} FROM all_custom_logs
+    WHERE user_id = ? AND date = ?
+    ORDER BY id
+""")
+
+
+async def get_today_custom_logs(user_id: int, date: str) -> list[CustomLog]:
+    """Получить свои упражнения за сегодня."""
     async with get_db() as db:
-        # Упражнения из программы
-        cursor = await db.execute(
-            """SELECT e.name, wl.weight, wl.reps, wl.set_num
-               FROM workout_logs wl
-               JOIN exercises e ON wl.exercise_id = e.id
-               WHERE wl.user_id = ? AND wl.date = ?
-               ORDER BY wl.id""",
-            (user_id, date)
-        )
-        workout_rows = await cursor.fetchall()
+        return await _fetchall(db, CustomLog, _SQL_GET_TODAY_CUSTOM_LOGS, (user_id, date))
+
+
+_SQL_DAILY_WORKOUT_SETS = _sql("daily_workout_sets", """
+    SELECT e.name, wl.weight, wl.reps, NULL AS duration_minutes, wl.set_num
+    FROM all_workout_logs wl
+    JOIN exercises e ON wl.exercise_id = e.id
+    WHERE wl.user_id = ? AND wl.date = ?
+    ORDER BY wl.id
+""")
+_SQL_DAILY_CUSTOM_SETS = _sql("daily_custom_sets", """
+    SELECT name, weight, reps, duration_minutes, set_num
+    FROM all_custom_logs
+    WHERE user_id = ? AND date = ?
+    ORDER BY id
+""")
 
-        # Свои упражнения
-        cursor = await db.execute(
-            """SELECT name, weight, reps, duration_minutes, set_num
-               FROM custom_logs
-               WHERE user_id = ? AND date = ?
-               ORDER BY id""",
-            (user_id, date)
-        )
-        custom_rows = await cursor.fetchall()
 
+async def get_daily_activity(user_id: int, date: str) -> dict:
+    """Получить активность за конкретный день.
+
+    Returns:
+        {"workouts": [ActivitySet], "custom": [ActivitySet]}
+    """
+    async with get_db() as db:
         return {
-            "workouts": [dict(r) for r in workout_rows],
-            "custom": [dict(r) for r in custom_rows]
+            # Упражнения из программы
+            "workouts": await _fetchall(db, ActivitySet, _SQL_DAILY_WORKOUT_SETS, (user_id, date)),
+            # Свои упражнения
+            "custom": await _fetchall(db, ActivitySet, _SQL_DAILY_CUSTOM_SETS, (user_id, date)),
         }
 
 
 # ==================== ALLOWED USERS ====================
 
+# Кэш разрешённых пользователей: проверка доступа на каждый апдейт без запроса в БД.
+# Запрещённых не кэшируем — они могут ввести код в любой момент.
+_allowed_cache: set[int] = set()
+
+
+def is_user_allowed_cached(user_id: int) -> bool:
+    """Быстрая проверка по кэшу (False — значит, нужно спросить БД)."""
+    return user_id in _allowed_cache
+
+
+_SQL_IS_USER_ALLOWED = _sql("is_user_allowed", "SELECT 1 FROM allowed_users WHERE user_id = ?")
+
+
 async def is_user_allowed(user_id: int) -> bool:
     """Проверить, разрешён ли пользователь."""
+    if user_id in _allowed_cache:
+        return True
     async with get_db() as db:
-        cursor = await db.execute(
-            "SELECT 1 FROM allowed_users WHERE user_id = ?",
-            (user_id,)
-        )
-        return await cursor.fetchone() is not None
+        cursor = await db.execute(_SQL_IS_USER_ALLOWED, (user_id,))
+        allowed = await cursor.fetchone() is not None
+    if allowed:
+        _allowed_cache.add(user_id)
+    return allowed
+
+
+_SQL_ADD_ALLOWED_USER = _sql("add_allowed_user", """
+    INSERT OR REPLACE INTO allowed_users (user_id, username, full_name)
+    VALUES (?, ?, ?)
+""")
 
 
 async def add_allowed_user(user_id: int, username: str = None, full_name: str = None):
     """Добавить пользователя в список разрешённых."""
     async with get_db() as db:
-        await db.execute(
-            """INSERT OR REPLACE INTO allowed_users (user_id, username, full_name)
-               VALUES (?, ?, ?)""",
-            (user_id, username, full_name)
-        )
+        await db.execute(_SQL_ADD_ALLOWED_USER, (user_id, username, full_name))
+    _allowed_cache.add(user_id)
+
+
+_SQL_REMOVE_ALLOWED_USER = _sql("remove_allowed_user", "DELETE FROM allowed_users WHERE user_id = ?")
 
 
 async def remove_allowed_user(user_id: int):
     """Удалить пользователя из списка разрешённых."""
     async with get_db() as db:
-        await db.execute(
-            "DELETE FROM allowed_users WHERE user_id = ?",
-            (user_id,)
-        )
+        await db.execute(_SQL_REMOVE_ALLOWED_USER, (user_id,))
+    _allowed_cache.discard(user_id)
+
+
+_SQL_GET_ALL_ALLOWED_USERS = _sql("get_all_allowed_users", """
+    SELECT * FROM allowed_users ORDER BY approved_at DESC
+""")
 
 
 async def get_all_allowed_users() -> list:
     """Получить всех разрешённых пользователей."""
     async with get_db() as db:
-        cursor = await db.execute(
-            "SELECT * FROM allowed_users ORDER BY approved_at DESC"
-        )
+        cursor = await db.execute(_SQL_GET_ALL_ALLOWED_USERS)
         return await cursor.fetchall()
 
 
 # ==================== TAGS ====================
 
+_SQL_GET_ALL_TAGS = _sql("get_all_tags", "SELECT tag FROM exercises WHERE tag IS NOT NULL AND tag != ''")
+
+
 async def get_all_tags() -> list:
     """Получить все уникальные теги из упражнений.
 
     Теги могут храниться через запятую, поэтому разбираем их.
     """
     async with get_db() as db:
-        cursor = await db.execute(
-            """SELECT tag FROM exercises WHERE tag IS NOT NULL AND tag != ''"""
-        )
+        cursor = await db.execute(_SQL_GET_ALL_TAGS)
         rows = await cursor.fetchall()
 
     # Разбираем теги через запятую и считаем
@@ -978,7 +1838,22 @@ async def get_all_tags() -> list:
             for name, count in sorted(tag_counts.items())]
 
 
-async def get_exercises_by_tag(tag: str) -> list:
+_SQL_GET_EXERCISES_BY_TAG = _sql("get_exercises_by_tag", f"""
+    SELECT {columns(Exercise, "e")}, d.name AS day_name, d.day_number, p.name AS program_name
+    FROM exercises e
+    LEFT JOIN day_exercises de ON e.id = de.exercise_id
+    LEFT JOIN days d ON de.day_id = d.id
+    LEFT JOIN programs p ON d.program_id = p.id
+    WHERE LOWER(e.tag) = ?
+       OR LOWER(e.tag) LIKE ?
+       OR LOWER(e.tag) LIKE ?
+       OR LOWER(e.tag) LIKE ?
+    GROUP BY e.id
+    ORDER BY e.name
+""")
+
+
+async def get_exercises_by_tag(tag: str) -> list[TaggedExercise]:
     """Получить все упражнения с данным тегом (из всех программ).
 
     Ищет тег в списке тегов, разделённых запятыми.
@@ -987,27 +1862,339 @@ async def get_exercises_by_tag(tag: str) -> list:
     tag = tag.strip().lower()
     async with get_db() as db:
         # Получаем упражнения с первым найденным днём (для отображения контекста)
-        cursor = await db.execute(
-            """SELECT DISTINCT e.*, d.name as day_name, d.day_number, p.name as program_name
-               FROM exercises e
-               LEFT JOIN day_exercises de ON e.id = de.exercise_id
-               LEFT JOIN days d ON de.day_id = d.id
-               LEFT JOIN programs p ON d.program_id = p.id
-               WHERE LOWER(e.tag) = ?
-                  OR LOWER(e.tag) LIKE ?
-                  OR LOWER(e.tag) LIKE ?
-                  OR LOWER(e.tag) LIKE ?
-               GROUP BY e.id
-               ORDER BY e.name""",
-            (tag, f"{tag},%", f"%, {tag}", f"%, {tag},%")
+        return await _fetchall(
+            db, TaggedExercise, _SQL_GET_EXERCISES_BY_TAG, (tag, f"{tag},%", f"%, {tag}", f"%, {tag},%")
         )
-        return await cursor.fetchall()
+
+
+_SQL_UPDATE_EXERCISE_TAG = _sql("update_exercise_tag", "UPDATE exercises SET tag = ? WHERE id = ?")
 
 
 async def update_exercise_tag(exercise_id: int, tag: str | None):
     """Обновить тег упражнения."""
     async with get_db() as db:
-        await db.execute(
-            "UPDATE exercises SET tag = ? WHERE id = ?",
-            (tag.lower() if tag else None, exercise_id)
-        )
\ No newline at end of file
+        await db.execute(_SQL_UPDATE_EXERCISE_TAG, (tag.lower() if tag else None, exercise_id))
+
+# ==================== RECOMMENDATIONS ====================
+
+_SQL_GET_EXERCISE_USAGE = _sql("get_exercise_usage", """
+    SELECT e.id, e.name, e.description, e.tag,
+           COALESCE(SUM(u.sets), 0) AS total_uses,
+           COALESCE(SUM(u.user_sets), 0) AS user_uses,
+           MAX(u.user_last_date) AS user_last_date
+    FROM exercises e
+    LEFT JOIN (
+        SELECT exercise_id, 1 AS sets, user_id = ? AS user_sets,
+               CASE WHEN user_id = ? THEN date END AS user_last_date
+        FROM workout_logs
+        UNION ALL
+        SELECT exercise_id, sets, CASE WHEN user_id = ? THEN sets ELSE 0 END,
+               CASE WHEN user_id = ? THEN date END
+        FROM workout_rollups
+    ) u ON u.exercise_id = e.id
+    WHERE e.tag IS NOT NULL AND e.tag != ''
+    GROUP BY e.id
+""")
+
+
+async def get_exercise_usage(user_id: int) -> list:
+    """Получить упражнения с тегами и статистикой использования.
+
+    Для каждого упражнения: сколько подходов записал пользователь,
+    сколько всего подходов в базе и дата последнего подхода пользователя.
+    """
+    async with get_db() as db:
+        cursor = await db.execute(
+            _SQL_GET_EXERCISE_USAGE,
+            (user_id,) * 4
+        )
+        return await cursor.fetchall()
+
+
+# ==================== EXPORT ====================
+
+# Колонки выгрузки истории (общие для подходов по программе и своих упражнений)
+EXPORT_FIELDS = ("date", "source", "exercise", "set_num", "weight", "reps", "duration_minutes", "created_at")
+
+
+async def iter_user_history(user_id: int, chunk_size: int = 500):
+    """Вся история пользователя порциями по chunk_size строк.
+
+    Читает через отдельное соединение курсором (fetchmany), чтобы длинная
+    выгрузка не держала общее соединение и не загружала историю в память целиком.
+    """
+    async with aiosqlite.connect(DATABASE_PATH) as conn:
+        await _attach_archive(conn)
+        cursor = await conn.execute(
+            """SELECT wl.date, 'program' AS source, e.name AS exercise, wl.set_num,
+                      wl.weight, wl.reps, NULL AS duration_minutes, wl.created_at
+               FROM all_workout_logs wl
+               JOIN exercises e ON e.id = wl.exercise_id
+               WHERE wl.user_id = ?
+               UNION ALL
+               SELECT date, 'custom', name, set_num, weight, reps, duration_minutes, created_at
+               FROM all_custom_logs
+               WHERE user_id = ?
+               ORDER BY 1, 8""",
+            (user_id, user_id)
+        )
+        while True:
+            rows = await cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+
+# ==================== ARCHIVE ====================
+
+# Сколько подходов переносить за одну транзакцию
+ARCHIVE_BATCH_SIZE = 5000
+
+# Для каждой таблицы: колонки, общие с архивной копией, колонка упражнения и
+# пересчёт дневных сводок по архиву для дней, затронутых пачкой (дни пачки —
+# по диапазону id, NOT INDEXED: иначе SQLite обходит весь индекс подходов)
+_ARCHIVE_TABLES = {
+    "workout_logs": (
+        "id, user_id, exercise_id, weight, reps, set_num, date, created_at",
+        "exercise_id",
+        """INSERT INTO workout_rollups (user_id, exercise_id, date, sets, reps, max_weight, volume)
+           SELECT user_id, exercise_id, date, COUNT(*), SUM(reps), MAX(weight), SUM(weight * reps)
+           FROM (
+               SELECT DISTINCT user_id, exercise_id, date FROM main.workout_logs NOT INDEXED WHERE date < ? AND id > ? AND id <= ?
+           ) AS batch
+           JOIN archive.workout_logs USING (user_id, exercise_id, date)
+           GROUP BY user_id, exercise_id, date
+           ON CONFLICT(user_id, exercise_id, date) DO UPDATE SET
+               sets = excluded.sets,
+               reps = excluded.reps,
+               max_weight = excluded.max_weight,
+               volume = excluded.volume""",
+    ),
+    "custom_logs": (
+        "id, user_id, name, name_id, weight, reps, duration_minutes, rpe, set_num, date, created_at",
+        "name_id",
+        """INSERT INTO custom_rollups (user_id, name_id, date, sets, reps, max_weight, volume, duration_minutes)
+           SELECT user_id, name_id, date, COUNT(*), COALESCE(SUM(reps), 0), COALESCE(MAX(weight), 0),
+                  TOTAL(weight * reps), COALESCE(SUM(duration_minutes), 0)
+           FROM (
+               SELECT DISTINCT user_id, name_id, date FROM main.custom_logs NOT INDEXED WHERE date < ? AND id > ? AND id <= ?
+           ) AS batch
+           JOIN archive.custom_logs USING (user_id, name_id, date)
+           GROUP BY user_id, name_id, date
+           ON CONFLICT(user_id, name_id, date) DO UPDATE SET
+               sets = excluded.sets,
+               reps = excluded.reps,
+               max_weight = excluded.max_weight,
+               volume = excluded.volume,
+               duration_minutes = excluded.duration_minutes""",
+    ),
+}
+
+
+async def archive_old_logs(before: str, batch_size: int = ARCHIVE_BATCH_SIZE) -> dict:
+    """Перенести подходы с датой раньше before в архивную БД.
+
+    Каждая пачка переносится двумя транзакциями, каждая пишет только в один
+    файл: в режиме WAL коммит сразу в основную и подключённую БД не атомарен.
+    Сначала строки копируются в архив (кроме тех, чей номер подхода за этот
+    день там уже есть — остатки прерванного переноса и повторный импорт),
+    затем дневные сводки затронутых дней пересчитываются по архиву целиком
+    и из основной таблицы удаляются строки, чей id теперь есть в архиве.
+    Сбой между транзакциями оставит пачку в обоих файлах; следующий запуск
+    её доделает без двойного счёта. Нескопированные строки (номер занят
+    в архиве) остаются в основной таблице и в перенесённые не входят; пачки
+    идут по возрастанию id, поэтому такие строки не выбираются повторно.
+    Работает через отдельное соединение короткими транзакциями, чтобы не
+    блокировать бота надолго.
+
+    Returns:
+        {"workout_logs": перенесено, "custom_logs": перенесено}
+    """
+    moved = dict.fromkeys(_ARCHIVE_TABLES, 0)
+    async with aiosqlite.connect(DATABASE_PATH, isolation_level=None) as conn:
+        await _attach_archive(conn)
+        for table, (columns, key, rollup_sql) in _ARCHIVE_TABLES.items():
+            last_id = 0
+            while True:
+                await conn.execute("BEGIN IMMEDIATE")
+                try:
+                    cursor = await conn.execute(
+                        f"""SELECT MAX(id) FROM (
+                               SELECT id FROM main.{table} WHERE date < ? AND id > ? ORDER BY id LIMIT ?
+                           )""",
+                        (before, last_id, batch_size)
+                    )
+                    max_id = (await cursor.fetchone())[0]
+                    if max_id is not None:
+                        await conn.execute(
+                            f"""INSERT INTO archive.{table} ({columns})
+                                SELECT {columns} FROM main.{table} AS m
+                                WHERE m.date < ? AND m.id > ? AND m.id <= ? AND NOT EXISTS (
+                                    SELECT 1 FROM archive.{table} AS a
+                                    WHERE a.user_id = m.user_id AND a.{key} = m.{key} AND a.date = m.date
+                                      AND (a.set_num = m.set_num OR a.id = m.id)
+                                )""",
+                            (before, last_id, max_id)
+                        )
+                    await conn.execute("COMMIT")
+                except Exception:
+                    await conn.execute("ROLLBACK")
+                    raise
+                if max_id is None:
+                    break
+
+                await conn.execute("BEGIN IMMEDIATE")
+                try:
+                    await conn.execute(rollup_sql, (before, last_id, max_id))
+                    cursor = await conn.execute(
+                        f"""DELETE FROM main.{table} AS m
+                            WHERE m.date < ? AND m.id > ? AND m.id <= ? AND EXISTS (
+                                SELECT 1 FROM archive.{table} AS a
+                                WHERE a.user_id = m.user_id AND a.{key} = m.{key} AND a.date = m.date
+                                  AND a.id = m.id
+                            )""",
+                        (before, last_id, max_id)
+                    )
+                    moved[table] += cursor.rowcount
+                    await conn.execute("COMMIT")
+                except Exception:
+                    await conn.execute("ROLLBACK")
+                    raise
+                last_id = max_id
+    return moved
+
+
+# ==================== ORPHANS ====================
+
+# Строк за одну транзакцию сборщика
+ORPHAN_BATCH_SIZE = 500
+
+
+def _orphan_delete(table: str, key: str, condition: str) -> str:
+    """Запрос: удалить пачку строк table (алиас t), для которых выполнено condition."""
+    return f"""
+        DELETE FROM {table} WHERE ({key}) IN (
+            SELECT {key} FROM {table} AS t WHERE {condition} LIMIT ?
+        )
+    """
+
+
+def _orphan_set_null(table: str, column: str, parent: str) -> str:
+    """Запрос: обнулить пачку ссылок table.column на несуществующие строки parent."""
+    return f"""
+        UPDATE {table} SET {column} = NULL WHERE rowid IN (
+            SELECT rowid FROM {table} AS t
+            WHERE t.{column} IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM {parent} p WHERE p.id = t.{column})
+            LIMIT ?
+        )
+    """
+
+
+# Строки, оставшиеся от удалений без foreign_keys=ON (и архивные/сводные, где
+# внешних ключей нет), по правилам ON DELETE из схемы. Порядок важен: удаление
+# дня каскадом убирает его day_exercises, удаление подходов — до сводок и архива
+_ORPHAN_RULES = {
+    "days": _orphan_delete(
+        "main.days", "rowid",
+        "NOT EXISTS (SELECT 1 FROM main.programs p WHERE p.id = t.program_id)"
+    ),
+    "day_exercises": _orphan_delete(
+        "main.day_exercises", "rowid",
+        "NOT EXISTS (SELECT 1 FROM main.days d WHERE d.id = t.day_id)"
+        " OR NOT EXISTS (SELECT 1 FROM main.exercises e WHERE e.id = t.exercise_id)"
+    ),
+    "workout_logs": _orphan_delete(
+        "main.workout_logs", "rowid",
+        "NOT EXISTS (SELECT 1 FROM main.exercises e WHERE e.id = t.exercise_id)"
+    ),
+    "workout_rollups": _orphan_delete(
+        "main.workout_rollups", "user_id, exercise_id, date",
+        "NOT EXISTS (SELECT 1 FROM main.exercises e WHERE e.id = t.exercise_id)"
+    ),
+    "archive.workout_logs": _orphan_delete(
+        "archive.workout_logs", "user_id, exercise_id, date, id",
+        "NOT EXISTS (SELECT 1 FROM main.exercises e WHERE e.id = t.exercise_id)"
+    ),
+    "user_progress": _orphan_set_null("main.user_progress", "program_id", "main.programs"),
+    "exercises.day_id": _orphan_set_null("main.exercises", "day_id", "main.days"),
+}
+
+
+async def collect_orphans(batch_size: int = ORPHAN_BATCH_SIZE) -> dict:
+    """Убрать строки, ссылающиеся на удалённые программы, дни и упражнения.
+
+    Как и archive_old_logs, работает через отдельное соединение короткими
+    транзакциями по batch_size строк, между ними бот успевает писать.
+
+    Returns:
+        {правило из _ORPHAN_RULES: сколько строк удалено или обнулено}
+    """
+    collected = dict.fromkeys(_ORPHAN_RULES, 0)
+    async with aiosqlite.connect(DATABASE_PATH, isolation_level=None) as conn:
+        await _attach_archive(conn)
+        for name, sql in _ORPHAN_RULES.items():
+            while True:
+                await conn.execute("BEGIN IMMEDIATE")
+                try:
+                    cursor = await conn.execute(sql, (batch_size,))
+                    await conn.execute("COMMIT")
+                except Exception:
+                    await conn.execute("ROLLBACK")
+                    raise
+                collected[name] += cursor.rowcount
+                if cursor.rowcount < batch_size:
+                    break
+
+    # Кэши в памяти могли ссылаться на удалённое
+    if collected["days"] or collected["user_progress"]:
+        _invalidate_program_catalog()
+        _progress_cache.clear()
+    return collected
+
+
+# ==================== MAINTENANCE ====================
+# Индексы, которые читаются почти на каждый апдейт: при прогреве страницы
+# попадают в кэш (и в mmap), первые запросы после старта не идут на диск
+HOT_INDEXES = (
+    ("allowed_users", None),
+    ("user_progress", None),
+    ("exercises", "idx_exercises_day"),
+    ("days", "idx_days_program"),
+    ("day_exercises", "idx_day_exercises_order"),
+    ("workout_logs", "idx_workout_logs_set"),
+    ("custom_logs", "idx_custom_logs_user_date"),
+)
+
+
+async def warmup() -> dict:
+    """Прогреть соединение после старта.
+
+    Загружает кэш разрешённых пользователей, прочитывает горячие индексы и
+    компилирует все выражения реестра. Возвращает {"allowed_users", "rows",
+    "statements"} — сколько пользователей в кэше, сколько строк индексов
+    прочитано и сколько выражений подготовлено.
+    """
+    async with get_db() as db:
+        cursor = await db.execute("SELECT user_id FROM allowed_users")
+        _allowed_cache.update(row[0] for row in await cursor.fetchall())
+
+        rows = 0
+        for table, index in HOT_INDEXES:
+            indexed = f" INDEXED BY {index}" if index else ""
+            cursor = await db.execute(f"SELECT COUNT(*) FROM {table}{indexed}")
+            rows += (await cursor.fetchone())[0]
+
+    statements = await _prepare_statements(await get_connection())
+    return {"allowed_users": len(_allowed_cache), "rows": rows, "statements": statements}
+
+
+async def optimize_db() -> tuple:
+    """PRAGMA optimize и сброс WAL в основной файл с усечением журнала.
+
+    Возвращает результат wal_checkpoint: (busy, страниц в журнале, перенесено).
+    """
+    async with get_db() as db:
+        await db.execute("PRAGMA optimize")
+        cursor = await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return tuple(await cursor.fetchone())
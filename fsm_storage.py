@@ -0,0 +1,134 @@
+"""Хранилище FSM в памяти с ограничением размера.
+
+MemoryStorage из aiogram держит запись для каждого, кто хоть раз написал боту
+(запись заводится даже при чтении состояния), и данные брошенных диалогов
+(CreateExercise, LogWorkout, GenerateExercises…) живут до перезапуска.
+Здесь записи хранятся в порядке последнего обращения: пустые не заводятся,
+сверх max_records вытесняются самые давние, а sweep() удаляет не тронутые
+дольше ttl секунд.
+"""
+import sys
+import time
+from collections import OrderedDict
+from copy import copy
+from typing import Any
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from config import FSM_MAX_RECORDS, FSM_TTL_HOURS
+
+
+class _Record:
+    """Состояние и данные одного чата."""
+
+    __slots__ = ("state", "data", "touched")
+
+    def __init__(self):
+        self.state: str | None = None
+        self.data: dict[str, Any] = {}
+        self.touched = 0.0
+
+
+def _deep_size(value, seen: set) -> int:
+    """Примерный размер объекта вместе с содержимым контейнеров, байт."""
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(item, seen) for item in value)
+    return size
+
+
+class BoundedMemoryStorage(BaseStorage):
+    """MemoryStorage с вытеснением по LRU (max_records) и по времени простоя (ttl)."""
+
+    def __init__(self, max_records: int = FSM_MAX_RECORDS, ttl: float = FSM_TTL_HOURS * 3600):
+        self.max_records = max_records
+        self.ttl = ttl
+        self.storage: OrderedDict[StorageKey, _Record] = OrderedDict()
+        self.evicted = 0
+        self.expired = 0
+
+    def _get(self, key: StorageKey) -> _Record | None:
+        record = self.storage.get(key)
+        if record is not None:
+            record.touched = time.monotonic()
+            self.storage.move_to_end(key)
+        return record
+
+    def _put(self, key: StorageKey) -> _Record:
+        record = self._get(key)
+        if record is None:
+            record = self.storage[key] = _Record()
+            record.touched = time.monotonic()
+            while len(self.storage) > self.max_records:
+                self.storage.popitem(last=False)
+                self.evicted += 1
+        return record
+
+    def _drop_if_empty(self, key: StorageKey, record: _Record):
+        # Диалог завершён (state.clear()) — запись больше не нужна
+        if record.state is None and not record.data:
+            del self.storage[key]
+
+    async def close(self) -> None:
+        self.storage.clear()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self._put(key)
+        record.state = state.state if isinstance(state, State) else state
+        self._drop_if_empty(key, record)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        record = self._get(key)
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        record = self._put(key)
+        record.data = data.copy()
+        self._drop_if_empty(key, record)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        record = self._get(key)
+        return record.data.copy() if record else {}
+
+    async def get_value(self, storage_key: StorageKey, dict_key: str, default: Any = None) -> Any:
+        record = self._get(storage_key)
+        if record is None:
+            return default
+        return copy(record.data.get(dict_key, default))
+
+    def sweep(self) -> int:
+        """Удалить записи, к которым не обращались дольше ttl. Возвращает сколько удалено."""
+        deadline = time.monotonic() - self.ttl
+        removed = 0
+        # Записи упорядочены по последнему обращению: просроченные — в начале
+        while self.storage:
+            key, record = next(iter(self.storage.items()))
+            if record.touched > deadline:
+                break
+            del self.storage[key]
+            removed += 1
+        self.expired += removed
+        return removed
+
+    def memory_usage(self) -> dict:
+        """{"records", "in_state", "bytes", "evicted", "expired"} — для /metrics.
+
+        bytes — оценка по sys.getsizeof с содержимым, обходит все записи.
+        """
+        seen = set()
+        size = sys.getsizeof(self.storage)
+        for key, record in self.storage.items():
+            size += _deep_size(key, seen) + sys.getsizeof(record) + _deep_size(record.data, seen)
+        return {
+            "records": len(self.storage),
+            "in_state": sum(1 for record in self.storage.values() if record.state is not None),
+            "bytes": size,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
@@ -6,6 +6,8 @@ from handlers.history import router as history_router
 from handlers.admin import router as admin_router
 from handlers.custom import router as custom_router
 from handlers.ai_generate import router as ai_router
+from handlers.export import router as export_router
+from handlers.import_history import router as import_router
 
 __all__ = [
     "access_router",
@@ -16,4 +18,6 @@ __all__ = [
     "admin_router",
     "custom_router",
     "ai_router",
+    "export_router",
+    "import_router",
 ]
\ No newline at end of file
@@ -2,17 +2,26 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.filters import BaseFilter
+from aiogram.filters import BaseFilter, Command, StateFilter
 
 from config import ADMIN_ID
 from keyboards import (
     admin_panel_kb, cancel_kb, skip_kb,
     programs_kb, days_kb, admin_menu_kb,
     exercise_library_kb, lib_exercise_detail_kb,
-    select_day_for_exercise_kb, add_exercise_to_day_kb,
+    select_day_for_exercise_kb, program_tree_kb, add_exercise_to_day_kb,
     library_exercises_for_day_kb, exercises_kb
 )
+from callbacks import (
+    table, ExerciseCB, MoveCB, WeightTypeCB, LibExerciseCB, AddToDayCB, LinkExerciseCB,
+    DeleteLibExerciseCB, DoDeleteLibExerciseCB, DayProgramCB, ExerciseProgramCB, ExerciseDayCB,
+    DeleteProgramCB, DoDeleteProgramCB, DeleteDayProgramCB, DoDeleteDayCB,
+    DeleteExerciseProgramCB, DeleteExerciseDayCB, DoDeleteExerciseCB,
+    RemoveUserCB, EditTagsCB, RemoveTagCB
+)
+from fsm_storage import BoundedMemoryStorage
 import database as db
+import metrics
 
 router = Router()
 
@@ -91,10 +100,10 @@ async def show_exercise_library(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("lib_exercise:"))
-async def show_library_exercise(callback: CallbackQuery):
+@table.handler(LibExerciseCB, IsAdmin())
+async def show_library_exercise(callback: CallbackQuery, callback_data: LibExerciseCB):
     """Показать детали упражнения в библиотеке."""
-    exercise_id = int(callback.data.split(":")[1])
+    exercise_id = callback_data.id
     exercise = await db.get_exercise(exercise_id)
 
     if not exercise:
@@ -106,15 +115,15 @@ async def show_library_exercise(callback: CallbackQuery):
 
     text = f"📚 {exercise['name']}\n\n"
 
-    if "tag" in exercise.keys() and exercise["tag"]:
+    if exercise.tag:
         tags = [t.strip() for t in exercise["tag"].split(",") if t.strip()]
         text += "🏷 " + " ".join(f"#{t}" for t in tags) + "\n"
 
-    if "description" in exercise.keys() and exercise["description"]:
+    if exercise.description:
         text += f"\n{exercise['description']}\n"
 
     weight_types = {0: "без веса", 10: "гантели", 100: "штанга"}
-    weight_type = exercise["weight_type"] if "weight_type" in exercise.keys() else 10
+    weight_type = exercise.weight_type
     text += f"\n⚖️ Тип веса: {weight_types.get(weight_type, 'гантели')}\n"
 
     if exercise_days:
@@ -237,10 +246,10 @@ async def process_lib_tag(message: Message, state: FSMContext):
     )
 
 
-@router.callback_query(CreateExercise.waiting_for_weight_type, F.data.startswith("wt:"))
-async def process_lib_weight_type(callback: CallbackQuery, state: FSMContext):
+@table.handler(WeightTypeCB, StateFilter(CreateExercise.waiting_for_weight_type), IsAdmin())
+async def process_lib_weight_type(callback: CallbackQuery, callback_data: WeightTypeCB, state: FSMContext):
     """Обработка типа веса."""
-    weight_type = int(callback.data.split(":")[1])
+    weight_type = callback_data.weight_type
     await state.update_data(weight_type=weight_type)
     await state.set_state(CreateExercise.waiting_for_image)
 
@@ -370,45 +379,37 @@ async def wrong_lib_image_format(message: Message, state: FSMContext):
     )
 
 
-@router.callback_query(F.data.startswith("add_to_day:"))
-async def add_exercise_to_day_menu(callback: CallbackQuery):
+@table.handler(AddToDayCB, IsAdmin())
+async def add_exercise_to_day_menu(callback: CallbackQuery, callback_data: AddToDayCB):
     """Выбрать день для добавления упражнения."""
-    exercise_id = int(callback.data.split(":")[1])
+    exercise_id = callback_data.exercise_id
     exercise = await db.get_exercise(exercise_id)
 
     if not exercise:
         await callback.answer("Упражнение не найдено", show_alert=True)
         return
 
-    programs = await db.get_all_programs()
-    if not programs:
+    tree = await db.get_program_tree()
+    if not tree:
         await callback.answer("Сначала создай программу!", show_alert=True)
         return
 
-    # Собираем дни по программам
-    days_by_program = {}
-    for p in programs:
-        days = await db.get_days_by_program(p['id'])
-        if days:
-            days_by_program[p['id']] = days
-
-    if not days_by_program:
+    if not any(p["days"] for p in tree):
         await callback.answer("Нет дней в программах!", show_alert=True)
         return
 
     await callback.message.edit_text(
         f"📋 Добавить «{exercise['name']}» в день:\n\nВыбери программу и день:",
-        reply_markup=select_day_for_exercise_kb(programs, days_by_program, exercise_id)
+        reply_markup=select_day_for_exercise_kb(tree, exercise_id)
     )
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("link_exercise:"))
-async def link_exercise_to_day(callback: CallbackQuery):
+@table.handler(LinkExerciseCB, IsAdmin())
+async def link_exercise_to_day(callback: CallbackQuery, callback_data: LinkExerciseCB):
     """Связать упражнение с днём."""
-    parts = callback.data.split(":")
-    exercise_id = int(parts[1])
-    day_id = int(parts[2])
+    exercise_id = callback_data.exercise_id
+    day_id = callback_data.day_id
 
     exercise = await db.get_exercise(exercise_id)
     day = await db.get_day(day_id)
@@ -428,10 +429,10 @@ async def link_exercise_to_day(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("delete_lib_exercise:"))
-async def confirm_delete_lib_exercise(callback: CallbackQuery):
+@table.handler(DeleteLibExerciseCB, IsAdmin())
+async def confirm_delete_lib_exercise(callback: CallbackQuery, callback_data: DeleteLibExerciseCB):
     """Подтверждение удаления упражнения из библиотеки."""
-    exercise_id = int(callback.data.split(":")[1])
+    exercise_id = callback_data.exercise_id
     exercise = await db.get_exercise(exercise_id)
 
     if not exercise:
@@ -445,8 +446,8 @@ async def confirm_delete_lib_exercise(callback: CallbackQuery):
 
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="✅ Да, удалить", callback_data=f"do_del_lib_ex:{exercise_id}"),
-        InlineKeyboardButton(text="❌ Нет", callback_data=f"lib_exercise:{exercise_id}")
+        InlineKeyboardButton(text="✅ Да, удалить", callback_data=DoDeleteLibExerciseCB(exercise_id=exercise_id).pack()),
+        InlineKeyboardButton(text="❌ Нет", callback_data=LibExerciseCB(id=exercise_id).pack())
     )
 
     warning = ""
@@ -461,10 +462,10 @@ async def confirm_delete_lib_exercise(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("do_del_lib_ex:"))
-async def do_delete_lib_exercise(callback: CallbackQuery):
+@table.handler(DoDeleteLibExerciseCB, IsAdmin())
+async def do_delete_lib_exercise(callback: CallbackQuery, callback_data: DoDeleteLibExerciseCB):
     """Удалить упражнение из библиотеки."""
-    exercise_id = int(callback.data.split(":")[1])
+    exercise_id = callback_data.exercise_id
     exercise = await db.get_exercise(exercise_id)
 
     if exercise:
@@ -525,39 +526,26 @@ async def process_program_name(message: Message, state: FSMContext):
 @router.callback_query(F.data == "add_day")
 async def start_add_day(callback: CallbackQuery, state: FSMContext):
     """Начать добавление дня."""
-    programs = await db.get_all_programs()
+    tree = await db.get_program_tree()
 
-    if not programs:
+    if not tree:
         await callback.answer("Сначала создай программу!", show_alert=True)
         return
 
     await state.set_state(AddDay.waiting_for_program)
 
-    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-
-    builder = InlineKeyboardBuilder()
-    for p in programs:
-        builder.row(
-            InlineKeyboardButton(
-                text=p["name"],
-                callback_data=f"select_program_day:{p['id']}"
-            )
-        )
-    builder.row(InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_action"))
-
     await callback.message.edit_text(
         "➕ Добавление дня\n\n"
-        "Выбери программу:",
-        reply_markup=builder.as_markup()
+        "Выбери программу (в скобках — сколько дней уже есть):",
+        reply_markup=program_tree_kb(tree, DayProgramCB, "❌ Отмена", "cancel_action")
     )
     await callback.answer()
 
 
-@router.callback_query(AddDay.waiting_for_program, F.data.startswith("select_program_day:"))
-async def select_program_for_day(callback: CallbackQuery, state: FSMContext):
+@table.handler(DayProgramCB, StateFilter(AddDay.waiting_for_program), IsAdmin())
+async def select_program_for_day(callback: CallbackQuery, callback_data: DayProgramCB, state: FSMContext):
     """Выбор программы для дня."""
-    program_id = int(callback.data.split(":")[1])
+    program_id = callback_data.program_id
     program = await db.get_program(program_id)
 
     await state.update_data(program_id=program_id, program_name=program["name"])
@@ -709,7 +697,7 @@ async def start_add_exercise(callback: CallbackQuery, state: FSMContext):
         builder.row(
             InlineKeyboardButton(
                 text=p["name"],
-                callback_data=f"select_program_ex:{p['id']}"
+                callback_data=ExerciseProgramCB(program_id=p['id']).pack()
             )
         )
     builder.row(InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_action"))
@@ -722,10 +710,10 @@ async def start_add_exercise(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.callback_query(AddExercise.waiting_for_program, F.data.startswith("select_program_ex:"))
-async def select_program_for_exercise(callback: CallbackQuery, state: FSMContext):
+@table.handler(ExerciseProgramCB, StateFilter(AddExercise.waiting_for_program), IsAdmin())
+async def select_program_for_exercise(callback: CallbackQuery, callback_data: ExerciseProgramCB, state: FSMContext):
     """Выбор программы для упражнения."""
-    program_id = int(callback.data.split(":")[1])
+    program_id = callback_data.program_id
     program = await db.get_program(program_id)
     days = await db.get_days_by_program(program_id)
 
@@ -745,7 +733,7 @@ async def select_program_for_exercise(callback: CallbackQuery, state: FSMContext
         builder.row(
             InlineKeyboardButton(
                 text=day_name,
-                callback_data=f"select_day_ex:{d['id']}"
+                callback_data=ExerciseDayCB(day_id=d['id']).pack()
             )
         )
     builder.row(InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_action"))
@@ -758,10 +746,10 @@ async def select_program_for_exercise(callback: CallbackQuery, state: FSMContext
     await callback.answer()
 
 
-@router.callback_query(AddExercise.waiting_for_day, F.data.startswith("select_day_ex:"))
-async def select_day_for_exercise(callback: CallbackQuery, state: FSMContext):
+@table.handler(ExerciseDayCB, StateFilter(AddExercise.waiting_for_day), IsAdmin())
+async def select_day_for_exercise(callback: CallbackQuery, callback_data: ExerciseDayCB, state: FSMContext):
     """Выбор дня для упражнения - показать выбор источника."""
-    day_id = int(callback.data.split(":")[1])
+    day_id = callback_data.day_id
     day = await db.get_day(day_id)
     day_name = day["name"] if day["name"] else f"День {day['day_number']}"
 
@@ -873,7 +861,7 @@ async def start_delete_program(callback: CallbackQuery):
         builder.row(
             InlineKeyboardButton(
                 text=f"🗑 {p['name']}",
-                callback_data=f"confirm_del_program:{p['id']}"
+                callback_data=DeleteProgramCB(program_id=p['id']).pack()
             )
         )
     builder.row(InlineKeyboardButton(text="« Назад", callback_data="delete_menu"))
@@ -886,10 +874,10 @@ async def start_delete_program(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("confirm_del_program:"))
-async def confirm_delete_program(callback: CallbackQuery):
+@table.handler(DeleteProgramCB, IsAdmin())
+async def confirm_delete_program(callback: CallbackQuery, callback_data: DeleteProgramCB):
     """Подтверждение удаления программы."""
-    program_id = int(callback.data.split(":")[1])
+    program_id = callback_data.program_id
     program = await db.get_program(program_id)
 
     if not program:
@@ -901,7 +889,7 @@ async def confirm_delete_program(callback: CallbackQuery):
 
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="✅ Да, удалить", callback_data=f"do_del_program:{program_id}"),
+        InlineKeyboardButton(text="✅ Да, удалить", callback_data=DoDeleteProgramCB(program_id=program_id).pack()),
         InlineKeyboardButton(text="❌ Нет", callback_data="delete_program")
     )
 
@@ -913,10 +901,10 @@ async def confirm_delete_program(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("do_del_program:"))
-async def do_delete_program(callback: CallbackQuery):
+@table.handler(DoDeleteProgramCB, IsAdmin())
+async def do_delete_program(callback: CallbackQuery, callback_data: DoDeleteProgramCB):
     """Удаление программы."""
-    program_id = int(callback.data.split(":")[1])
+    program_id = callback_data.program_id
     program = await db.get_program(program_id)
 
     if program:
@@ -934,36 +922,24 @@ async def do_delete_program(callback: CallbackQuery):
 @router.callback_query(F.data == "delete_day")
 async def start_delete_day(callback: CallbackQuery, state: FSMContext):
     """Выбор программы для удаления дня."""
-    programs = await db.get_all_programs()
+    # Программы без дней не показываем: удалять в них нечего
+    tree = [p for p in await db.get_program_tree() if p["days"]]
 
-    if not programs:
-        await callback.answer("Нет программ", show_alert=True)
+    if not tree:
+        await callback.answer("Нет дней для удаления", show_alert=True)
         return
 
-    from aiogram.types import InlineKeyboardButton
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-
-    builder = InlineKeyboardBuilder()
-    for p in programs:
-        builder.row(
-            InlineKeyboardButton(
-                text=p["name"],
-                callback_data=f"del_day_program:{p['id']}"
-            )
-        )
-    builder.row(InlineKeyboardButton(text="« Назад", callback_data="delete_menu"))
-
     await callback.message.edit_text(
         "🗑 Удаление дня\n\nВыбери программу:",
-        reply_markup=builder.as_markup()
+        reply_markup=program_tree_kb(tree, DeleteDayProgramCB, "« Назад", "delete_menu")
     )
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("del_day_program:"))
-async def select_day_to_delete(callback: CallbackQuery):
+@table.handler(DeleteDayProgramCB, IsAdmin())
+async def select_day_to_delete(callback: CallbackQuery, callback_data: DeleteDayProgramCB):
     """Выбор дня для удаления."""
-    program_id = int(callback.data.split(":")[1])
+    program_id = callback_data.program_id
     days = await db.get_days_by_program(program_id)
 
     if not days:
@@ -979,7 +955,7 @@ async def select_day_to_delete(callback: CallbackQuery):
         builder.row(
             InlineKeyboardButton(
                 text=f"🗑 {day_name}",
-                callback_data=f"do_del_day:{d['id']}"
+                callback_data=DoDeleteDayCB(day_id=d['id']).pack()
             )
         )
     builder.row(InlineKeyboardButton(text="« Назад", callback_data="delete_day"))
@@ -991,10 +967,10 @@ async def select_day_to_delete(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("do_del_day:"))
-async def do_delete_day(callback: CallbackQuery):
+@table.handler(DoDeleteDayCB, IsAdmin())
+async def do_delete_day(callback: CallbackQuery, callback_data: DoDeleteDayCB):
     """Удаление дня."""
-    day_id = int(callback.data.split(":")[1])
+    day_id = callback_data.day_id
     day = await db.get_day(day_id)
 
     if day:
@@ -1013,36 +989,24 @@ async def do_delete_day(callback: CallbackQuery):
 @router.callback_query(F.data == "delete_exercise")
 async def start_delete_exercise(callback: CallbackQuery):
     """Выбор программы для удаления упражнения."""
-    programs = await db.get_all_programs()
+    # Только программы, в днях которых есть упражнения
+    tree = [p for p in await db.get_program_tree() if any(d["exercise_count"] for d in p["days"])]
 
-    if not programs:
-        await callback.answer("Нет программ", show_alert=True)
+    if not tree:
+        await callback.answer("Нет упражнений в программах", show_alert=True)
         return
 
-    from aiogram.types import InlineKeyboardButton
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-
-    builder = InlineKeyboardBuilder()
-    for p in programs:
-        builder.row(
-            InlineKeyboardButton(
-                text=p["name"],
-                callback_data=f"del_ex_program:{p['id']}"
-            )
-        )
-    builder.row(InlineKeyboardButton(text="« Назад", callback_data="delete_menu"))
-
     await callback.message.edit_text(
         "🗑 Удаление упражнения\n\nВыбери программу:",
-        reply_markup=builder.as_markup()
+        reply_markup=program_tree_kb(tree, DeleteExerciseProgramCB, "« Назад", "delete_menu", count="exercises")
     )
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("del_ex_program:"))
-async def select_day_for_del_exercise(callback: CallbackQuery):
+@table.handler(DeleteExerciseProgramCB, IsAdmin())
+async def select_day_for_del_exercise(callback: CallbackQuery, callback_data: DeleteExerciseProgramCB):
     """Выбор дня для удаления упражнения."""
-    program_id = int(callback.data.split(":")[1])
+    program_id = callback_data.program_id
     days = await db.get_days_by_program(program_id)
 
     if not days:
@@ -1058,7 +1022,7 @@ async def select_day_for_del_exercise(callback: CallbackQuery):
         builder.row(
             InlineKeyboardButton(
                 text=day_name,
-                callback_data=f"del_ex_day:{d['id']}"
+                callback_data=DeleteExerciseDayCB(day_id=d['id']).pack()
             )
         )
     builder.row(InlineKeyboardButton(text="« Назад", callback_data="delete_exercise"))
@@ -1070,10 +1034,10 @@ async def select_day_for_del_exercise(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("del_ex_day:"))
-async def select_exercise_to_delete(callback: CallbackQuery):
+@table.handler(DeleteExerciseDayCB, IsAdmin())
+async def select_exercise_to_delete(callback: CallbackQuery, callback_data: DeleteExerciseDayCB):
     """Выбор упражнения для удаления."""
-    day_id = int(callback.data.split(":")[1])
+    day_id = callback_data.day_id
     exercises = await db.get_exercises_by_day(day_id)
 
     if not exercises:
@@ -1088,7 +1052,7 @@ async def select_exercise_to_delete(callback: CallbackQuery):
         builder.row(
             InlineKeyboardButton(
                 text=f"🗑 {ex['name']}",
-                callback_data=f"do_del_ex:{ex['id']}"
+                callback_data=DoDeleteExerciseCB(exercise_id=ex['id']).pack()
             )
         )
     builder.row(InlineKeyboardButton(text="« Назад", callback_data="delete_exercise"))
@@ -1100,10 +1064,10 @@ async def select_exercise_to_delete(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("do_del_ex:"))
-async def do_delete_exercise(callback: CallbackQuery):
+@table.handler(DoDeleteExerciseCB, IsAdmin())
+async def do_delete_exercise(callback: CallbackQuery, callback_data: DoDeleteExerciseCB):
     """Удаление упражнения."""
-    exercise_id = int(callback.data.split(":")[1])
+    exercise_id = callback_data.exercise_id
     exercise = await db.get_exercise(exercise_id)
 
     if exercise:
@@ -1167,7 +1131,7 @@ async def remove_user_menu(callback: CallbackQuery):
         builder.row(
             InlineKeyboardButton(
                 text=f"🗑 {name}",
-                callback_data=f"remove_user:{u['user_id']}"
+                callback_data=RemoveUserCB(user_id=u['user_id']).pack()
             )
         )
     builder.row(
@@ -1181,10 +1145,10 @@ async def remove_user_menu(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("remove_user:"))
-async def remove_user(callback: CallbackQuery):
+@table.handler(RemoveUserCB, IsAdmin())
+async def remove_user(callback: CallbackQuery, callback_data: RemoveUserCB):
     """Удалить пользователя."""
-    user_id = int(callback.data.split(":")[1])
+    user_id = callback_data.user_id
 
     await db.remove_allowed_user(user_id)
 
@@ -1225,10 +1189,10 @@ class EditExerciseTag(StatesGroup):
     waiting_for_tag = State()
 
 
-@router.callback_query(F.data.startswith("edit_tags:"))
-async def edit_exercise_tag(callback: CallbackQuery, state: FSMContext):
+@table.handler(EditTagsCB, IsAdmin())
+async def edit_exercise_tag(callback: CallbackQuery, callback_data: EditTagsCB, state: FSMContext):
     """Изменить тег упражнения."""
-    exercise_id = int(callback.data.split(":")[1])
+    exercise_id = callback_data.exercise_id
     exercise = await db.get_exercise(exercise_id)
 
     if not exercise:
@@ -1247,7 +1211,7 @@ async def edit_exercise_tag(callback: CallbackQuery, state: FSMContext):
     if tags:
         tags_hint = "\n\nИспользуемые теги: " + ", ".join(t["name"] for t in tags)
 
-    has_tag = "tag" in exercise.keys() and exercise["tag"]
+    has_tag = bool(exercise.tag)
     if has_tag:
         tag_list = [t.strip() for t in exercise["tag"].split(",") if t.strip()]
         current_tag = "Текущий тег: " + " ".join(f"#{t}" for t in tag_list)
@@ -1260,10 +1224,10 @@ async def edit_exercise_tag(callback: CallbackQuery, state: FSMContext):
     builder = InlineKeyboardBuilder()
     if has_tag:
         builder.row(
-            InlineKeyboardButton(text="🗑 Убрать тег", callback_data=f"remove_tag:{exercise_id}")
+            InlineKeyboardButton(text="🗑 Убрать тег", callback_data=RemoveTagCB(exercise_id=exercise_id).pack())
         )
     builder.row(
-        InlineKeyboardButton(text="❌ Отмена", callback_data=f"exercise:{exercise_id}:{day_id}")
+        InlineKeyboardButton(text="❌ Отмена", callback_data=ExerciseCB(id=exercise_id, day_id=day_id).pack())
     )
 
     await callback.message.edit_text(
@@ -1298,10 +1262,10 @@ async def process_edit_tag(message: Message, state: FSMContext):
     )
 
 
-@router.callback_query(F.data.startswith("remove_tag:"))
-async def remove_exercise_tag(callback: CallbackQuery, state: FSMContext):
+@table.handler(RemoveTagCB, IsAdmin())
+async def remove_exercise_tag(callback: CallbackQuery, callback_data: RemoveTagCB, state: FSMContext):
     """Убрать тег у упражнения."""
-    exercise_id = int(callback.data.split(":")[1])
+    exercise_id = callback_data.exercise_id
 
     await db.update_exercise_tag(exercise_id, None)
     await state.clear()
@@ -1320,13 +1284,12 @@ async def remove_exercise_tag(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("move_ex:"))
-async def move_exercise_order(callback: CallbackQuery):
+@table.handler(MoveCB, IsAdmin())
+async def move_exercise_order(callback: CallbackQuery, callback_data: MoveCB):
     """Переместить упражнение вверх/вниз в дне."""
-    parts = callback.data.split(":")
-    exercise_id = int(parts[1])
-    day_id = int(parts[2])
-    direction = int(parts[3])  # -1 вверх, 1 вниз
+    exercise_id = callback_data.exercise_id
+    day_id = callback_data.day_id
+    direction = callback_data.direction  # -1 вверх, 1 вниз
 
     await db.move_exercise_in_day(exercise_id, day_id, direction)
 
@@ -1342,4 +1305,54 @@ async def move_exercise_order(callback: CallbackQuery):
         text,
         reply_markup=exercises_kb(exercises, day_id, is_admin=True)
     )
-    await callback.answer()
\ No newline at end of file
+    await callback.answer()
+
+
+# ==================== METRICS ====================
+
+def _histogram_line(histogram: metrics.Histogram, unit: str) -> str:
+    return (
+        f"{unit}: {histogram.count}, среднее {histogram.total / histogram.count:.1f} мс, "
+        f"p50 ≤ {histogram.quantile(0.5):.0f} мс, p99 ≤ {histogram.quantile(0.99):.0f} мс, "
+        f"макс {histogram.max:.0f} мс"
+    )
+
+
+@router.message(Command("metrics"))
+async def show_metrics(message: Message, fsm_storage):
+    """Ожидание и время обработки апдейтов, задержка цикла событий, память FSM
+    и самые частые запросы к БД."""
+    wait = metrics.queue_wait
+    lines = ["📊 <b>Ожидание в очереди пользователя</b>"]
+    if wait.count:
+        lines.append(_histogram_line(wait, "Апдейтов"))
+        for user_id, stats in metrics.top_waiting_users(10):
+            lines.append(
+                f"• <code>{user_id}</code>: {stats.count} апд., всего {stats.total:.0f} мс, "
+                f"макс {stats.max:.0f} мс"
+            )
+    else:
+        lines.append("Пока нет данных")
+
+    for title, histogram, unit in (
+        ("⏱ <b>Обработка апдейтов</b>", metrics.handler_time, "Апдейтов"),
+        ("🔄 <b>Задержка цикла событий</b>", metrics.loop_lag, "Замеров"),
+    ):
+        lines.append(f"\n{title}")
+        lines.append(_histogram_line(histogram, unit) if histogram.count else "Пока нет данных")
+
+    # fsm_storage передаёт в обработчик aiogram (FSMContextMiddleware)
+    if isinstance(fsm_storage, BoundedMemoryStorage):
+        usage = fsm_storage.memory_usage()
+        lines.append(
+            f"\n🧠 <b>FSM в памяти</b>\n"
+            f"Записей: {usage['records']} (в диалоге: {usage['in_state']}), ~{usage['bytes'] / 1024:.0f} КБ\n"
+            f"Вытеснено: {usage['evicted']}, истекло: {usage['expired']}"
+        )
+
+    statements = db.get_statement_stats(10)
+    if statements:
+        lines.append("\n🗄 <b>Частые запросы к БД</b>")
+        lines.extend(f"• {name}: {count}" for name, count in statements)
+
+    await message.answer("\n".join(lines), parse_mode="HTML")
@@ -1,15 +1,25 @@
 """Генерация упражнений через AI."""
+from functools import lru_cache
+
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from aiogram.filters import StateFilter
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from ai_service import generate_exercises, MUSCLE_GROUPS
+from config import EXERCISE_SOURCE
+from ai_service import generate_exercises_structured, MUSCLE_GROUPS
+from recommender import recommend_exercises, format_recommendations, missing_muscles
+from callbacks import table, MuscleCB
+import database as db
 
 router = Router()
 
+# Сколько упражнений подбирать за раз
+GENERATE_COUNT = 5
+
 
 class GenerateExercises(StatesGroup):
     selecting_muscles = State()
@@ -18,7 +28,12 @@ class GenerateExercises(StatesGroup):
 
 def muscles_kb(selected: set = None) -> InlineKeyboardMarkup:
     """Клавиатура выбора мышц."""
-    selected = selected or set()
+    return _muscles_kb(frozenset(selected or ()))
+
+
+@lru_cache(maxsize=None)
+def _muscles_kb(selected: frozenset) -> InlineKeyboardMarkup:
+    """Клавиатура выбора мышц для конкретного набора (кэшируется)."""
     builder = InlineKeyboardBuilder()
 
     for key, name in MUSCLE_GROUPS.items():
@@ -26,7 +41,7 @@ def muscles_kb(selected: set = None) -> InlineKeyboardMarkup:
         builder.row(
             InlineKeyboardButton(
                 text=f"{check}{name}",
-                callback_data=f"muscle:{key}"
+                callback_data=MuscleCB(key=key).pack()
             )
         )
 
@@ -44,6 +59,7 @@ def muscles_kb(selected: set = None) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def result_kb() -> InlineKeyboardMarkup:
     """Клавиатура после генерации."""
     builder = InlineKeyboardBuilder()
@@ -70,10 +86,10 @@ async def start_ai_generate(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.callback_query(GenerateExercises.selecting_muscles, F.data.startswith("muscle:"))
-async def toggle_muscle(callback: CallbackQuery, state: FSMContext):
+@table.handler(MuscleCB, StateFilter(GenerateExercises.selecting_muscles))
+async def toggle_muscle(callback: CallbackQuery, callback_data: MuscleCB, state: FSMContext):
     """Переключить выбор мышцы."""
-    muscle = callback.data.split(":")[1]
+    muscle = callback_data.key
     data = await state.get_data()
     selected = data.get("selected_muscles", set())
 
@@ -107,9 +123,24 @@ async def do_generate(callback: CallbackQuery, state: FSMContext):
 
     # Преобразуем в русские названия
     muscles_ru = [MUSCLE_GROUPS[m] for m in selected]
+    muscles = list(selected)
+    user_id = callback.from_user.id
+
+    # Сначала библиотека: если там уже хватает упражнений на эти мышцы, AI не нужен
+    exercises = await recommend_exercises(user_id, muscles, GENERATE_COUNT)
+    missing = missing_muscles(exercises, muscles)
+
+    if (missing or len(exercises) < GENERATE_COUNT) and EXERCISE_SOURCE != "local":
+        # Генерируем недостающее и сохраняем в библиотеку для следующих запросов
+        target = missing or muscles
+        generated = await generate_exercises_structured(
+            [MUSCLE_GROUPS[m] for m in target], GENERATE_COUNT
+        )
+        if generated:
+            await db.add_library_exercises(generated)
+            exercises = await recommend_exercises(user_id, muscles, GENERATE_COUNT)
 
-    # Генерируем
-    result = await generate_exercises(muscles_ru)
+    result = format_recommendations(exercises) if exercises else None
 
     if result:
         await state.set_state(GenerateExercises.viewing_result)
@@ -120,8 +151,8 @@ async def do_generate(callback: CallbackQuery, state: FSMContext):
         )
     else:
         await callback.message.edit_text(
-            "❌ Не удалось сгенерировать упражнения.\n"
-            "Проверь DEEPSEEK_API_KEY в .env",
+            "❌ Не удалось подобрать упражнения.\n"
+            "Проверь DEEPSEEK_API_KEY в .env или добавь упражнения с тегами в библиотеку",
             reply_markup=result_kb()
         )
 
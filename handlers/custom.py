@@ -1,14 +1,20 @@
 import re
 from datetime import date
+from html import escape
+from functools import lru_cache
 
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message, ForceReply
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from aiogram.filters import StateFilter
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 import database as db
+from callbacks import table, QuickCustomCB, UserWeightTypeCB, tag_key
+from keyboards import custom_exercise_kb
+from workout_parser import parse_workout
 
 router = Router()
 
@@ -29,22 +35,7 @@ class UserCreateExercise(StatesGroup):
     waiting_for_image = State()
 
 
-def custom_mode_kb(has_entries: bool) -> InlineKeyboardMarkup:
-    """Клавиатура режима своих упражнений."""
-    builder = InlineKeyboardBuilder()
-    if has_entries:
-        # Если уже вводил - только кнопка завершения
-        builder.row(
-            InlineKeyboardButton(text="✅ Закончить день", callback_data="finish_custom")
-        )
-    else:
-        # Если ещё не вводил - можно вернуться
-        builder.row(
-            InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_main")
-        )
-    return builder.as_markup()
-
-
+@lru_cache(maxsize=None)
 def after_custom_kb() -> InlineKeyboardMarkup:
     """Клавиатура после записи (есть записи)."""
     builder = InlineKeyboardBuilder()
@@ -65,42 +56,8 @@ async def send_force_reply_if_group(message: Message, text: str) -> None:
         await message.answer(text, reply_markup=ForceReply(selective=True))
 
 
-def parse_exercise_input(text: str) -> dict | None:
-    """
-    Парсит упражнения:
-    - "жим лежа 90кг 15х4" → силовое (вес, повторы, подходы)
-    - "бег 50мин" → кардио (длительность)
-    """
-    text = text.strip()
-
-    # Паттерн для времени: "бег 50мин", "ходьба 1 час"
-    time_pattern = r'^(.+?)\s+(\d+(?:[.,]\d+)?)\s*(час|ч|минут|мин|м).*$'
-    time_match = re.match(time_pattern, text, re.IGNORECASE)
-
-    if time_match:
-        name = time_match.group(1).strip()
-        value = float(time_match.group(2).replace(',', '.'))
-        unit = time_match.group(3).lower()
-
-        if unit in ('час', 'ч'):
-            duration = int(value * 60)
-        else:
-            duration = int(value)
-
-        return {"type": "cardio", "name": name, "duration": duration}
-
-    # Паттерн для силовых: "жим лежа 90кг 15х4" или "жим 90 15x4"
-    strength_pattern = r'^(.+?)\s+(\d+(?:[.,]\d+)?)\s*(?:кг)?\s+(\d+)\s*(?:[xхXХ×*]\s*(\d+))?$'
-    strength_match = re.match(strength_pattern, text, re.IGNORECASE)
-
-    if strength_match:
-        name = strength_match.group(1).strip()
-        weight = float(strength_match.group(2).replace(',', '.'))
-        reps = int(strength_match.group(3))
-        sets = int(strength_match.group(4)) if strength_match.group(4) else 1
-        return {"type": "strength", "name": name, "weight": weight, "reps": reps, "sets": sets}
-
-    return None
+# Повторы×подходы: "15x3", "15х3", "15*3", "15-3"
+REPS_RE = re.compile(r'^(\d+)\s*[xх×*\-]\s*(\d+)$')
 
 
 def format_duration(minutes: int) -> str:
@@ -114,6 +71,17 @@ def format_duration(minutes: int) -> str:
     return f"{minutes} мин"
 
 
+def format_entry(entry: dict) -> str:
+    """Строка подтверждения для разобранного упражнения."""
+    if entry["type"] == "cardio":
+        rounded_text = " (округлено до минут)" if entry.get("rounded") else ""
+        return f"✅ <b>{escape(entry['name'])}</b> — {format_duration(entry['duration'])}{rounded_text}"
+    sets_text = f" × {entry['sets']} подходов" if entry["sets"] > 1 else ""
+    rpe_text = f" (RPE {entry['rpe']:g})" if entry.get("rpe") else ""
+    return f"✅ <b>{escape(entry['name'])}</b> — {entry['weight']} кг × {entry['reps']}{sets_text}{rpe_text}"
+
+
+@lru_cache(maxsize=None)
 def add_more_kb() -> InlineKeyboardMarkup:
     """Клавиатура после записи упражнения."""
     builder = InlineKeyboardBuilder()
@@ -135,14 +103,17 @@ async def start_custom_mode(callback: CallbackQuery, state: FSMContext):
     # Проверяем есть ли записи за сегодня
     today_logs = await db.get_today_custom_logs(user_id, today)
     has_entries = len(today_logs) > 0
+    recent = await db.get_recent_custom_exercises(user_id)
 
     await state.set_state(CustomMode.waiting_for_name)
 
     await callback.message.edit_text(
         "Напиши что сделал сегодня, например:\n"
-        "<code>жим лежа 90 15х4</code> или <code>бег 1 час</code>",
+        "<code>жим лежа 90 15х4</code> или <code>бег 1 час</code>\n\n"
+        "Можно сразу всю тренировку — по упражнению на строку, "
+        "суперсет через «+», вес в кг или lb, RPE: <code>жим 3x10@80 rpe 8</code>",
         parse_mode="HTML",
-        reply_markup=custom_mode_kb(has_entries)
+        reply_markup=custom_exercise_kb(tuple(recent), has_entries)
     )
     if callback.message:
         await send_force_reply_if_group(
@@ -170,51 +141,41 @@ async def process_name(message: Message, state: FSMContext):
     user_id = message.from_user.id
     today = date.today().isoformat()
 
-    # Проверяем полный формат
-    result = parse_exercise_input(text)
+    # Одно или несколько упражнений полным форматом (по одному на строку)
+    entries, failed = parse_workout(text)
 
-    if result and result["type"] == "cardio":
-        # Кардио - сразу сохраняем
-        await db.log_custom_exercise(
-            user_id=user_id,
-            name=result["name"],
-            date=today,
-            duration_minutes=result["duration"]
-        )
+    if entries:
+        await db.log_custom_exercises_batch(user_id, today, entries)
         await state.clear()
+        lines = [format_entry(entry) for entry in entries]
+        if failed:
+            lines.append("\n⚠️ Не понял строки:\n" + escape("\n".join(failed)))
         await message.answer(
-            f"✅ <b>{result['name']}</b> — {format_duration(result['duration'])}",
+            "\n".join(lines),
             parse_mode="HTML",
             reply_markup=add_more_kb()
         )
         return
 
-    if result and result["type"] == "strength":
-        # Силовое в одну строку - сразу сохраняем
-        sets = result["sets"]
-        for _ in range(sets):
-            await db.log_custom_exercise(
-                user_id=user_id,
-                name=result["name"],
-                date=today,
-                weight=result["weight"],
-                reps=result["reps"]
-            )
-        await state.clear()
-        sets_text = f" × {sets} подходов" if sets > 1 else ""
+    if "\n" in text:
         await message.answer(
-            f"✅ <b>{result['name']}</b> — {result['weight']} кг × {result['reps']}{sets_text}",
+            "❌ Не понял ни одной строки. Формат: <code>жим лежа 90 15х4</code> или <code>бег 1 час</code>",
             parse_mode="HTML",
-            reply_markup=add_more_kb()
+            reply_markup=after_custom_kb()
         )
         return
 
     # Только название - переходим к вводу веса
-    await state.update_data(name=text)
+    await ask_weight(message, state, text)
+
+
+async def ask_weight(message: Message, state: FSMContext, name: str):
+    """Запомнить название и спросить вес."""
+    await state.update_data(name=name)
     await state.set_state(CustomMode.waiting_for_weight)
 
     await message.answer(
-        f"💪 <b>{text}</b>\n\n"
+        f"💪 <b>{escape(name)}</b>\n\n"
         f"Введи вес (кг):\n"
         f"(или 0 для упражнений без веса)",
         parse_mode="HTML",
@@ -223,6 +184,19 @@ async def process_name(message: Message, state: FSMContext):
     await send_force_reply_if_group(message, "Ответь на это сообщение числом (вес).")
 
 
+@table.handler(QuickCustomCB)
+async def quick_custom(callback: CallbackQuery, callback_data: QuickCustomCB, state: FSMContext):
+    """Выбор упражнения из последних — сразу к вводу веса."""
+    recent = await db.get_recent_custom_exercises(callback.from_user.id)
+    name = next((n for n in recent if tag_key(n) == callback_data.key), None)
+    if name is None:
+        await callback.answer("Упражнение не найдено", show_alert=True)
+        return
+
+    await ask_weight(callback.message, state, name)
+    await callback.answer()
+
+
 @router.message(CustomMode.waiting_for_weight)
 async def process_weight(message: Message, state: FSMContext):
     """Обработка веса."""
@@ -241,7 +215,7 @@ async def process_weight(message: Message, state: FSMContext):
     await state.set_state(CustomMode.waiting_for_reps)
 
     await message.answer(
-        f"💪 <b>{data['name']}</b> — {weight} кг\n\n"
+        f"💪 <b>{escape(data['name'])}</b> — {weight} кг\n\n"
         f"Введи повторы×подходы:\n"
         f"Например: <code>15x3</code> или <code>12</code>",
         parse_mode="HTML",
@@ -256,7 +230,7 @@ async def process_reps(message: Message, state: FSMContext):
     text = message.text.strip().lower()
 
     # Парсим формат: "15x3", "15х3", "15*3", "15-3", или просто "15"
-    match = re.match(r'^(\d+)\s*[xх×*\-]\s*(\d+)$', text)
+    match = REPS_RE.match(text)
     if match:
         reps = int(match.group(1))
         sets = int(match.group(2))
@@ -277,21 +251,16 @@ async def process_reps(message: Message, state: FSMContext):
     user_id = message.from_user.id
     today = date.today().isoformat()
 
-    # Сохраняем каждый подход
-    for _ in range(sets):
-        await db.log_custom_exercise(
-            user_id=user_id,
-            name=data["name"],
-            date=today,
-            weight=data["weight"],
-            reps=reps
-        )
+    # Сохраняем все подходы одной транзакцией
+    await db.log_custom_exercises_batch(user_id, today, [
+        {"type": "strength", "name": data["name"], "weight": data["weight"], "reps": reps, "sets": sets}
+    ])
 
     await state.clear()
 
     sets_text = f"× {sets} подходов" if sets > 1 else ""
     await message.answer(
-        f"✅ <b>{data['name']}</b> — {data['weight']} кг × {reps} {sets_text}",
+        f"✅ <b>{escape(data['name'])}</b> — {data['weight']} кг × {reps} {sets_text}",
         parse_mode="HTML",
         reply_markup=add_more_kb()
     )
@@ -299,6 +268,7 @@ async def process_reps(message: Message, state: FSMContext):
 
 # ==================== USER CREATE EXERCISE ====================
 
+@lru_cache(maxsize=None)
 def user_cancel_kb() -> InlineKeyboardMarkup:
     """Кнопка отмены для пользователя."""
     builder = InlineKeyboardBuilder()
@@ -308,6 +278,7 @@ def user_cancel_kb() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def user_skip_kb(skip_callback: str) -> InlineKeyboardMarkup:
     """Кнопка пропустить для пользователя."""
     builder = InlineKeyboardBuilder()
@@ -320,15 +291,16 @@ def user_skip_kb(skip_callback: str) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def user_weight_type_kb() -> InlineKeyboardMarkup:
     """Выбор типа веса для пользователя."""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="🏋️ Штанга", callback_data="user_wt:100"),
-        InlineKeyboardButton(text="💪 Гантели", callback_data="user_wt:10")
+        InlineKeyboardButton(text="🏋️ Штанга", callback_data=UserWeightTypeCB(weight_type=100).pack()),
+        InlineKeyboardButton(text="💪 Гантели", callback_data=UserWeightTypeCB(weight_type=10).pack())
     )
     builder.row(
-        InlineKeyboardButton(text="🤸 Без веса", callback_data="user_wt:0")
+        InlineKeyboardButton(text="🤸 Без веса", callback_data=UserWeightTypeCB(weight_type=0).pack())
     )
     builder.row(
         InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_user_create")
@@ -450,10 +422,10 @@ async def process_user_tag(message: Message, state: FSMContext):
     )
 
 
-@router.callback_query(UserCreateExercise.waiting_for_weight_type, F.data.startswith("user_wt:"))
-async def process_user_weight_type(callback: CallbackQuery, state: FSMContext):
+@table.handler(UserWeightTypeCB, StateFilter(UserCreateExercise.waiting_for_weight_type))
+async def process_user_weight_type(callback: CallbackQuery, callback_data: UserWeightTypeCB, state: FSMContext):
     """Обработка типа веса."""
-    weight_type = int(callback.data.split(":")[1])
+    weight_type = callback_data.weight_type
     await state.update_data(weight_type=weight_type)
     await state.set_state(UserCreateExercise.waiting_for_image)
 
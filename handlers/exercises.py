@@ -5,6 +5,7 @@ from keyboards import (
     programs_kb, days_kb, exercises_kb, exercise_detail_kb,
     all_workouts_kb, tags_kb, tag_exercises_kb, exercise_from_tag_kb
 )
+from callbacks import table, ExerciseCB, DayCB, DaysCB, TagCB, ProgramCB, tag_key
 import database as db
 
 router = Router()
@@ -36,10 +37,15 @@ async def show_tags_menu(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("tag:"))
-async def show_tag_exercises(callback: CallbackQuery):
+@table.handler(TagCB)
+async def show_tag_exercises(callback: CallbackQuery, callback_data: TagCB):
     """Показать упражнения по тегу."""
-    tag_name = callback.data.split(":", 1)[1]
+    tags = await db.get_all_tags()
+    tag_name = next((t["name"] for t in tags if tag_key(t["name"]) == callback_data.key), None)
+
+    if not tag_name:
+        await callback.answer("Нет упражнений с этим тегом", show_alert=True)
+        return
 
     exercises = await db.get_exercises_by_tag(tag_name)
 
@@ -70,10 +76,10 @@ async def show_programs(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("program:"))
-async def show_program_days(callback: CallbackQuery):
+@table.handler(ProgramCB)
+async def show_program_days(callback: CallbackQuery, callback_data: ProgramCB):
     """Показать дни программы."""
-    program_id = int(callback.data.split(":")[1])
+    program_id = callback_data.id
     program = await db.get_program(program_id)
 
     if not program:
@@ -93,12 +99,12 @@ async def show_program_days(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("day:"))
-async def show_day_exercises(callback: CallbackQuery):
+@table.handler(DayCB)
+async def show_day_exercises(callback: CallbackQuery, callback_data: DayCB):
     """Показать упражнения дня."""
     from config import ADMIN_ID
 
-    day_id = int(callback.data.split(":")[1])
+    day_id = callback_data.id
     day = await db.get_day(day_id)
 
     if not day:
@@ -128,10 +134,10 @@ async def show_day_exercises(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("back_to_days:"))
-async def back_to_days(callback: CallbackQuery):
+@table.handler(DaysCB)
+async def back_to_days(callback: CallbackQuery, callback_data: DaysCB):
     """Вернуться к списку дней."""
-    day_id = int(callback.data.split(":")[1])
+    day_id = callback_data.day_id
     day = await db.get_day(day_id)
 
     if day:
@@ -146,24 +152,20 @@ async def back_to_days(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("exercise:"))
-async def show_exercise(callback: CallbackQuery):
+@table.handler(ExerciseCB)
+async def show_exercise(callback: CallbackQuery, callback_data: ExerciseCB):
     """Показать упражнение с картинкой.
 
-    Форматы callback_data:
-    - exercise:{id}:{day_id} - обычный просмотр из дня
-    - exercise:{id}:0:tag:{tag_name} - просмотр из списка по тегу
+    ExerciseCB(id, day_id) - обычный просмотр из дня,
+    ExerciseCB(id, 0, tag) - просмотр из списка по тегу.
     """
     from config import ADMIN_ID
 
-    parts = callback.data.split(":")
-    exercise_id = int(parts[1])
-    day_id = int(parts[2]) if len(parts) > 2 else 0
+    exercise_id = callback_data.id
+    day_id = callback_data.day_id
 
     # Если это из тегов — запоминаем для кнопки "назад"
-    from_tag = None
-    if len(parts) > 4 and parts[3] == "tag":
-        from_tag = parts[4]
+    from_tag = callback_data.tag
 
     exercise = await db.get_exercise(exercise_id)
 
@@ -196,7 +198,7 @@ async def show_exercise(callback: CallbackQuery):
     text = f"💪 {exercise['name']}\n"
 
     # Показываем теги
-    if "tag" in exercise.keys() and exercise["tag"]:
+    if exercise.tag:
         tags = [t.strip() for t in exercise["tag"].split(",") if t.strip()]
         if tags:
             text += "🏷 " + " ".join(f"#{t}" for t in tags) + "\n"
@@ -248,7 +250,7 @@ async def show_exercise(callback: CallbackQuery):
 
     # Если есть медиа — отправляем фото или GIF
     if exercise["image_file_id"]:
-        media_type = exercise["media_type"] if "media_type" in exercise.keys() else "photo"
+        media_type = exercise.media_type or "photo"
         try:
             # Удаляем старое сообщение и отправляем медиа
             await callback.message.delete()
@@ -0,0 +1,60 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from datetime import date
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, FSInputFile
+
+import database as db
+
+router = Router()
+
+EXPORT_FORMATS = ("csv", "jsonl")
+
+
+async def write_history(user_id: int, path: str, fmt: str) -> int:
+    """Записать историю пользователя в gzip-файл. Возвращает число строк."""
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(db.EXPORT_FIELDS)
+        async for rows in db.iter_user_history(user_id):
+            if fmt == "csv":
+                writer.writerows(rows)
+            else:
+                f.writelines(
+                    json.dumps(dict(zip(db.EXPORT_FIELDS, row)), ensure_ascii=False) + "\n"
+                    for row in rows
+                )
+            count += len(rows)
+    return count
+
+
+@router.message(Command("export"))
+async def export_history(message: Message, command: CommandObject):
+    """Выгрузить всю историю тренировок: /export [csv|jsonl]."""
+    fmt = (command.args or "csv").strip().lower()
+    if fmt not in EXPORT_FORMATS:
+        await message.answer("Формат: /export csv или /export jsonl")
+        return
+
+    fd, path = tempfile.mkstemp(suffix=f".{fmt}.gz")
+    os.close(fd)
+    try:
+        count = await write_history(message.from_user.id, path, fmt)
+        if not count:
+            await message.answer("История пуста")
+            return
+
+        filename = f"gym_history_{date.today().isoformat()}.{fmt}.gz"
+        await message.answer_document(
+            FSInputFile(path, filename=filename),
+            caption=f"📦 Вся история: {count} записей"
+        )
+    finally:
+        os.unlink(path)
@@ -1,17 +1,18 @@
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import CallbackQuery
 from collections import defaultdict
 
 from keyboards import back_to_exercise_kb
+from callbacks import table, HistoryCB
 import database as db
 
 router = Router()
 
 
-@router.callback_query(F.data.startswith("history:"))
-async def show_exercise_history(callback: CallbackQuery):
+@table.handler(HistoryCB)
+async def show_exercise_history(callback: CallbackQuery, callback_data: HistoryCB):
     """Показать историю упражнения."""
-    exercise_id = int(callback.data.split(":")[1])
+    exercise_id = callback_data.exercise_id
     exercise = await db.get_exercise(exercise_id)
 
     if not exercise:
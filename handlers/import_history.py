@@ -0,0 +1,102 @@
+import csv
+import os
+import tempfile
+import time
+
+from aiogram import Bot, Router, F
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import Message
+
+from handlers.custom import user_cancel_kb
+from importer import import_history
+
+router = Router()
+
+# Не чаще раза в столько секунд обновляем сообщение с прогрессом (лимиты Telegram)
+PROGRESS_INTERVAL = 2.0
+
+# Telegram не даёт ботам скачивать файлы больше 20 МБ
+MAX_FILE_SIZE = 20 * 1024 * 1024
+
+IMPORT_EXTENSIONS = (".csv", ".csv.gz", ".jsonl", ".jsonl.gz", ".txt")
+
+
+class ImportHistory(StatesGroup):
+    """Импорт истории из файла."""
+    waiting_for_file = State()
+
+
+@router.message(Command("import"))
+async def start_import(message: Message, state: FSMContext):
+    """Начать импорт истории: /import."""
+    await state.set_state(ImportHistory.waiting_for_file)
+    await message.answer(
+        "📥 Пришли файл с историей тренировок:\n"
+        "• выгрузку из /export (.csv.gz или .jsonl.gz)\n"
+        "• CSV из Strong или Hevy\n\n"
+        "Упражнения из библиотеки сопоставятся по названию, остальные попадут в свои.",
+        reply_markup=user_cancel_kb()
+    )
+
+
+@router.message(ImportHistory.waiting_for_file, F.document)
+async def process_import_file(message: Message, state: FSMContext, bot: Bot):
+    """Скачать файл и импортировать историю."""
+    document = message.document
+    filename = document.file_name or "history.csv"
+
+    if not filename.lower().endswith(IMPORT_EXTENSIONS):
+        await message.answer("Нужен файл .csv, .jsonl или .gz", reply_markup=user_cancel_kb())
+        return
+    if document.file_size and document.file_size > MAX_FILE_SIZE:
+        await message.answer("Файл больше 20 МБ — сожми его в .gz", reply_markup=user_cancel_kb())
+        return
+
+    await state.clear()
+    progress = await message.answer("⏳ Импорт...")
+    last_update = time.monotonic()
+
+    async def on_progress(count: int):
+        nonlocal last_update
+        now = time.monotonic()
+        if now - last_update < PROGRESS_INTERVAL:
+            return
+        last_update = now
+        try:
+            await progress.edit_text(f"⏳ Импорт... {count} записей")
+        except TelegramBadRequest:
+            pass  # Сообщение не изменилось
+
+    fd, path = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        await bot.download(document, destination=path)
+        stats = await import_history(message.from_user.id, path, filename, on_progress)
+    except (ValueError, UnicodeDecodeError, csv.Error, OSError) as e:
+        await progress.edit_text(f"❌ Не удалось разобрать файл: {e}")
+        return
+    finally:
+        os.unlink(path)
+
+    text = (
+        f"✅ Импорт завершён\n\n"
+        f"📋 Упражнения из библиотеки: {stats['program']}\n"
+        f"✏️ Свои упражнения: {stats['custom']}"
+    )
+    if stats["skipped"]:
+        text += f"\n⏭ Пропущено строк: {stats['skipped']}"
+    if stats["conflicts"]:
+        text += (
+            f"\n⚠️ Не записано подходов: {stats['conflicts']} — в эти дни под теми же номерами "
+            f"уже есть подходы с другим весом или повторениями"
+        )
+    await progress.edit_text(text)
+
+
+@router.message(ImportHistory.waiting_for_file)
+async def process_import_not_file(message: Message):
+    """Ждём файл, а пришло что-то другое."""
+    await message.answer("Пришли файл документом или нажми «Отмена»", reply_markup=user_cancel_kb())
@@ -9,6 +9,7 @@ from keyboards import (
     main_menu_kb, admin_menu_kb, select_program_kb,
     today_workout_kb, program_finished_kb
 )
+from callbacks import table, StartProgramCB
 import database as db
 
 router = Router()
@@ -213,10 +214,10 @@ async def select_program(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("start_program:"))
-async def start_program(callback: CallbackQuery):
+@table.handler(StartProgramCB)
+async def start_program(callback: CallbackQuery, callback_data: StartProgramCB):
     """Начать программу."""
-    program_id = int(callback.data.split(":")[1])
+    program_id = callback_data.program_id
     program = await db.get_program(program_id)
 
     if not program:
@@ -5,8 +5,10 @@ from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from aiogram.filters import StateFilter
 
 from keyboards import cancel_kb, weight_kb, reps_kb, sets_kb, after_log_kb, date_select_kb, exercise_select_kb
+from callbacks import table, LogCB, DateCB, RecordDateCB, RecordExerciseCB, WeightCB, RepsCB, SetsCB
 import database as db
 
 router = Router()
@@ -25,16 +27,14 @@ class AddRecord(StatesGroup):
     waiting_for_date = State()
 
 
-@router.callback_query(F.data.startswith("log:"))
-async def start_logging(callback: CallbackQuery, state: FSMContext):
+@table.handler(LogCB)
+async def start_logging(callback: CallbackQuery, callback_data: LogCB, state: FSMContext):
     """Начать запись подхода.
 
-    Формат callback_data: log:{exercise_id}:{day_id}
     day_id может быть 0 если упражнение открыто не из дня.
     """
-    parts = callback.data.split(":")
-    exercise_id = int(parts[1])
-    day_id = int(parts[2]) if len(parts) > 2 else 0
+    exercise_id = callback_data.exercise_id
+    day_id = callback_data.day_id
 
     exercise = await db.get_exercise(exercise_id)
 
@@ -61,7 +61,7 @@ async def start_logging(callback: CallbackQuery, state: FSMContext):
                 break
 
     # weight_type: 0=без веса, 10=гантели, 100=штанга
-    weight_type = exercise["weight_type"] if "weight_type" in exercise.keys() else 10
+    weight_type = exercise.weight_type
 
     await state.update_data(
         exercise_id=exercise_id,
@@ -128,12 +128,12 @@ async def proceed_to_weight(message_or_callback, state: FSMContext, user_id: int
             )
 
 
-@router.callback_query(F.data.startswith("date:"))
-async def select_date(callback: CallbackQuery, state: FSMContext):
+@table.handler(DateCB)
+async def select_date(callback: CallbackQuery, callback_data: DateCB, state: FSMContext):
     """Выбор даты для записи."""
     from datetime import timedelta
 
-    date_choice = callback.data.split(":")[1]
+    date_choice = callback_data.choice
 
     if date_choice == "today":
         selected_date = date.today().isoformat()
@@ -193,10 +193,10 @@ def format_weight(weight: float) -> str:
     return f"{int(weight)}" if weight == int(weight) else f"{weight}"
 
 
-@router.callback_query(LogWorkout.waiting_for_weight, F.data.startswith("w:"))
-async def quick_weight(callback: CallbackQuery, state: FSMContext):
+@table.handler(WeightCB, StateFilter(LogWorkout.waiting_for_weight))
+async def quick_weight(callback: CallbackQuery, callback_data: WeightCB, state: FSMContext):
     """Быстрый выбор веса."""
-    weight = float(callback.data.split(":")[1])
+    weight = callback_data.weight
     await state.update_data(weight=weight)
     await state.set_state(LogWorkout.waiting_for_reps)
 
@@ -246,10 +246,10 @@ async def process_weight(message: Message, state: FSMContext):
 
 # ==================== ПОВТОРЕНИЯ ====================
 
-@router.callback_query(LogWorkout.waiting_for_reps, F.data.startswith("r:"))
-async def quick_reps(callback: CallbackQuery, state: FSMContext):
+@table.handler(RepsCB, StateFilter(LogWorkout.waiting_for_reps))
+async def quick_reps(callback: CallbackQuery, callback_data: RepsCB, state: FSMContext):
     """Быстрый выбор повторений."""
-    reps = int(callback.data.split(":")[1])
+    reps = callback_data.reps
     await state.update_data(reps=reps)
     await state.set_state(LogWorkout.waiting_for_sets)
 
@@ -296,10 +296,10 @@ async def process_reps(message: Message, state: FSMContext):
 
 # ==================== ПОДХОДЫ ====================
 
-@router.callback_query(LogWorkout.waiting_for_sets, F.data.startswith("s:"))
-async def quick_sets(callback: CallbackQuery, state: FSMContext):
+@table.handler(SetsCB, StateFilter(LogWorkout.waiting_for_sets))
+async def quick_sets(callback: CallbackQuery, callback_data: SetsCB, state: FSMContext):
     """Быстрый выбор подходов."""
-    sets = int(callback.data.split(":")[1])
+    sets = callback_data.sets
     await save_workout(callback.message, state, sets, is_callback=True)
     await callback.answer()
 
@@ -326,23 +326,16 @@ async def save_workout(message, state: FSMContext, sets: int, is_callback: bool)
     data = await state.get_data()
     user_id = message.chat.id
 
-    # Получаем текущее количество подходов
-    current_count = await db.get_workout_sets_count(
-        user_id, data["exercise_id"], data["date"]
+    # Все подходы одним запросом, номера выдаёт БД
+    await db.log_workout(
+        user_id=user_id,
+        exercise_id=data["exercise_id"],
+        weight=data["weight"],
+        reps=data["reps"],
+        date=data["date"],
+        sets=sets
     )
 
-    # Сохраняем каждый подход
-    for i in range(sets):
-        set_num = current_count + i + 1
-        await db.log_workout(
-            user_id=user_id,
-            exercise_id=data["exercise_id"],
-            weight=data["weight"],
-            reps=data["reps"],
-            set_num=set_num,
-            date=data["date"]
-        )
-
     await state.clear()
 
     sets_text = f"×{sets}" if sets > 1 else ""
@@ -400,12 +393,12 @@ async def show_exercises_for_record(message, state: FSMContext, date_label: str)
     )
 
 
-@router.callback_query(F.data.startswith("rec_date:"))
-async def add_record_date(callback: CallbackQuery, state: FSMContext):
+@table.handler(RecordDateCB)
+async def add_record_date(callback: CallbackQuery, callback_data: RecordDateCB, state: FSMContext):
     """Выбор даты для записи."""
     from datetime import timedelta
 
-    date_choice = callback.data.split(":")[1]
+    date_choice = callback_data.choice
 
     if date_choice == "today":
         selected_date = date.today().isoformat()
@@ -472,10 +465,10 @@ async def add_record_custom_date(message: Message, state: FSMContext):
         await message.answer("❌ Неверный формат даты. Введи в формате ДД.ММ или ДД.ММ.ГГГГ:")
 
 
-@router.callback_query(F.data.startswith("rec_ex:"))
-async def add_record_exercise(callback: CallbackQuery, state: FSMContext):
+@table.handler(RecordExerciseCB)
+async def add_record_exercise(callback: CallbackQuery, callback_data: RecordExerciseCB, state: FSMContext):
     """Выбор упражнения из библиотеки — переход к записи."""
-    exercise_id = int(callback.data.split(":")[1])
+    exercise_id = callback_data.exercise_id
     data = await state.get_data()
     record_date = data.get("record_date", date.today().isoformat())
 
@@ -484,7 +477,7 @@ async def add_record_exercise(callback: CallbackQuery, state: FSMContext):
         await callback.answer("Упражнение не найдено", show_alert=True)
         return
 
-    weight_type = exercise["weight_type"] if "weight_type" in exercise.keys() else 10
+    weight_type = exercise.weight_type
 
     await state.update_data(
         exercise_id=exercise_id,
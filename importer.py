@@ -0,0 +1,265 @@
+"""Импорт истории тренировок из файлов (своя выгрузка /export, Strong, Hevy).
+
+Файл читается потоково: строки разбираются по одной и пишутся в БД пачками
+по CHUNK_SIZE в одной транзакции, так что размер файла на память не влияет.
+Чтение и разбор пачки (декодирование, CSV, нечёткий поиск названий) идут
+в отдельном потоке, чтобы не останавливать цикл событий бота.
+"""
+import asyncio
+import csv
+import difflib
+import gzip
+import itertools
+import json
+from datetime import datetime
+from functools import lru_cache
+
+import database as db
+
+# Строк в одной транзакции
+CHUNK_SIZE = 5000
+
+# Насколько похожим должно быть название, чтобы считать его упражнением из библиотеки
+FUZZY_CUTOFF = 0.85
+
+LB_TO_KG = 0.45359237
+
+# Заголовок (в нормализованном виде) -> (поле, множитель)
+HEADER_ALIASES = {
+    # Своя выгрузка (database.EXPORT_FIELDS)
+    "date": ("date", None),
+    "source": ("source", None),
+    "exercise": ("exercise", None),
+    "set_num": ("set_num", None),
+    "weight": ("weight", None),
+    "reps": ("reps", None),
+    "duration_minutes": ("duration", None),
+    # Strong
+    "exercise name": ("exercise", None),
+    "set order": ("set_num", None),
+    "seconds": ("duration", 1 / 60),
+    # Hevy
+    "start_time": ("date", None),
+    "exercise_title": ("exercise", None),
+    "set_index": ("set_index", None),
+    "weight_kg": ("weight", None),
+    "weight_lbs": ("weight", LB_TO_KG),
+    "duration_seconds": ("duration", 1 / 60),
+    # Общие варианты
+    "дата": ("date", None),
+    "упражнение": ("exercise", None),
+    "подход": ("set_num", None),
+    "вес": ("weight", None),
+    "повторения": ("reps", None),
+}
+
+DATE_FORMATS = ("%d %b %Y, %H:%M", "%d.%m.%Y", "%m/%d/%Y", "%d/%m/%Y")
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value: str) -> str | None:
+    """Дата в формате YYYY-MM-DD или None."""
+    value = value.strip()
+    if len(value) >= 10 and value[4] == "-" and value[7] == "-":
+        return value[:10]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def _number(value) -> float | None:
+    """Число из ячейки (пустая ячейка — None, запятая как разделитель допустима)."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value.replace(",", "."))
+    except ValueError:
+        return None
+
+
+class ExerciseMatcher:
+    """Сопоставление названий из файла с упражнениями библиотеки.
+
+    Сначала точное совпадение нормализованного названия, затем нечёткое (difflib).
+    Результат кэшируется: в файле названия повторяются тысячи раз.
+    """
+
+    def __init__(self, exercises: list):
+        self._by_name = {}
+        for ex in exercises:
+            self._by_name.setdefault(db.normalize_exercise_name(ex["name"]), ex["id"])
+        self._names = list(self._by_name)
+        self._cache: dict[str, int | None] = {}
+
+    def match(self, name: str) -> int | None:
+        """id упражнения из библиотеки или None."""
+        if name in self._cache:
+            return self._cache[name]
+        normalized = db.normalize_exercise_name(name)
+        exercise_id = self._by_name.get(normalized)
+        if exercise_id is None:
+            close = difflib.get_close_matches(normalized, self._names, n=1, cutoff=FUZZY_CUTOFF)
+            if close:
+                exercise_id = self._by_name[close[0]]
+        self._cache[name] = exercise_id
+        return exercise_id
+
+
+def open_text(path: str, filename: str):
+    """Открыть файл как текст (поддерживается .gz)."""
+    if filename.lower().endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8-sig", newline="")
+    return open(path, "r", encoding="utf-8-sig", newline="")
+
+
+def iter_records(f, filename: str):
+    """Строки файла как словари {заголовок: значение}."""
+    name = filename.lower().removesuffix(".gz")
+    if name.endswith(".jsonl"):
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+        return
+
+    sample = f.read(4096)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    yield from csv.DictReader(_chain(sample, f), dialect=dialect)
+
+
+def _chain(sample: str, f):
+    """Вернуть прочитанный для Sniffer кусок обратно в начало потока строк."""
+    rest = f.readline()
+    yield from (sample + rest).splitlines(keepends=True)
+    yield from f
+
+
+def map_headers(record: dict) -> dict:
+    """Заголовки файла -> (поле, множитель) по HEADER_ALIASES."""
+    mapping = {}
+    for header in record:
+        alias = HEADER_ALIASES.get((header or "").strip().lower())
+        if alias:
+            mapping[header] = alias
+    return mapping
+
+
+def parse_records(records, user_id: int, matcher: ExerciseMatcher, stats: dict):
+    """Строки файла -> ("program" | "custom", кортеж для вставки).
+
+    Строки без даты, названия или повторений/длительности пропускаются.
+    """
+    mapping = None
+    set_counters: dict[tuple, int] = {}
+    for record in records:
+        if mapping is None:
+            mapping = map_headers(record)
+            fields = {field for field, _ in mapping.values()}
+            if not {"date", "exercise"} <= fields:
+                raise ValueError("Не найдены колонки с датой и названием упражнения")
+
+        row = {}
+        for header, (field, factor) in mapping.items():
+            value = record.get(header)
+            if field in ("date", "exercise", "source"):
+                row[field] = value
+                continue
+            number = _number(value)
+            if number is not None and factor:
+                number *= factor
+            row[field] = number
+
+        date = parse_date(row.get("date") or "")
+        name = (row.get("exercise") or "").strip()
+        reps = row.get("reps")
+        duration = row.get("duration")
+        if not date or not name or not (reps or duration):
+            stats["skipped"] += 1
+            continue
+
+        exercise_id = None
+        if row.get("source") != "custom" and reps:
+            exercise_id = matcher.match(name)
+
+        if row.get("set_num"):
+            set_num = int(row["set_num"])
+        elif row.get("set_index") is not None:
+            set_num = int(row["set_index"]) + 1
+        else:
+            # Нумеруем так же, как уникальные индексы БД: по упражнению, а не по написанию
+            if exercise_id is not None:
+                key = (date, exercise_id)
+            else:
+                key = (date, db.canonical_exercise_name(name))
+            set_num = set_counters[key] = set_counters.get(key, 0) + 1
+
+        weight = row.get("weight")
+        if weight is not None:
+            weight = round(weight, 2)
+
+        if exercise_id is not None:
+            stats["program"] += 1
+            yield "program", (user_id, exercise_id, weight or 0, int(reps), set_num, date)
+        else:
+            stats["custom"] += 1
+            yield "custom", (
+                user_id, name, weight, int(reps) if reps else None,
+                round(duration) if duration else None, set_num, date
+            )
+
+
+def _take(iterator, count: int) -> list:
+    """Следующие count элементов итератора (вызывается в потоке через asyncio.to_thread)."""
+    return list(itertools.islice(iterator, count))
+
+
+async def import_history(user_id: int, path: str, filename: str, on_progress=None) -> dict:
+    """
+    Импортирует историю из файла.
+
+    Args:
+        user_id: чья история
+        path: путь к скачанному файлу
+        filename: исходное имя файла (по нему определяется формат)
+        on_progress: async-функция, вызывается с числом обработанных строк после каждой пачки
+
+    Returns:
+        {"program": ..., "custom": ..., "skipped": ..., "conflicts": ...} — сколько
+        строк куда записано. Подходы, которые уже есть в БД (повторный импорт),
+        считаются пропущенными; conflicts — подходы, номер которых за этот день
+        уже занят подходом с другими весом или повторениями (не записаны).
+    """
+    matcher = ExerciseMatcher(await db.get_all_exercises())
+    stats = {"program": 0, "custom": 0, "skipped": 0, "conflicts": 0}
+    program_rows, custom_rows = [], []
+
+    async def flush():
+        for kind, rows, insert in (
+            ("program", program_rows, db.insert_workout_logs_bulk),
+            ("custom", custom_rows, db.insert_custom_logs_bulk),
+        ):
+            if not rows:
+                continue
+            inserted, conflicts = await insert(rows)
+            stats[kind] -= len(rows) - inserted
+            stats["conflicts"] += conflicts
+            stats["skipped"] += len(rows) - inserted - conflicts
+            rows.clear()
+        if on_progress:
+            await on_progress(stats["program"] + stats["custom"])
+
+    with open_text(path, filename) as f:
+        records = parse_records(iter_records(f, filename), user_id, matcher, stats)
+        while chunk := await asyncio.to_thread(_take, records, CHUNK_SIZE):
+            for kind, row in chunk:
+                (program_rows if kind == "program" else custom_rows).append(row)
+            await flush()
+
+    return stats
@@ -1,7 +1,42 @@
+from functools import lru_cache
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
+from callbacks import (
+    ExerciseCB, DayCB, DaysCB, TagCB, LogCB, HistoryCB, MoveCB, QuickCustomCB, tag_key,
+    ProgramCB, StartProgramCB, DateCB, RecordDateCB, RecordExerciseCB, WeightCB, RepsCB, SetsCB,
+    WeightTypeCB, LibExerciseCB, AddToDayCB, LinkExerciseCB, DeleteLibExerciseCB, EditTagsCB
+)
+
+# Клавиатуры без списков из БД кэшируются по аргументам: они собираются
+# один раз за время работы бота. Возвращаемые объекты общие — не изменять!
+# Размер кэша для клавиатур, зависящих от ID (упражнение, день).
+ID_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=4096)
+def _button(text: str, callback_data: str) -> InlineKeyboardButton:
+    """Кнопка-шаблон (кэшируется)."""
+    return InlineKeyboardButton(text=text, callback_data=callback_data)
+
+
+@lru_cache(maxsize=4096)
+def _row(text: str, callback_data: str) -> tuple:
+    """Ряд из одной кнопки-шаблона (кэшируется)."""
+    return (_button(text, callback_data),)
+
 
+def _markup(rows: list) -> InlineKeyboardMarkup:
+    """Собрать клавиатуру из готовых рядов без InlineKeyboardBuilder.
+
+    Builder копирует разметку целиком (deepcopy) при каждом as_markup(),
+    для динамических списков это основная часть стоимости.
+    """
+    return InlineKeyboardMarkup(inline_keyboard=[list(row) for row in rows])
+
+
+@lru_cache(maxsize=None)
 def main_menu_kb(has_active_program: bool = False) -> InlineKeyboardMarkup:
     """Главное меню."""
     builder = InlineKeyboardBuilder()
@@ -28,6 +63,7 @@ def main_menu_kb(has_active_program: bool = False) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def admin_menu_kb(has_active_program: bool = False) -> InlineKeyboardMarkup:
     """Меню админа."""
     builder = InlineKeyboardBuilder()
@@ -57,6 +93,7 @@ def admin_menu_kb(has_active_program: bool = False) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def admin_panel_kb() -> InlineKeyboardMarkup:
     """Панель управления для админа."""
     builder = InlineKeyboardBuilder()
@@ -87,6 +124,7 @@ def admin_panel_kb() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def all_workouts_kb() -> InlineKeyboardMarkup:
     """Подменю 'Все тренировки'."""
     builder = InlineKeyboardBuilder()
@@ -104,73 +142,55 @@ def all_workouts_kb() -> InlineKeyboardMarkup:
 
 def programs_kb(programs: list, is_admin: bool = False) -> InlineKeyboardMarkup:
     """Список программ."""
-    builder = InlineKeyboardBuilder()
-    for p in programs:
-        builder.row(
-            InlineKeyboardButton(
-                text=p["name"],
-                callback_data=f"program:{p['id']}"
-            )
-        )
-    builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data="all_workouts")
-    )
-    return builder.as_markup()
+    rows = [
+        _row(p["name"], ProgramCB(id=p['id']).pack())
+        for p in programs
+    ]
+    rows.append(_row("« Назад", "all_workouts"))
+    return _markup(rows)
 
 
 def days_kb(days: list, program_id: int) -> InlineKeyboardMarkup:
     """Список дней программы."""
-    builder = InlineKeyboardBuilder()
-    for d in days:
-        day_name = d["name"] if d["name"] else f"День {d['day_number']}"
-        builder.row(
-            InlineKeyboardButton(
-                text=day_name,
-                callback_data=f"day:{d['id']}"
-            )
-        )
-    builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data="programs")
-    )
-    return builder.as_markup()
+    rows = [
+        _row(d["name"] if d["name"] else f"День {d['day_number']}", DayCB(id=d['id']).pack())
+        for d in days
+    ]
+    rows.append(_row("« Назад", "programs"))
+    return _markup(rows)
 
 
 def exercises_kb(exercises: list, day_id: int, is_admin: bool = False) -> InlineKeyboardMarkup:
     """Список упражнений дня."""
-    builder = InlineKeyboardBuilder()
+    rows = []
     total = len(exercises)
     for i, ex in enumerate(exercises):
         row_buttons = [
             InlineKeyboardButton(
                 text=f"{i+1}. {ex['name']}",
-                callback_data=f"exercise:{ex['id']}:{day_id}"
+                callback_data=ExerciseCB(id=ex['id'], day_id=day_id).pack()
             )
         ]
         if is_admin:
             # Кнопка вверх (если не первый)
             if i > 0:
-                row_buttons.append(
-                    InlineKeyboardButton(text="↑", callback_data=f"move_ex:{ex['id']}:{day_id}:-1")
-                )
+                row_buttons.append(_button("↑", MoveCB(exercise_id=ex['id'], day_id=day_id, direction=-1).pack()))
             # Кнопка вниз (если не последний)
             if i < total - 1:
-                row_buttons.append(
-                    InlineKeyboardButton(text="↓", callback_data=f"move_ex:{ex['id']}:{day_id}:1")
-                )
-        builder.row(*row_buttons)
-    builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data=f"back_to_days:{day_id}")
-    )
-    return builder.as_markup()
+                row_buttons.append(_button("↓", MoveCB(exercise_id=ex['id'], day_id=day_id, direction=1).pack()))
+        rows.append(row_buttons)
+    rows.append(_row("« Назад", DaysCB(day_id=day_id).pack()))
+    return _markup(rows)
 
 
+@lru_cache(maxsize=ID_CACHE_SIZE)
 def exercise_detail_kb(exercise_id: int, day_id: int, is_admin: bool = False, next_exercise_id: int = None, first_exercise_id: int = None) -> InlineKeyboardMarkup:
     """Кнопки для конкретного упражнения."""
     builder = InlineKeyboardBuilder()
     builder.row(
         InlineKeyboardButton(
             text="💪 Записать подход",
-            callback_data=f"log:{exercise_id}:{day_id}"
+            callback_data=LogCB(exercise_id=exercise_id, day_id=day_id).pack()
         )
     )
     # Пропустить — только если есть следующее упражнение
@@ -178,7 +198,7 @@ def exercise_detail_kb(exercise_id: int, day_id: int, is_admin: bool = False, ne
         builder.row(
             InlineKeyboardButton(
                 text="⏭ Пропустить",
-                callback_data=f"exercise:{next_exercise_id}:{day_id}"
+                callback_data=ExerciseCB(id=next_exercise_id, day_id=day_id).pack()
             )
         )
     # Ещё круг — если это последнее упражнение и есть первое
@@ -186,40 +206,42 @@ def exercise_detail_kb(exercise_id: int, day_id: int, is_admin: bool = False, ne
         builder.row(
             InlineKeyboardButton(
                 text="🔄 Ещё круг",
-                callback_data=f"exercise:{first_exercise_id}:{day_id}"
+                callback_data=ExerciseCB(id=first_exercise_id, day_id=day_id).pack()
             )
         )
     builder.row(
         InlineKeyboardButton(
             text="📈 История",
-            callback_data=f"history:{exercise_id}"
+            callback_data=HistoryCB(exercise_id=exercise_id).pack()
         )
     )
     if is_admin:
         builder.row(
             InlineKeyboardButton(
                 text="🏷 Теги",
-                callback_data=f"edit_tags:{exercise_id}"
+                callback_data=EditTagsCB(exercise_id=exercise_id).pack()
             )
         )
     builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data=f"day:{day_id}")
+        InlineKeyboardButton(text="« Назад", callback_data=DayCB(id=day_id).pack())
     )
     return builder.as_markup()
 
 
+@lru_cache(maxsize=ID_CACHE_SIZE)
 def back_to_exercise_kb(exercise_id: int) -> InlineKeyboardMarkup:
     """Кнопка назад к упражнению."""
     builder = InlineKeyboardBuilder()
     builder.row(
         InlineKeyboardButton(
             text="« Назад",
-            callback_data=f"exercise:{exercise_id}"
+            callback_data=ExerciseCB(id=exercise_id).pack()
         )
     )
     return builder.as_markup()
 
 
+@lru_cache(maxsize=ID_CACHE_SIZE)
 def confirm_kb(action: str, item_id: int) -> InlineKeyboardMarkup:
     """Подтверждение действия."""
     builder = InlineKeyboardBuilder()
@@ -236,6 +258,7 @@ def confirm_kb(action: str, item_id: int) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def cancel_kb() -> InlineKeyboardMarkup:
     """Кнопка отмены."""
     builder = InlineKeyboardBuilder()
@@ -245,6 +268,7 @@ def cancel_kb() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def skip_kb(callback_data: str = "skip") -> InlineKeyboardMarkup:
     """Кнопка пропустить."""
     builder = InlineKeyboardBuilder()
@@ -257,17 +281,18 @@ def skip_kb(callback_data: str = "skip") -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def weight_type_kb() -> InlineKeyboardMarkup:
     """Выбор типа веса для упражнения."""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="🏋️ Гантели (5-50кг)", callback_data="wt:10")
+        InlineKeyboardButton(text="🏋️ Гантели (5-50кг)", callback_data=WeightTypeCB(weight_type=10).pack())
     )
     builder.row(
-        InlineKeyboardButton(text="🏋️ Штанга (50-100кг)", callback_data="wt:100")
+        InlineKeyboardButton(text="🏋️ Штанга (50-100кг)", callback_data=WeightTypeCB(weight_type=100).pack())
     )
     builder.row(
-        InlineKeyboardButton(text="🤸 Без веса", callback_data="wt:0")
+        InlineKeyboardButton(text="🤸 Без веса", callback_data=WeightTypeCB(weight_type=0).pack())
     )
     builder.row(
         InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_action")
@@ -277,25 +302,20 @@ def weight_type_kb() -> InlineKeyboardMarkup:
 
 def select_program_kb(programs: list) -> InlineKeyboardMarkup:
     """Выбор программы для начала."""
-    builder = InlineKeyboardBuilder()
-    for p in programs:
-        builder.row(
-            InlineKeyboardButton(
-                text=p["name"],
-                callback_data=f"start_program:{p['id']}"
-            )
-        )
-    builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data="back_to_main")
-    )
-    return builder.as_markup()
+    rows = [
+        _row(p["name"], StartProgramCB(program_id=p['id']).pack())
+        for p in programs
+    ]
+    rows.append(_row("« Назад", "back_to_main"))
+    return _markup(rows)
 
 
+@lru_cache(maxsize=ID_CACHE_SIZE)
 def today_workout_kb(day_id: int) -> InlineKeyboardMarkup:
     """Клавиатура текущей тренировки."""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="📋 Упражнения дня", callback_data=f"day:{day_id}")
+        InlineKeyboardButton(text="📋 Упражнения дня", callback_data=DayCB(id=day_id).pack())
     )
     builder.row(
         InlineKeyboardButton(text="✅ Закончить день", callback_data="complete_day")
@@ -306,6 +326,7 @@ def today_workout_kb(day_id: int) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def program_finished_kb() -> InlineKeyboardMarkup:
     """Программа завершена."""
     builder = InlineKeyboardBuilder()
@@ -318,58 +339,47 @@ def program_finished_kb() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def custom_exercise_kb(recent_exercises: list = None) -> InlineKeyboardMarkup:
-    """Клавиатура для своего упражнения."""
-    builder = InlineKeyboardBuilder()
-    if recent_exercises:
-        for name in recent_exercises:
-            builder.row(
-                InlineKeyboardButton(
-                    text=name,
-                    callback_data=f"quick_custom:{name[:50]}"
-                )
-            )
-    builder.row(
-        InlineKeyboardButton(text="✏️ Ввести новое", callback_data="new_custom")
-    )
-    builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data="back_to_main")
-    )
-    return builder.as_markup()
+@lru_cache(maxsize=ID_CACHE_SIZE)
+def custom_exercise_kb(recent_exercises: tuple = (), has_entries: bool = False) -> InlineKeyboardMarkup:
+    """Клавиатура режима своих упражнений: последние упражнения и выход."""
+    rows = [
+        [InlineKeyboardButton(text=name, callback_data=QuickCustomCB(key=tag_key(name)).pack())]
+        for name in recent_exercises
+    ]
+    if has_entries:
+        # Если уже вводил - кнопка завершения
+        rows.append(_row("✅ Закончить день", "finish_custom"))
+    else:
+        # Если ещё не вводил - можно вернуться
+        rows.append(_row("⬅️ Назад", "back_to_main"))
+    return _markup(rows)
 
 
 # ==================== EXERCISE LIBRARY (ADMIN) ====================
 
 def exercise_library_kb(exercises: list) -> InlineKeyboardMarkup:
     """Список упражнений в библиотеке (админ)."""
-    builder = InlineKeyboardBuilder()
-    builder.row(
-        InlineKeyboardButton(text="➕ Создать упражнение", callback_data="create_exercise")
-    )
-    for ex in exercises:
-        builder.row(
-            InlineKeyboardButton(
-                text=ex['name'],
-                callback_data=f"lib_exercise:{ex['id']}"
-            )
-        )
-    builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data="admin_menu")
+    rows = [_row("➕ Создать упражнение", "create_exercise")]
+    rows.extend(
+        [InlineKeyboardButton(text=ex['name'], callback_data=LibExerciseCB(id=ex['id']).pack())]
+        for ex in exercises
     )
-    return builder.as_markup()
+    rows.append(_row("« Назад", "admin_menu"))
+    return _markup(rows)
 
 
+@lru_cache(maxsize=ID_CACHE_SIZE)
 def lib_exercise_detail_kb(exercise_id: int) -> InlineKeyboardMarkup:
     """Детали упражнения в библиотеке (админ)."""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="📋 Добавить в день", callback_data=f"add_to_day:{exercise_id}")
+        InlineKeyboardButton(text="📋 Добавить в день", callback_data=AddToDayCB(exercise_id=exercise_id).pack())
     )
     builder.row(
-        InlineKeyboardButton(text="🏷 Редактировать теги", callback_data=f"edit_tags:{exercise_id}")
+        InlineKeyboardButton(text="🏷 Редактировать теги", callback_data=EditTagsCB(exercise_id=exercise_id).pack())
     )
     builder.row(
-        InlineKeyboardButton(text="🗑 Удалить", callback_data=f"delete_lib_exercise:{exercise_id}")
+        InlineKeyboardButton(text="🗑 Удалить", callback_data=DeleteLibExerciseCB(exercise_id=exercise_id).pack())
     )
     builder.row(
         InlineKeyboardButton(text="« Назад", callback_data="exercise_library")
@@ -377,25 +387,46 @@ def lib_exercise_detail_kb(exercise_id: int) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def select_day_for_exercise_kb(programs: list, days_by_program: dict, exercise_id: int) -> InlineKeyboardMarkup:
-    """Выбор дня для добавления упражнения."""
-    builder = InlineKeyboardBuilder()
-    for p in programs:
-        days = days_by_program.get(p['id'], [])
-        for d in days:
+def select_day_for_exercise_kb(tree: list, exercise_id: int) -> InlineKeyboardMarkup:
+    """Выбор дня для добавления упражнения (tree — из db.get_program_tree)."""
+    rows = []
+    for p in tree:
+        for d in p["days"]:
             day_name = d['name'] or f"День {d['day_number']}"
-            builder.row(
+            rows.append([
                 InlineKeyboardButton(
                     text=f"{p['name']} / {day_name}",
-                    callback_data=f"link_exercise:{exercise_id}:{d['id']}"
+                    callback_data=LinkExerciseCB(exercise_id=exercise_id, day_id=d['id']).pack()
                 )
-            )
-    builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data=f"lib_exercise:{exercise_id}")
-    )
-    return builder.as_markup()
-
-
+            ])
+    rows.append(_row("« Назад", LibExerciseCB(id=exercise_id).pack()))
+    return _markup(rows)
+
+
+def program_tree_kb(
+    tree: list,
+    cb_class: type,
+    back_text: str,
+    back_callback: str,
+    count: str = "days"
+) -> InlineKeyboardMarkup:
+    """Список программ из db.get_program_tree с числом дней или упражнений.
+
+    cb_class — класс callback_data кнопки программы (с полем program_id).
+    count: "days" или "exercises" — что подписать рядом с названием.
+    """
+    rows = []
+    for p in tree:
+        if count == "days":
+            total = len(p["days"])
+        else:
+            total = sum(d["exercise_count"] for d in p["days"])
+        rows.append(_row(f"{p['name']} ({total})", cb_class(program_id=p['id']).pack()))
+    rows.append(_row(back_text, back_callback))
+    return _markup(rows)
+
+
+@lru_cache(maxsize=None)
 def add_exercise_to_day_kb() -> InlineKeyboardMarkup:
     """Выбор: создать новое или выбрать из библиотеки."""
     builder = InlineKeyboardBuilder()
@@ -413,100 +444,92 @@ def add_exercise_to_day_kb() -> InlineKeyboardMarkup:
 
 def library_exercises_for_day_kb(exercises: list, day_id: int) -> InlineKeyboardMarkup:
     """Выбор упражнения из библиотеки для добавления в день."""
-    builder = InlineKeyboardBuilder()
-    for ex in exercises:
-        builder.row(
-            InlineKeyboardButton(
-                text=ex['name'],
-                callback_data=f"link_exercise:{ex['id']}:{day_id}"
-            )
-        )
-    builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data="add_exercise")
-    )
-    return builder.as_markup()
+    rows = [
+        [InlineKeyboardButton(text=ex['name'], callback_data=LinkExerciseCB(exercise_id=ex['id'], day_id=day_id).pack())]
+        for ex in exercises
+    ]
+    rows.append(_row("« Назад", "add_exercise"))
+    return _markup(rows)
 
 
 # ==================== TAGS ====================
 
 def tags_kb(tags: list) -> InlineKeyboardMarkup:
     """Список тегов для фильтрации."""
+    rows = [
+        [InlineKeyboardButton(
+            text=f"#{tag['name']} ({tag.get('exercise_count', 0)})",
+            callback_data=TagCB(key=tag_key(tag['name'])).pack()
+        )]
+        for tag in tags
+    ]
+    rows.append(_row("« Назад", "all_workouts"))
+    return _markup(rows)
+
+
+@lru_cache(maxsize=ID_CACHE_SIZE)
+def exercise_from_tag_kb(exercise_id: int, day_id: int, tag: str, is_admin: bool = False) -> InlineKeyboardMarkup:
+    """Кнопки для упражнения, открытого из списка по тегу.
+
+    tag — ключ тега из callback_data (см. callbacks.tag_key).
+    """
     builder = InlineKeyboardBuilder()
-    for tag in tags:
-        count = tag.get("exercise_count", 0)
-        builder.row(
-            InlineKeyboardButton(
-                text=f"#{tag['name']} ({count})",
-                callback_data=f"tag:{tag['name']}"
-            )
-        )
-    builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data="all_workouts")
-    )
-    return builder.as_markup()
-
-
-def exercise_from_tag_kb(exercise_id: int, day_id: int, tag_name: str, is_admin: bool = False) -> InlineKeyboardMarkup:
-    """Кнопки для упражнения, открытого из списка по тегу."""
-    builder = InlineKeyboardBuilder()
-    day_suffix = f":{day_id}" if day_id else ":0"
     builder.row(
         InlineKeyboardButton(
             text="💪 Записать подход",
-            callback_data=f"log:{exercise_id}{day_suffix}"
+            callback_data=LogCB(exercise_id=exercise_id, day_id=day_id or 0).pack()
         )
     )
     builder.row(
         InlineKeyboardButton(
             text="📈 История",
-            callback_data=f"history:{exercise_id}"
+            callback_data=HistoryCB(exercise_id=exercise_id).pack()
         )
     )
     if is_admin:
         builder.row(
             InlineKeyboardButton(
                 text="🏷 Теги",
-                callback_data=f"edit_tags:{exercise_id}"
+                callback_data=EditTagsCB(exercise_id=exercise_id).pack()
             )
         )
     builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data=f"tag:{tag_name}")
+        InlineKeyboardButton(text="« Назад", callback_data=TagCB(key=tag).pack())
     )
     return builder.as_markup()
 
 
 def tag_exercises_kb(exercises: list, tag_name: str) -> InlineKeyboardMarkup:
     """Список упражнений по тегу."""
-    builder = InlineKeyboardBuilder()
-    for ex in exercises:
-        # Показываем программу в названии
-        # day_id=0 означает "из тегов" - без контекста конкретного дня
-        builder.row(
-            InlineKeyboardButton(
-                text=f"{ex['name']} ({ex['program_name'] or 'библиотека'})",
-                callback_data=f"exercise:{ex['id']}:0:tag:{tag_name}"
-            )
-        )
-    builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data="tags_menu")
-    )
-    return builder.as_markup()
+    # Показываем программу в названии
+    # day_id=0 означает "из тегов" - без контекста конкретного дня
+    key = tag_key(tag_name)
+    rows = [
+        [InlineKeyboardButton(
+            text=f"{ex['name']} ({ex['program_name'] or 'библиотека'})",
+            callback_data=ExerciseCB(id=ex['id'], day_id=0, tag=key).pack()
+        )]
+        for ex in exercises
+    ]
+    rows.append(_row("« Назад", "tags_menu"))
+    return _markup(rows)
 
 
 # ==================== QUICK INPUT ====================
 
+@lru_cache(maxsize=None)
 def date_select_kb(for_record: bool = False) -> InlineKeyboardMarkup:
     """Выбор даты для записи тренировки."""
     builder = InlineKeyboardBuilder()
-    prefix = "rec_date" if for_record else "date"
+    cb_class = RecordDateCB if for_record else DateCB
     builder.row(
-        InlineKeyboardButton(text="📅 Сегодня", callback_data=f"{prefix}:today")
+        InlineKeyboardButton(text="📅 Сегодня", callback_data=cb_class(choice="today").pack())
     )
     builder.row(
-        InlineKeyboardButton(text="📅 Вчера", callback_data=f"{prefix}:yesterday")
+        InlineKeyboardButton(text="📅 Вчера", callback_data=cb_class(choice="yesterday").pack())
     )
     builder.row(
-        InlineKeyboardButton(text="📅 Другая дата", callback_data=f"{prefix}:custom")
+        InlineKeyboardButton(text="📅 Другая дата", callback_data=cb_class(choice="custom").pack())
     )
     builder.row(
         InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_action" if not for_record else "back_to_main")
@@ -516,23 +539,16 @@ def date_select_kb(for_record: bool = False) -> InlineKeyboardMarkup:
 
 def exercise_select_kb(exercises: list) -> InlineKeyboardMarkup:
     """Выбор упражнения из библиотеки для записи."""
-    builder = InlineKeyboardBuilder()
-    for ex in exercises:
-        builder.row(
-            InlineKeyboardButton(
-                text=ex['name'],
-                callback_data=f"rec_ex:{ex['id']}"
-            )
-        )
-    builder.row(
-        InlineKeyboardButton(text="➕ Создать новое", callback_data="user_create_exercise")
-    )
-    builder.row(
-        InlineKeyboardButton(text="« Назад", callback_data="add_record")
-    )
-    return builder.as_markup()
+    rows = [
+        [InlineKeyboardButton(text=ex['name'], callback_data=RecordExerciseCB(exercise_id=ex['id']).pack())]
+        for ex in exercises
+    ]
+    rows.append(_row("➕ Создать новое", "user_create_exercise"))
+    rows.append(_row("« Назад", "add_record"))
+    return _markup(rows)
 
 
+@lru_cache(maxsize=None)
 def weight_kb(weight_type: int = 10) -> InlineKeyboardMarkup | None:
     """Быстрый выбор веса.
 
@@ -557,7 +573,7 @@ def weight_kb(weight_type: int = 10) -> InlineKeyboardMarkup | None:
     for i in range(0, len(weights), 4):
         row = weights[i:i+4]
         builder.row(*[
-            InlineKeyboardButton(text=f"{w} кг", callback_data=f"w:{w}")
+            InlineKeyboardButton(text=f"{w} кг", callback_data=WeightCB(weight=w).pack())
             for w in row
         ])
     builder.row(
@@ -566,6 +582,7 @@ def weight_kb(weight_type: int = 10) -> InlineKeyboardMarkup | None:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def reps_kb() -> InlineKeyboardMarkup:
     """Быстрый выбор повторений."""
     builder = InlineKeyboardBuilder()
@@ -574,7 +591,7 @@ def reps_kb() -> InlineKeyboardMarkup:
     for i in range(0, len(reps), 3):
         row = reps[i:i+3]
         builder.row(*[
-            InlineKeyboardButton(text=str(r), callback_data=f"r:{r}")
+            InlineKeyboardButton(text=str(r), callback_data=RepsCB(reps=r).pack())
             for r in row
         ])
     builder.row(
@@ -583,14 +600,12 @@ def reps_kb() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=None)
 def sets_kb() -> InlineKeyboardMarkup:
     """Быстрый выбор подходов."""
     builder = InlineKeyboardBuilder()
     builder.row(
-        InlineKeyboardButton(text="1", callback_data="s:1"),
-        InlineKeyboardButton(text="2", callback_data="s:2"),
-        InlineKeyboardButton(text="3", callback_data="s:3"),
-        InlineKeyboardButton(text="4", callback_data="s:4"),
+        *[InlineKeyboardButton(text=str(n), callback_data=SetsCB(sets=n).pack()) for n in (1, 2, 3, 4)]
     )
     builder.row(
         InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_action")
@@ -598,32 +613,34 @@ def sets_kb() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@lru_cache(maxsize=ID_CACHE_SIZE)
 def after_log_kb(exercise_id: int, next_exercise_id: int = None, day_id: int = None, first_exercise_id: int = None) -> InlineKeyboardMarkup:
     """Клавиатура после записи подхода."""
     builder = InlineKeyboardBuilder()
-    day_suffix = f":{day_id}" if day_id else ":0"
+    day_id = day_id or 0
     builder.row(
-        InlineKeyboardButton(text="➕ Ещё подход", callback_data=f"log:{exercise_id}{day_suffix}")
+        InlineKeyboardButton(text="➕ Ещё подход", callback_data=LogCB(exercise_id=exercise_id, day_id=day_id).pack())
     )
     if next_exercise_id and day_id:
         builder.row(
-            InlineKeyboardButton(text="➡️ Следующее", callback_data=f"exercise:{next_exercise_id}:{day_id}")
+            InlineKeyboardButton(text="➡️ Следующее", callback_data=ExerciseCB(id=next_exercise_id, day_id=day_id).pack())
         )
     # Ещё круг — если это последнее упражнение
     elif first_exercise_id and day_id and first_exercise_id != exercise_id:
         builder.row(
-            InlineKeyboardButton(text="🔄 Ещё круг", callback_data=f"exercise:{first_exercise_id}:{day_id}")
+            InlineKeyboardButton(text="🔄 Ещё круг", callback_data=ExerciseCB(id=first_exercise_id, day_id=day_id).pack())
         )
     if day_id:
         builder.row(
             InlineKeyboardButton(text="✅ Закончить день", callback_data="complete_day")
         )
     builder.row(
-        InlineKeyboardButton(text="« К упражнению", callback_data=f"exercise:{exercise_id}{day_suffix}")
+        InlineKeyboardButton(text="« К упражнению", callback_data=ExerciseCB(id=exercise_id, day_id=day_id).pack())
     )
     return builder.as_markup()
 
 
+@lru_cache(maxsize=ID_CACHE_SIZE)
 def day_completed_kb(day_id: int = None, show_next: bool = True) -> InlineKeyboardMarkup:
     """Клавиатура после завершения дня."""
     builder = InlineKeyboardBuilder()
@@ -632,7 +649,7 @@ def day_completed_kb(day_id: int = None, show_next: bool = True) -> InlineKeyboa
     )
     if show_next and day_id:
         builder.row(
-            InlineKeyboardButton(text="➡️ К следующему дню", callback_data=f"day:{day_id}")
+            InlineKeyboardButton(text="➡️ К следующему дню", callback_data=DayCB(id=day_id).pack())
         )
     builder.row(
         InlineKeyboardButton(text="« В меню", callback_data="back_to_main")
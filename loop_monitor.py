@@ -0,0 +1,71 @@
+"""Задержка цикла событий: замер и сторож блокировок.
+
+Пока цикл выполняет синхронный код (долгий запрос к БД в потоке цикла,
+разбор файла, тяжёлый расчёт), не просыпается ни одна задача — ждут все
+пользователи сразу. Замер — задача, которая засыпает на LOOP_LAG_INTERVAL_MS
+и пишет в metrics.loop_lag, на сколько позже срока проснулась.
+
+Когда замер это увидит, блокировка уже закончилась, поэтому место ищет
+сторож — отдельный поток: если задача замера не просыпалась дольше срока
+на LOOP_LAG_THRESHOLD_MS, цикл заблокирован прямо сейчас, и сторож пишет
+в лог стек потока цикла. Одна блокировка — одна запись.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+import metrics
+from config import LOOP_LAG_INTERVAL_MS, LOOP_LAG_THRESHOLD_MS
+
+logger = logging.getLogger(__name__)
+
+# time.monotonic() последнего пробуждения задачи замера
+_last_beat = 0.0
+
+
+def _watch(loop: asyncio.AbstractEventLoop, loop_thread_id: int, interval: float, threshold: float,
+           stop: threading.Event):
+    """Поток-сторож: стек потока цикла, если тот заблокирован дольше threshold."""
+    reported = None
+    while not stop.wait(threshold / 2):
+        beat = _last_beat
+        blocked = time.monotonic() - beat - interval
+        if blocked < threshold or beat == reported:
+            continue
+        reported = beat
+        frame = sys._current_frames().get(loop_thread_id)
+        task = asyncio.current_task(loop)
+        logger.warning(
+            "Event loop blocked for %.0f ms (task %s), stack:\n%s",
+            blocked * 1e3, task.get_name() if task else "-",
+            "".join(traceback.format_stack(frame)) if frame else "unavailable"
+        )
+
+
+async def run_loop_monitor():
+    """Замерять задержку цикла в metrics.loop_lag и запустить поток-сторож."""
+    global _last_beat
+    if LOOP_LAG_INTERVAL_MS <= 0:
+        return
+    interval = LOOP_LAG_INTERVAL_MS / 1e3
+    _last_beat = time.monotonic()
+
+    stop = threading.Event()
+    if LOOP_LAG_THRESHOLD_MS > 0:
+        threading.Thread(
+            target=_watch,
+            args=(asyncio.get_running_loop(), threading.get_ident(), interval, LOOP_LAG_THRESHOLD_MS / 1e3, stop),
+            name="loop-watchdog",
+            daemon=True,
+        ).start()
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            metrics.loop_lag.observe(max(now - _last_beat - interval, 0.0) * 1e3)
+            _last_beat = now
+    finally:
+        stop.set()
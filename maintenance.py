@@ -0,0 +1,81 @@
+"""Фоновые задачи обслуживания: БД и хранилище FSM."""
+import asyncio
+import logging
+from datetime import date, timedelta
+
+import backup
+import database as db
+from config import (
+    ARCHIVE_AFTER_DAYS, ARCHIVE_INTERVAL_HOURS, BACKUP_INTERVAL_HOURS, DB_OPTIMIZE_INTERVAL_HOURS,
+    ORPHAN_GC_INTERVAL_HOURS, FSM_SWEEP_INTERVAL_MINUTES
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def run_archiver():
+    """Периодически переносить подходы старше ARCHIVE_AFTER_DAYS в архив."""
+    if ARCHIVE_AFTER_DAYS <= 0:
+        return
+    while True:
+        before = (date.today() - timedelta(days=ARCHIVE_AFTER_DAYS)).isoformat()
+        try:
+            moved = await db.archive_old_logs(before)
+            if any(moved.values()):
+                logger.info("Archived logs before %s: %s", before, moved)
+        except Exception:
+            logger.exception("Archiving failed")
+        await asyncio.sleep(ARCHIVE_INTERVAL_HOURS * 3600)
+
+
+async def run_backups():
+    """Периодически снимать резервные копии БД (в отдельном потоке)."""
+    if BACKUP_INTERVAL_HOURS <= 0:
+        return
+    while True:
+        try:
+            for result in await asyncio.to_thread(backup.run_backup):
+                logger.info(
+                    "Backup %s: %.1f MB in %.1f s, %d steps, max step %.1f ms",
+                    result["path"], result["size"] / 1e6, result["seconds"],
+                    result["steps"], result["step_max_ms"]
+                )
+        except Exception:
+            logger.exception("Backup failed")
+        await asyncio.sleep(BACKUP_INTERVAL_HOURS * 3600)
+
+
+async def run_optimizer():
+    """Периодически обновлять статистику планировщика и усекать WAL."""
+    if DB_OPTIMIZE_INTERVAL_HOURS <= 0:
+        return
+    while True:
+        await asyncio.sleep(DB_OPTIMIZE_INTERVAL_HOURS * 3600)
+        try:
+            busy, log_pages, checkpointed = await db.optimize_db()
+            logger.info("DB optimized, WAL checkpoint: %d/%d pages (busy=%d)", checkpointed, log_pages, busy)
+        except Exception:
+            logger.exception("DB optimize failed")
+
+
+async def run_orphan_collector():
+    """Периодически убирать строки, ссылающиеся на удалённые записи."""
+    if ORPHAN_GC_INTERVAL_HOURS <= 0:
+        return
+    while True:
+        try:
+            collected = await db.collect_orphans()
+            if any(collected.values()):
+                logger.info("Orphans collected: %s", {k: v for k, v in collected.items() if v})
+        except Exception:
+            logger.exception("Orphan collection failed")
+        await asyncio.sleep(ORPHAN_GC_INTERVAL_HOURS * 3600)
+
+
+async def run_fsm_sweeper(storage):
+    """Периодически удалять из storage (BoundedMemoryStorage) брошенные диалоги."""
+    while True:
+        await asyncio.sleep(FSM_SWEEP_INTERVAL_MINUTES * 60)
+        removed = storage.sweep()
+        if removed:
+            logger.info("FSM sweep: %d expired records removed, %d left", removed, len(storage.storage))
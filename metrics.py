@@ -0,0 +1,83 @@
+"""Метрики процесса: ожидание апдейтов в очереди пользователя, время
+обработчиков и задержка цикла событий."""
+import bisect
+from collections import OrderedDict
+
+# Границы корзин гистограммы, мс (последняя корзина — всё, что больше)
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Для скольких пользователей хранить статистику (давно не писавшие вытесняются)
+USER_STATS_LIMIT = 1024
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами: счётчики без хранения значений."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float):
+        self.counts[bisect.bisect_left(BUCKETS_MS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def quantile(self, q: float) -> float:
+        """Верхняя граница корзины, в которую попадает квантиль q (оценка сверху)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+
+class UserWait:
+    """Ожидание в очереди одного пользователя."""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+queue_wait = Histogram()
+# Время обработки апдейта (после очереди пользователя)
+handler_time = Histogram()
+# На сколько позже срока просыпается задача в цикле событий (loop_monitor)
+loop_lag = Histogram()
+_user_wait: OrderedDict[int, UserWait] = OrderedDict()
+
+
+def record_queue_wait(user_id: int, seconds: float):
+    """Учесть, сколько апдейт пользователя ждал предыдущие апдейты этого же пользователя."""
+    value_ms = seconds * 1e3
+    queue_wait.observe(value_ms)
+
+    stats = _user_wait.get(user_id)
+    if stats is None:
+        stats = _user_wait[user_id] = UserWait()
+        if len(_user_wait) > USER_STATS_LIMIT:
+            _user_wait.popitem(last=False)
+    else:
+        _user_wait.move_to_end(user_id)
+    stats.count += 1
+    stats.total += value_ms
+    if value_ms > stats.max:
+        stats.max = value_ms
+
+
+def top_waiting_users(limit: int = 10) -> list[tuple[int, UserWait]]:
+    """Пользователи с наибольшим суммарным ожиданием: [(user_id, UserWait), ...]."""
+    return sorted(_user_wait.items(), key=lambda item: item[1].total, reverse=True)[:limit]
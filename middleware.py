@@ -1,3 +1,5 @@
+import asyncio
+import time
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery, TelegramObject
@@ -5,6 +7,16 @@ from aiogram.fsm.context import FSMContext
 
 from config import ADMIN_ID
 import database as db
+import metrics
+
+# Группы состояний, в которых сообщения пропускаются без проверки доступа (ввод в процессе)
+BYPASS_STATE_GROUPS = frozenset({
+    "AccessState",
+    "CustomMode",
+    "LogWorkout",
+    "EditExerciseTag",
+    "GenerateExercises",
+})
 
 
 class AccessMiddleware(BaseMiddleware):
@@ -16,10 +28,16 @@ class AccessMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        # Получаем user_id
-        user_id = None
+        user = getattr(event, "from_user", None)
+        if user is None:
+            return await handler(event, data)
+        user_id = user.id
+
+        # Быстрый путь: админ или уже проверенный пользователь — без обращения к FSM и БД
+        if user_id == ADMIN_ID or db.is_user_allowed_cached(user_id):
+            return await handler(event, data)
+
         if isinstance(event, Message):
-            user_id = event.from_user.id
             # Пропускаем /start - его обработает access router
             if event.text and event.text.startswith("/start"):
                 return await handler(event, data)
@@ -28,19 +46,9 @@ class AccessMiddleware(BaseMiddleware):
             state: FSMContext = data.get("state")
             if state:
                 current_state = await state.get_state()
-                if current_state and ("AccessState" in current_state or "CustomMode" in current_state or "LogWorkout" in current_state or "EditExerciseTag" in current_state or "GenerateExercises" in current_state):
+                if current_state and current_state.split(":", 1)[0] in BYPASS_STATE_GROUPS:
                     return await handler(event, data)
 
-        elif isinstance(event, CallbackQuery):
-            user_id = event.from_user.id
-
-        if user_id is None:
-            return await handler(event, data)
-
-        # Админ всегда имеет доступ
-        if user_id == ADMIN_ID:
-            return await handler(event, data)
-
         # Проверяем в базе
         if await db.is_user_allowed(user_id):
             return await handler(event, data)
@@ -53,4 +61,57 @@ class AccessMiddleware(BaseMiddleware):
         elif isinstance(event, CallbackQuery):
             await event.answer("Нет доступа. Нажми /start", show_alert=True)
 
-        return None
\ No newline at end of file
+        return None
+
+
+class _UserQueue:
+    """Очередь апдейтов одного пользователя: FIFO-замок и число апдейтов в работе."""
+
+    __slots__ = ("lock", "pending")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+class UserOrderMiddleware(BaseMiddleware):
+    """Апдейты одного пользователя — строго по очереди, разных — параллельно.
+
+    aiogram обрабатывает апдейты конкурентно, и два быстрых нажатия одного
+    пользователя могли перемешаться внутри обработчика (например, получить
+    одинаковый номер подхода). asyncio.Lock будит ожидающих в порядке прихода.
+    Очередь живёт, пока у пользователя есть апдейты в работе, и удаляется,
+    как только последний завершился. Ожидание и время обработки пишутся в metrics.
+    """
+
+    def __init__(self):
+        self._queues: dict[int, _UserQueue] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+        user_id = user.id
+
+        queue = self._queues.get(user_id)
+        if queue is None:
+            queue = self._queues[user_id] = _UserQueue()
+        queue.pending += 1
+        arrived = time.perf_counter()
+        try:
+            async with queue.lock:
+                started = time.perf_counter()
+                metrics.record_queue_wait(user_id, started - arrived)
+                try:
+                    return await handler(event, data)
+                finally:
+                    metrics.handler_time.observe((time.perf_counter() - started) * 1e3)
+        finally:
+            queue.pending -= 1
+            if not queue.pending:
+                del self._queues[user_id]
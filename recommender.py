@@ -0,0 +1,98 @@
+"""Локальный подбор упражнений из библиотеки (без сети)."""
+from datetime import date
+
+import database as db
+
+# Группа мышц -> теги упражнений в библиотеке
+MUSCLE_TAGS = {
+    "chest": frozenset({"грудь", "грудные"}),
+    "back": frozenset({"спина", "широчайшие"}),
+    "shoulders": frozenset({"плечи", "дельты"}),
+    "biceps": frozenset({"бицепс", "бицепсы"}),
+    "triceps": frozenset({"трицепс", "трицепсы"}),
+    "legs": frozenset({"ноги", "квадрицепс", "бедро", "икры"}),
+    "abs": frozenset({"пресс", "кор"}),
+    "glutes": frozenset({"ягодицы"}),
+}
+
+# Упражнение, сделанное совсем недавно, опускаем ниже в списке
+RECENT_DAYS = 2
+
+
+def _parse_tags(tag: str | None) -> set[str]:
+    """Разобрать теги через запятую."""
+    if not tag:
+        return set()
+    return {t.strip().lower() for t in tag.split(",") if t.strip()}
+
+
+def _score(row, today: date) -> float:
+    """Оценка упражнения: своя история важнее общей популярности."""
+    score = row["user_uses"] * 2 + row["total_uses"]
+    if row["user_last_date"]:
+        days_ago = (today - date.fromisoformat(row["user_last_date"])).days
+        if days_ago < RECENT_DAYS:
+            score /= 2
+    return score
+
+
+async def recommend_exercises(user_id: int, muscles: list[str], count: int = 5) -> list:
+    """
+    Подбирает упражнения из библиотеки для выбранных мышц.
+
+    Args:
+        user_id: пользователь, чья история учитывается
+        muscles: ключи групп мышц (chest, back, ...)
+        count: количество упражнений
+
+    Returns:
+        Список строк упражнений (id, name, description, tag, ...)
+    """
+    rows = await db.get_exercise_usage(user_id)
+    today = date.today()
+
+    # Кандидаты для каждой группы мышц, лучшие первыми
+    candidates = {}
+    for muscle in muscles:
+        tags = MUSCLE_TAGS.get(muscle, frozenset())
+        matched = [r for r in rows if _parse_tags(r["tag"]) & tags]
+        matched.sort(key=lambda r: (-_score(r, today), r["name"]))
+        candidates[muscle] = matched
+
+    # По кругу берём лучшее из каждой группы, чтобы набор был разнообразным
+    result = []
+    seen = set()
+    while len(result) < count and any(candidates.values()):
+        for muscle in muscles:
+            queue = candidates[muscle]
+            while queue and queue[0]["id"] in seen:
+                queue.pop(0)
+            if not queue:
+                continue
+            row = queue.pop(0)
+            seen.add(row["id"])
+            result.append(row)
+            if len(result) == count:
+                break
+
+    return result
+
+
+def missing_muscles(exercises: list, muscles: list[str]) -> list[str]:
+    """Группы мышц, для которых в подборке нет ни одного упражнения."""
+    covered = set()
+    for ex in exercises:
+        tags = _parse_tags(ex["tag"])
+        covered.update(m for m in muscles if tags & MUSCLE_TAGS.get(m, frozenset()))
+    return [m for m in muscles if m not in covered]
+
+
+def format_recommendations(exercises: list) -> str:
+    """Текст в том же формате, что и ответ AI."""
+    lines = []
+    for i, ex in enumerate(exercises, 1):
+        if ex["description"]:
+            lines.append(f"{i}. {ex['name']} - {ex['description']}")
+        else:
+            lines.append(f"{i}. {ex['name']}")
+    return "\n".join(lines)
@@ -0,0 +1,79 @@
+"""Строки из БД в виде компактных записей.
+
+Запись — кортеж (namedtuple с __slots__ = ()): поля доступны атрибутом
+(exercise.name), по имени, как у sqlite3.Row (exercise["name"]), и по индексу.
+Запись — один объект без обёртки, как у sqlite3.Row, и без хеш-таблицы dict;
+набор полей фиксирован, поэтому проверки вида "tag" in row.keys() не нужны.
+
+Запросы в database.py перечисляют колонки явно в порядке _fields записи:
+курсор собирает записи сам (row_factory = Record.from_row), без промежуточных
+sqlite3.Row.
+"""
+from collections import namedtuple
+
+
+class _Record(tuple):
+    """Общее поведение записей; поля задаёт namedtuple во второй базе."""
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key.__class__ is str:
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    def keys(self) -> tuple:
+        return self._fields
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in self._fields else default
+
+    @classmethod
+    def from_row(cls, cursor, row: tuple):
+        """row_factory для курсора sqlite3."""
+        return tuple.__new__(cls, row)
+
+
+class Program(_Record, namedtuple("Program", "id name")):
+    __slots__ = ()
+
+
+class Day(_Record, namedtuple("Day", "id program_id day_number name description")):
+    __slots__ = ()
+
+
+class ProgramDay(_Record, namedtuple("ProgramDay", Day._fields + ("program_name",))):
+    """День с названием программы (дни, в которых используется упражнение)."""
+    __slots__ = ()
+
+
+class Exercise(_Record, namedtuple("Exercise", "id name description image_file_id tag weight_type media_type")):
+    __slots__ = ()
+
+
+class TaggedExercise(_Record, namedtuple(
+    "TaggedExercise", Exercise._fields + ("day_name", "day_number", "program_name")
+)):
+    """Упражнение с первым днём, в который оно входит (поиск по тегу)."""
+    __slots__ = ()
+
+
+class WorkoutLog(_Record, namedtuple("WorkoutLog", "id user_id exercise_id weight reps set_num date created_at")):
+    __slots__ = ()
+
+
+class CustomLog(_Record, namedtuple(
+    "CustomLog", "id user_id name name_id weight reps duration_minutes rpe set_num date created_at"
+)):
+    __slots__ = ()
+
+
+class ActivitySet(_Record, namedtuple("ActivitySet", "name weight reps duration_minutes set_num")):
+    """Подход за день (сводка активности): из программы — без длительности."""
+    __slots__ = ()
+
+
+def columns(record: type, alias: str = "") -> str:
+    """Список колонок для SELECT в порядке полей записи ("e.id, e.name, ...")."""
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(prefix + field for field in record._fields)
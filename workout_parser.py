@@ -0,0 +1,161 @@
+"""Разбор ввода упражнений одной строкой.
+
+Строка разбирается одной предкомпилированной грамматикой LINE_RE: название, затем
+вес/повторы или длительность. Каждая ветка грамматики — фиксированное число
+токенов без вложенных повторений, поэтому на каждую границу названия уходит
+константа, и время разбора растёт линейно с длиной строки.
+
+Поддерживаемые форматы:
+- "жим лежа 90кг 15х4", "жим 22,5 10" — вес, повторы×подходы
+- "жим 3x10@80", "присед 5х5 @ 100 кг" — подходы×повторы@вес
+- "подтягивания 10х3" — без веса
+- "тяга 60 8-12х3" — диапазон повторов (берётся нижняя граница)
+- "жим 80 10х3 rpe 8" — RPE
+- "жим 135 lb 10" — фунты переводятся в кг
+- "бег 50мин", "ходьба 1 час 30 мин", "планка 90 сек" — длительность в минутах
+  (секунды округляются, у записи тогда rounded=True, нулевая длительность
+  не принимается); после неё можно комментарий: "бег 30 мин легко"
+- "жим 80 10х3 + тяга 60 12х3" — суперсет: несколько упражнений через "+"
+
+Повторы×подходы в названии ("жим 2x20 10х3") строку не разбирают.
+"""
+import re
+
+LB_TO_KG = 0.45359237
+
+WEIGHT_UNITS = {"кг": 1.0, "kg": 1.0, "lb": LB_TO_KG, "lbs": LB_TO_KG, "фунт": LB_TO_KG, "фунта": LB_TO_KG, "фунтов": LB_TO_KG}
+TIME_UNITS = {
+    "ч": 60, "час": 60, "часа": 60, "часов": 60, "h": 60, "hr": 60,
+    "м": 1, "мин": 1, "минут": 1, "минуты": 1, "минута": 1, "min": 1, "m": 1,
+    "с": 1 / 60, "сек": 1 / 60, "секунд": 1 / 60, "s": 1 / 60, "sec": 1 / 60,
+}
+
+
+def _words(units) -> str:
+    """Альтернатива из слов (длинные первыми), не продолжающихся буквой.
+
+    Проверка первой буквы впереди отсекает неподходящую позицию за один шаг.
+    """
+    first = "".join(sorted({unit[0] for unit in units}))
+    return f"(?=[{first}])(?:" + "|".join(sorted(units, key=len, reverse=True)) + r")(?![^\W\d_])"
+
+
+NUM = r"\d+(?:[.,]\d+)?"
+WUNIT = _words(WEIGHT_UNITS)
+TUNIT = _words(TIME_UNITS)
+X = r"(?:[×*]|[xх](?![^\W\d_]))"
+
+
+def _q(name: str) -> str:
+    """Число или диапазон "8-12" (в группу попадает нижняя граница)."""
+    return rf"(?P<{name}>{NUM})(?:\s*[-–]\s*{NUM})?"
+
+
+# Между токенами — не больше одного \s* подряд, чтобы не было возвратов по пробелам
+LINE_RE = re.compile(rf"""
+    (?P<name>.*?\S)\s+(?=\d)
+    (?:
+        (?P<cn>{NUM})\s*(?P<cu>{TUNIT})(?P<cmore>(?:\s*{NUM}\s*{TUNIT}){{0,2}})(?:\s+\S.*)?
+      | {_q("w1")}\s+{_q("r1")}(?:\s*{X}\s*{_q("s1")})?
+      | {_q("w2")}\s*(?P<u2>{WUNIT})\s*(?:{X}\s*)?{_q("r2")}(?:\s*{X}\s*{_q("s2")})?
+      | {_q("r3")}\s*{X}\s*{_q("s3")}
+      | {_q("s4")}\s*{X}\s*{_q("r4")}\s*@\s*{_q("w4")}(?:\s*(?P<u4>{WUNIT}))?
+    )
+    (?:\s*(?:rpe|рпе)\s*{_q("rpe")})?
+""", re.VERBOSE | re.IGNORECASE)
+# Ветки по порядку (частые первыми): "1 ч 30 мин", "90 15х4", "80кг 10х3", "10х3" (без веса), "3x10@80"
+
+CARDIO_RE = re.compile(rf"({NUM})\s*({TUNIT})", re.IGNORECASE)
+# Повторы×подходы внутри названия: "жим 2x20 10х3" — опечатка, а не упражнение "жим 2x20"
+NAME_SETS_RE = re.compile(rf"\d\s*{X}\s*\d", re.IGNORECASE)
+
+NAME_STRIP = " -–—:"
+
+
+def _number(value: str) -> float:
+    return float(value.replace(",", "."))
+
+
+def _parse_segment(text: str) -> dict | None:
+    """Одно упражнение (без пробелов по краям): название, затем вес/повторы или длительность."""
+    m = LINE_RE.fullmatch(text)
+    if m is None:
+        return None
+    name, cn, cu, cmore, w1, r1, s1, w2, u2, r2, s2, r3, s3, s4, r4, w4, u4, rpe = m.groups()
+
+    name = name.strip(NAME_STRIP)
+    if not name or NAME_SETS_RE.search(name):
+        return None
+
+    if cn:
+        minutes = float(cn.replace(",", ".")) * TIME_UNITS[cu.lower()]
+        if cmore:
+            minutes += sum(_number(value) * TIME_UNITS[unit.lower()] for value, unit in CARDIO_RE.findall(cmore))
+        if not minutes:
+            return None
+        duration = round(minutes) or 1
+        return {"type": "cardio", "name": name, "duration": duration, "rounded": duration != minutes}
+
+    if w1:
+        sets, reps, weight, unit = s1 or "1", r1, w1, None
+    elif w2:
+        sets, reps, weight, unit = s2 or "1", r2, w2, u2
+    elif r3:
+        sets, reps, weight, unit = s3, r3, "0", None
+    else:
+        sets, reps, weight, unit = s4, r4, w4, u4
+
+    if not (sets.isdigit() and reps.isdigit()) or not int(sets) or not int(reps):
+        return None
+    weight = float(weight.replace(",", "."))
+    if unit:
+        weight = round(weight * WEIGHT_UNITS[unit.lower()], 2)
+
+    return {
+        "type": "strength",
+        "name": name,
+        "weight": weight,
+        "reps": int(reps),
+        "sets": int(sets),
+        "rpe": _number(rpe) if rpe else None,
+    }
+
+
+def parse_line(text: str) -> list[dict] | None:
+    """
+    Разбирает строку с одним упражнением или суперсетом (через "+").
+
+    Returns:
+        Список упражнений {"type": "strength", "name", "weight", "reps", "sets", "rpe"}
+        или {"type": "cardio", "name", "duration", "rounded"}; None, если строку не понять.
+    """
+    text = text.strip().rstrip(".,;!")
+    if "+" not in text:
+        result = _parse_segment(text)
+        return [result] if result else None
+
+    results = []
+    for segment in text.split("+"):
+        result = _parse_segment(segment.strip())
+        if result is None:
+            return None
+        results.append(result)
+    return results
+
+
+def parse_workout(text: str) -> tuple[list[dict], list[str]]:
+    """Разобрать тренировку целиком: одно упражнение (или суперсет) на строку.
+
+    Возвращает (разобранные упражнения, строки, которые не удалось разобрать).
+    """
+    parsed, failed = [], []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        result = parse_line(line)
+        if result:
+            parsed.extend(result)
+        else:
+            failed.append(line)
+    return parsed, failed